@@ -0,0 +1,215 @@
+"""
+database.py 與 utils.py 熱門路徑的微基準測試
+
+用法（在專案根目錄）：
+    python -m benchmarks.bench --users 200 --days 30 --guilds 5 --output bench.json
+    python -m benchmarks.bench --skip-db                       # 只跑 utils，不需要資料庫
+    python -m benchmarks.bench --compare old.json --output new.json
+
+資料庫測試使用目前設定的儲存後端（DB_BACKEND，PostgreSQL 請用本機或測試用資料庫；SQLite 請指定 SQLITE_PATH），
+種子資料寫在保留的 guild_id 範圍（BENCH_GUILD_BASE 起），結束後刪除。
+每項記錄次數、總時間、吞吐量與 p50/p99 延遲，輸出為 JSON 以便跨 commit 比較。
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from src import utils
+
+BENCH_GUILD_BASE = 900_000_000_000_000_000   # 與真實 Discord guild_id 不重疊的範圍
+BENCH_USER_BASE = 800_000_000_000_000_000
+SEED_BATCH = 5000
+
+
+# ------- 量測 -------
+def measure(name: str, fn, iterations: int, setup=None) -> dict:
+    """執行 fn(i) iterations 次，記錄每次延遲"""
+    if setup:
+        setup()
+    samples = []
+    t_start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - t_start
+    samples.sort()
+    result = {
+        "name": name,
+        "iterations": iterations,
+        "total_s": round(total, 4),
+        "ops_per_sec": round(iterations / total, 1) if total else 0.0,
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(samples[len(samples) // 2], 4),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 4),
+    }
+    print(
+        f"{name:<28} {result['ops_per_sec']:>12,.1f} ops/s   "
+        f"p50 {result['p50_ms']:>9.4f} ms   p99 {result['p99_ms']:>9.4f} ms"
+    )
+    return result
+
+
+class _BenchGuild:
+    """format_table 只需要 get_member；回傳 None 走「User ID」的顯示路徑"""
+    def get_member(self, uid):
+        return None
+
+
+# ------- utils.py -------
+def bench_utils(args, rng: random.Random) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    timestamps = [now - timedelta(seconds=rng.randrange(0, 86400 * args.days)) for _ in range(1000)]
+    intervals = []
+    for i in range(1000):
+        start = timestamps[i]
+        intervals.append((BENCH_GUILD_BASE, BENCH_USER_BASE + i % args.users, start, start + timedelta(seconds=rng.randrange(60, 86400 * 2))))
+    rows = sorted(((BENCH_USER_BASE + u, rng.randrange(0, 36000)) for u in range(args.users)), key=lambda r: -r[1])
+    guild = _BenchGuild()
+
+    return [
+        measure("study_date_of", lambda i: utils.study_date_of(timestamps[i % 1000]), args.iterations),
+        # Study._add_interval 的計算部分（切分學習日並合併）
+        measure("split_intervals[1]", lambda i: utils.split_intervals([intervals[i % 1000]]), args.iterations),
+        measure("split_intervals[100]", lambda i: utils.split_intervals(intervals[(i % 10) * 100:(i % 10) * 100 + 100]), max(args.iterations // 100, 10)),
+        measure(f"make_rank_map[{len(rows)}]", lambda i: utils.make_rank_map(rows), max(args.iterations // 10, 10)),
+        measure(f"format_table[{len(rows)}]", lambda i: utils.format_table(guild, rows), max(args.iterations // 10, 10)),
+    ]
+
+
+# ------- database.py -------
+def _bench_guild_ids(args) -> list[int]:
+    return [BENCH_GUILD_BASE + g for g in range(args.guilds)]
+
+def _cleanup(db, guild_ids):
+    for table in ("time_log", "time_log_weekly", "time_log_monthly", "time_log_alltime", "active_sessions", "paused_sessions"):
+        for gid in guild_ids:
+            db.db_exec(f"DELETE FROM {table} WHERE guild_id = ?", (gid,), commit=True)
+
+def _seed(db, args, guild_ids, end_day: date):
+    """寫入 users × days × guilds 筆 time_log"""
+    rows = []
+    t0 = time.perf_counter()
+    total = 0
+    for gid in guild_ids:
+        for d in range(args.days):
+            sdate = (end_day - timedelta(days=d)).isoformat()
+            for u in range(args.users):
+                rows.append((gid, BENCH_USER_BASE + u, sdate, 60 + (u * 37 + d * 11) % 7200))
+                if len(rows) >= SEED_BATCH:
+                    db.flush_writes(time_rows=rows)
+                    total += len(rows)
+                    rows = []
+    if rows:
+        db.flush_writes(time_rows=rows)
+        total += len(rows)
+    elapsed = time.perf_counter() - t0
+    print(f"種子資料 {total:,} 筆，{elapsed:.1f} 秒（{total / elapsed:,.0f} 筆/秒）")
+    return {"rows": total, "seconds": round(elapsed, 3)}
+
+def bench_db(args, rng: random.Random) -> tuple[list[dict], dict]:
+    from src.storage import backend as db
+
+    db.ensure_db()
+    guild_ids = _bench_guild_ids(args)
+    end_day = date.fromisoformat(utils.study_date_of(datetime.now(timezone.utc)))
+    _cleanup(db, guild_ids)
+    try:
+        seed = _seed(db, args, guild_ids, end_day)
+        week_start = (end_day - timedelta(days=6)).isoformat()
+        today = end_day.isoformat()
+        n = args.db_iterations
+
+        def rand_guild():
+            return guild_ids[rng.randrange(len(guild_ids))]
+
+        def rand_user():
+            return BENCH_USER_BASE + rng.randrange(args.users)
+
+        def rand_day():
+            return (end_day - timedelta(days=rng.randrange(args.days))).isoformat()
+
+        session_users = [rand_user() for _ in range(n)]
+        start_iso = datetime.now(timezone.utc).isoformat()
+        results = [
+            measure("db.add_seconds", lambda i: db.add_seconds(rand_guild(), rand_user(), rand_day(), 60), n),
+            measure("db.save_session", lambda i: db.save_session(guild_ids[0], session_users[i], "voice", start_iso), n),
+            measure("db.delete_session", lambda i: db.delete_session(guild_ids[0], session_users[i], "voice"), n),
+            measure("db.fetch_by_date", lambda i: db.fetch_by_date(rand_guild(), rand_day()), n),
+            measure("db.fetch_sum_between[7d]", lambda i: db.fetch_sum_between(rand_guild(), week_start, today), n),
+            measure(
+                f"db.fetch_sum_between[{args.days}d]",
+                lambda i: db.fetch_sum_between(rand_guild(), (end_day - timedelta(days=args.days - 1)).isoformat(), today),
+                max(n // 10, 5),
+            ),
+        ]
+        return results, seed
+    finally:
+        _cleanup(db, guild_ids)
+        db.close_pool()
+
+
+# ------- 輸出與比較 -------
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(old_path: str, results: list[dict]):
+    with open(old_path, encoding="utf-8") as f:
+        old = {r["name"]: r for r in json.load(f)["results"]}
+    print(f"\n與 {old_path} 比較（p50 / ops/s 變化）：")
+    for r in results:
+        prev = old.get(r["name"])
+        if not prev:
+            continue
+        p50 = (r["p50_ms"] / prev["p50_ms"] - 1) * 100 if prev["p50_ms"] else 0.0
+        ops = (r["ops_per_sec"] / prev["ops_per_sec"] - 1) * 100 if prev["ops_per_sec"] else 0.0
+        flag = "  ⚠️" if p50 > 10 else ""
+        print(f"{r['name']:<28} p50 {p50:+7.1f}%   ops/s {ops:+7.1f}%{flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="database.py / utils.py 微基準測試")
+    parser.add_argument("--users", type=int, default=200, help="每個伺服器的成員數")
+    parser.add_argument("--days", type=int, default=30, help="種子資料天數")
+    parser.add_argument("--guilds", type=int, default=5, help="伺服器數")
+    parser.add_argument("--iterations", type=int, default=20000, help="utils 測試次數")
+    parser.add_argument("--db-iterations", type=int, default=500, help="資料庫測試次數")
+    parser.add_argument("--skip-db", action="store_true", help="只跑 utils 測試")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_output.json", help="結果 JSON 路徑")
+    parser.add_argument("--compare", help="與先前的結果 JSON 比較")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results = bench_utils(args, rng)
+    seed = None
+    if not args.skip_db:
+        db_results, seed = bench_db(args, rng)
+        results += db_results
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: getattr(args, k) for k in ("users", "days", "guilds", "iterations", "db_iterations", "seed")},
+        "seed": seed,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果已寫入 {args.output}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,17 +2,34 @@
 Discord Study Bot - 主程式入口
 """
 import os
+import time
 import discord
+from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
-from src import database as db
 
+# 必須在匯入 src 之前載入 .env：儲存後端、連線池與緩衝設定都在模組匯入時讀取環境變數
 load_dotenv()
 
+from src.storage import backend as db
+from src import storage
+from src import async_db as adb
+from src import utils
+from src.scheduler import Scheduler, DailyAt
+from src import metrics
+
 TOKEN = os.getenv("DISCORD_BOT_TOKEN") or os.getenv("DISCORD_TOKEN")
 DEV_GUILD_ID = int(os.getenv("DEV_GUILD_ID", "0"))
 USE_MEMBERS_INTENT = os.getenv("USE_MEMBERS_INTENT", "0") == "1"
 
+# 分片：SHARD_COUNT 不設定時由 Discord 建議數量；SHARD_IDS（逗號分隔）指定此程序負責哪些分片
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(x) for x in os.getenv("SHARD_IDS", "").split(",") if x.strip()] or None
+if SHARD_IDS is not None and SHARD_COUNT is None:
+    raise RuntimeError("設定 SHARD_IDS 時必須同時設定 SHARD_COUNT")
+if os.getenv("MULTI_PROCESS", "0") == "1" and storage.DB_BACKEND != "postgres":
+    raise RuntimeError("多程序部署（MULTI_PROCESS=1）需要 PostgreSQL（DB_BACKEND=postgres）")
+
 # Intents
 intents = discord.Intents.default()
 intents.voice_states = True
@@ -21,12 +38,58 @@ if USE_MEMBERS_INTENT:
     intents.members = True
 
 
-class StudyBot(commands.Bot):
+class NotGuildOwner(app_commands.CheckFailure):
+    """多程序部署時，此伺服器由其他程序負責（持有租約），指令交給它處理"""
+
+
+class StudyTree(app_commands.CommandTree):
+    """記錄每個 slash 指令的耗時與錯誤；多程序部署時只處理自己負責的伺服器的指令"""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        study_cog = self.client.get_cog("Study")
+        if interaction.guild is not None and study_cog is not None and not study_cog._owns(interaction.guild.id):
+            # 每個程序都會收到同一個 interaction；不負責的程序不回應也不寫入，避免重複加時數或公告
+            raise NotGuildOwner()
+        interaction.extras["metrics_started"] = time.perf_counter()
+        return True
+
+    def observe_command(self, interaction: discord.Interaction, error: bool):
+        started = interaction.extras.get("metrics_started")
+        if started is not None and interaction.command is not None:
+            metrics.observe(f"command.{interaction.command.qualified_name}", (time.perf_counter() - started) * 1000, error)
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        if isinstance(error, NotGuildOwner):
+            return
+        self.observe_command(interaction, error=True)
+        await super().on_error(interaction, error)
+
+
+class StudyBot(commands.AutoShardedBot):
     def __init__(self):
-        super().__init__(command_prefix="!", intents=intents, help_command=None)
+        super().__init__(
+            command_prefix="!",
+            intents=intents,
+            help_command=None,
+            shard_count=SHARD_COUNT,
+            shard_ids=SHARD_IDS,
+            tree_cls=StudyTree,
+        )
+        print(f"🗄️ 儲存後端：{storage.describe()}")
         db.ensure_db()
+        self.loop_lag = metrics.LoopLagMonitor()
+        self.metrics_server = metrics.MetricsServer() if metrics.METRICS_PORT else None
 
     async def setup_hook(self):
+        adb.start_write_buffer()
+        self.loop_lag.start()
+        if self.metrics_server:
+            await self.metrics_server.start()
+
+        # 排程器：各 Cog 在載入時註冊自己的工作
+        self.scheduler = Scheduler(wait_ready=self.wait_until_ready)
+        self.scheduler.add("time_log_partitions", DailyAt(0, 5, utils.TW_TZ), self._maintain_partitions)
+
         # 載入 Cogs
         for ext in ["src.cogs.study", "src.cogs.admin", "src.cogs.help"]:
             try:
@@ -35,13 +98,32 @@ class StudyBot(commands.Bot):
             except Exception as e:
                 print(f"❌ 載入失敗 {ext}: {e}")
 
-    async def on_ready(self):
-        print(f"✅ 已登入: {self.user} (ID: {self.user.id})")
-        
-        # 恢復進行中的計時
+    async def _maintain_partitions(self, deadline, catch_up):
+        """每天預先建立未來月份的 time_log 分區"""
+        await adb.ensure_time_log_partitions()
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        self.tree.observe_command(interaction, error=False)
+
+    async def close(self):
+        await self.loop_lag.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        await self.scheduler.stop()
+        await super().close()
+        # 關機前強制寫回緩衝中的時數與 session
+        await adb.write_buffer.stop()
+        adb.shutdown()
+        db.close_pool()
+
+    async def on_shard_ready(self, shard_id: int):
+        # 每個分片各自恢復進行中的計時並與目前語音狀態對帳（只在第一次就緒時執行）
         study_cog = self.get_cog("Study")
         if study_cog:
-            study_cog._restore_sessions()
+            await study_cog._reconcile_sessions(shard_id)
+
+    async def on_ready(self):
+        print(f"✅ 已登入: {self.user} (ID: {self.user.id})｜分片 {sorted(self.shards)} / {self.shard_count}")
         
         # 同步指令
         if DEV_GUILD_ID:
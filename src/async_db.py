@@ -0,0 +1,203 @@
+"""
+非同步資料庫介面：把儲存後端（database.py 或 sqlite_backend.py）的同步查詢丟到專用執行緒池執行，
+讓 Cog 裡的 coroutine 可以直接 await，不會卡住 discord.py 的 event loop（含心跳）。
+"""
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta, timezone
+
+from . import utils
+from .storage import backend as db
+from .write_buffer import WriteBuffer
+from .cache import LeaderboardCache
+from .metrics import metrics
+
+# 同時進行的查詢上限，預設與連線池大小相同，避免借連線時排隊逾時
+DB_ASYNC_WORKERS = int(os.environ.get('DB_ASYNC_WORKERS', str(db.DB_POOL_MAX)))
+
+_executor = ThreadPoolExecutor(max_workers=DB_ASYNC_WORKERS, thread_name_prefix="db")
+
+def _timed_call(fn, submitted: float, args, kwargs):
+    """在執行緒中執行並記錄排隊時間與各資料庫函式的耗時"""
+    started = time.perf_counter()
+    metrics.observe("db.queue_wait", (started - submitted) * 1000)
+    error = True
+    try:
+        result = fn(*args, **kwargs)
+        error = False
+        return result
+    finally:
+        metrics.observe(f"db.{fn.__name__}", (time.perf_counter() - started) * 1000, error)
+
+async def run(fn, *args, **kwargs):
+    """在資料庫執行緒池中執行同步函式"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(_timed_call, fn, time.perf_counter(), args, kwargs))
+
+def _wrap(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run(fn, *args, **kwargs)
+    return wrapper
+
+# session 與時數寫入先進緩衝，定時批次寫回
+write_buffer = WriteBuffer(run)
+
+def start_write_buffer():
+    write_buffer.start()
+
+async def flush():
+    """強制寫回緩衝中的變更（排行榜查詢前、關機前）"""
+    await write_buffer.flush()
+
+def _flush_first(fn):
+    """讀取前先寫回緩衝，確保看得到剛寫入的時數"""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        await write_buffer.flush()
+        return await run(fn, *args, **kwargs)
+    return wrapper
+
+# 排行榜查詢快取，add_seconds 時依伺服器與學習日淘汰；
+# 多程序部署時其他程序的寫入無法淘汰本程序的快取，因此停用
+leaderboard_cache = LeaderboardCache(maxsize=0) if os.environ.get('MULTI_PROCESS', '0') == '1' else LeaderboardCache()
+
+# alltime 查詢的日期範圍（涵蓋任何學習日）
+_ALL_DATES = ("0000-00-00", "9999-99-99")
+
+def _cached(kind: str, fn, date_range, extra=lambda *args: ()):
+    """快取查詢結果；date_range(*args) 回傳 (起日, 迄日)，extra(*args) 回傳其他 key 參數"""
+    @functools.wraps(fn)
+    async def wrapper(guild_id, *args):
+        start, end = date_range(*args)
+        key = LeaderboardCache.make_key(kind, guild_id, start, end, *extra(*args))
+        hit, value = leaderboard_cache.get(key)
+        if hit:
+            return value
+        generation = leaderboard_cache.generation(guild_id)
+        await write_buffer.flush()
+        value = await run(fn, guild_id, *args)
+        leaderboard_cache.put(key, value, generation)
+        return value
+    return wrapper
+
+def _week_range(week_start: str):
+    end = (date.fromisoformat(week_start) + timedelta(days=6)).isoformat()
+    return week_start, end
+
+def shutdown():
+    """等待進行中的查詢完成後關閉執行緒池"""
+    _executor.shutdown(wait=True)
+
+# ------- 查詢功能 -------
+fetch_by_date = _cached("by_date", db.fetch_by_date, lambda sdate: (sdate, sdate))
+fetch_sum_between = _cached("sum_between", db.fetch_sum_between, lambda start, end: (start, end))
+fetch_user_sum_on = _cached(
+    "user_sum_on", db.fetch_user_sum_on, lambda uid, sdate: (sdate, sdate), lambda uid, sdate: (uid,)
+)
+fetch_user_sum_between = _cached(
+    "user_sum_between", db.fetch_user_sum_between, lambda uid, start, end: (start, end), lambda uid, start, end: (uid,)
+)
+fetch_week = _cached("week", db.fetch_week, _week_range)
+fetch_month = _cached("month", db.fetch_month, lambda month: (f"{month}-01", f"{month}-31"))
+fetch_alltime = _cached("alltime", db.fetch_alltime, lambda: _ALL_DATES)
+
+fetch_by_date_many = _flush_first(db.fetch_by_date_many)
+fetch_sum_between_many = _flush_first(db.fetch_sum_between_many)
+fetch_user_daily = _flush_first(db.fetch_user_daily)
+fetch_user_intervals = _flush_first(db.fetch_user_intervals)
+schema_version = _wrap(db.schema_version)
+
+# ------- Config & Monitor -------
+get_config = _wrap(db.get_config)
+get_configs = _wrap(db.get_configs)
+set_config = _wrap(db.set_config)
+get_monitor_channels = _wrap(db.get_monitor_channels)
+get_all_monitor_channels = _wrap(db.get_all_monitor_channels)
+add_monitor_channel = _wrap(db.add_monitor_channel)
+remove_monitor_channel = _wrap(db.remove_monitor_channel)
+
+# ------- 排程紀錄 -------
+get_job_runs = _wrap(db.get_job_runs)
+set_job_runs = _wrap(db.set_job_runs)
+ensure_time_log_partitions = _wrap(db.ensure_time_log_partitions)
+
+# ------- 多程序協調 -------
+acquire_guild_leases = _wrap(db.acquire_guild_leases)
+release_guild_leases = _wrap(db.release_guild_leases)
+
+# ------- 成員顯示名稱 -------
+get_member_names = _wrap(db.get_member_names)
+save_member_names = _wrap(db.save_member_names)
+
+# ------- 核心邏輯（寫入走 write-behind 緩衝） -------
+async def add_seconds(guild_id: int, user_id: int, study_date: str, seconds: int):
+    write_buffer.add_seconds(guild_id, user_id, study_date, seconds)
+    leaderboard_cache.invalidate(guild_id, study_date)
+
+async def add_seconds_many(rows):
+    """批次加時數 [(guild_id, user_id, study_date, seconds)]"""
+    for guild_id, user_id, study_date, seconds in rows:
+        write_buffer.add_seconds(guild_id, user_id, study_date, seconds)
+        leaderboard_cache.invalidate(guild_id, study_date)
+
+async def add_intervals(intervals):
+    """記錄結束的計時 [(guild_id, user_id, session_type, start, end)]
+
+    原始區間寫入 session_intervals，切成各學習日的秒數累加進 time_log，兩者在同一次 flush 寫回。
+    時間一律以 UTC 寫入：SQLite 以字串比較 start_time，混入 +08:00 會讓範圍篩選與排序出錯。
+    """
+    for guild_id, user_id, session_type, start, end in intervals:
+        if end > start:
+            write_buffer.log_interval(
+                guild_id, user_id, session_type,
+                start.astimezone(timezone.utc).isoformat(), end.astimezone(timezone.utc).isoformat(),
+            )
+    await add_seconds_many(utils.split_intervals([(g, u, start, end) for g, u, _, start, end in intervals]))
+
+async def add_manual_seconds(guild_id: int, user_id: int, study_date: str, seconds: int):
+    """手動加時數：記成從該學習日 06:00 起的 manual 區間"""
+    start = utils.study_day_start(study_date)
+    end = start + timedelta(seconds=seconds)
+    write_buffer.log_interval(guild_id, user_id, utils.MANUAL_SESSION_TYPE, start.isoformat(), end.isoformat())
+    await add_seconds(guild_id, user_id, study_date, seconds)
+
+async def save_sessions(rows):
+    """批次儲存計時開始時間 [(guild_id, user_id, session_type, start_time_iso, accumulated_secs)]"""
+    for guild_id, user_id, session_type, start_time_iso, accumulated_secs in rows:
+        write_buffer.save_session(guild_id, user_id, session_type, start_time_iso, accumulated_secs)
+
+async def delete_sessions(rows):
+    """批次刪除計時 [(guild_id, user_id, session_type)]"""
+    for guild_id, user_id, session_type in rows:
+        write_buffer.delete_session(guild_id, user_id, session_type)
+
+async def save_session(guild_id: int, user_id: int, session_type: str, start_time_iso: str, accumulated_secs: int = 0):
+    write_buffer.save_session(guild_id, user_id, session_type, start_time_iso, accumulated_secs)
+
+async def delete_session(guild_id: int, user_id: int, session_type: str):
+    write_buffer.delete_session(guild_id, user_id, session_type)
+
+async def pause_session(guild_id: int, user_id: int, session_type: str, pause_time_iso: str, accumulated_secs: int = 0):
+    write_buffer.pause_session(guild_id, user_id, session_type, pause_time_iso, accumulated_secs)
+
+async def delete_paused_session(guild_id: int, user_id: int, session_type: str):
+    write_buffer.delete_paused_session(guild_id, user_id, session_type)
+
+async def get_session(guild_id: int, user_id: int, session_type: str):
+    found, value = write_buffer.pending_session(guild_id, user_id, session_type)
+    if found:
+        return value
+    return await run(db.get_session, guild_id, user_id, session_type)
+
+async def get_paused_session(guild_id: int, user_id: int, session_type: str):
+    found, value = write_buffer.pending_paused(guild_id, user_id, session_type)
+    if found:
+        return value
+    return await run(db.get_paused_session, guild_id, user_id, session_type)
+
+get_all_active_sessions = _flush_first(db.get_all_active_sessions)
+get_all_paused_sessions = _flush_first(db.get_all_paused_sessions)
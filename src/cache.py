@@ -0,0 +1,88 @@
+"""
+排行榜查詢快取：以 (查詢種類, guild_id, 起日, 迄日, 其他參數) 為 key 的 LRU，
+add_seconds 寫入某伺服器某學習日時，只淘汰範圍包含該日的項目。
+其他來源的寫入（其他程序、src.rebuild、src.import_sqlite）不會經過 invalidate，因此項目另有 TTL。
+"""
+from collections import OrderedDict
+import os
+import time
+from typing import Optional
+
+LEADERBOARD_CACHE_SIZE = int(os.environ.get('LEADERBOARD_CACHE_SIZE', '1024'))
+LEADERBOARD_CACHE_TTL = float(os.environ.get('LEADERBOARD_CACHE_TTL', '60'))   # 項目最多保留幾秒
+
+
+class LeaderboardCache:
+    def __init__(self, maxsize: int = LEADERBOARD_CACHE_SIZE, ttl: float = LEADERBOARD_CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[tuple, tuple[object, float]] = OrderedDict()   # key -> (值, 到期時間)
+        self._by_guild: dict[int, set[tuple]] = {}
+        self._generation: dict[int, int] = {}  # 每次淘汰 +1，避免查詢途中被寫入的舊結果放進快取
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(kind: str, guild_id: int, start: str, end: str, *extra) -> tuple:
+        return (kind, guild_id, start, end, *extra)
+
+    def generation(self, guild_id: int) -> int:
+        return self._generation.get(guild_id, 0)
+
+    def get(self, key: tuple):
+        """回傳 (是否命中, 值)"""
+        entry = self._data.get(key)
+        if entry is not None:
+            if entry[1] > self._clock():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+            self._drop(key)
+        self.misses += 1
+        return False, None
+
+    def put(self, key: tuple, value, generation: int):
+        guild_id = key[1]
+        if generation != self.generation(guild_id) or self.maxsize <= 0:
+            return
+        self._data[key] = (value, self._clock() + self.ttl)
+        self._data.move_to_end(key)
+        self._by_guild.setdefault(guild_id, set()).add(key)
+        while len(self._data) > self.maxsize:
+            old_key, _ = self._data.popitem(last=False)
+            self._by_guild.get(old_key[1], set()).discard(old_key)
+
+    def _drop(self, key: tuple):
+        self._data.pop(key, None)
+        self._by_guild.get(key[1], set()).discard(key)
+
+    def invalidate(self, guild_id: int, study_date: Optional[str] = None):
+        """淘汰此伺服器範圍包含 study_date 的項目；study_date 為 None 時淘汰整個伺服器"""
+        self._generation[guild_id] = self.generation(guild_id) + 1
+        keys = self._by_guild.get(guild_id)
+        if not keys:
+            return
+        for key in list(keys):
+            if study_date is None or key[2] <= study_date <= key[3]:
+                keys.discard(key)
+                self._data.pop(key, None)
+                self.invalidations += 1
+
+    def clear(self):
+        self._data.clear()
+        self._by_guild.clear()
+        self._generation.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
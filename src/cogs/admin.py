@@ -2,9 +2,15 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 from datetime import datetime, timezone
+import os
+import tempfile
 
-from .. import database as db
+from .. import storage
+from ..storage import backend as db
+from .. import async_db as adb
 from .. import utils
+from .. import export
+from ..metrics import metrics
 
 
 class Admin(commands.Cog):
@@ -20,8 +26,12 @@ class Admin(commands.Cog):
 
         study_cog = self.bot.get_cog("Study")
         if study_cog:
-            await study_cog._perform_daily_cut_and_announce()
-            await interaction.followup.send("已發布公告。", ephemeral=True)
+            stats = await study_cog._perform_daily_cut_and_announce()
+            await interaction.followup.send(
+                f"已發布公告：成功 {stats['sent']}｜失敗 {stats['failed']}｜略過 {stats['skipped']}（共 {stats['guilds']} 個伺服器）\n"
+                f"查詢 {stats['query_ms']} ms｜名稱 {stats['names_ms']} ms｜產生 {stats['render_ms']} ms｜送出 {stats['send_ms']} ms｜總計 {stats['total_ms']} ms",
+                ephemeral=True
+            )
         else:
             await interaction.followup.send("錯誤：找不到 Study 模組。", ephemeral=True)
 
@@ -36,12 +46,134 @@ class Admin(commands.Cog):
         if not study_date:
             study_date = utils.study_date_of(datetime.now(timezone.utc))
 
-        db.add_seconds(interaction.guild.id, user.id, study_date, seconds)
+        await adb.add_manual_seconds(interaction.guild.id, user.id, study_date, seconds)
         await interaction.response.send_message(
             f"已為 {user.mention} 在 {study_date} 增加 {seconds} 秒（{seconds // 60} 分 {seconds % 60} 秒）。",
             ephemeral=True
         )
 
+    @app_commands.command(name="db_stats", description="（管理員）查看資料庫連線池狀態")
+    async def cmd_db_stats(self, interaction: discord.Interaction):
+        if not interaction.user.guild_permissions.manage_guild:
+            return await interaction.response.send_message("需要『管理伺服器』權限。", ephemeral=True)
+
+        stats = db.pool_stats()
+        if not stats:
+            return await interaction.response.send_message("連線池尚未建立。", ephemeral=True)
+
+        if storage.DB_BACKEND == "sqlite":
+            lines = [
+                f"**🗄️ SQLite**（`{stats['path']}`，WAL）",
+                f"讀取連線：{stats['readers']}｜寫入交易：{stats['writes']}（排隊中 {stats['pending_writes']}）",
+                f"寫入耗時：平均 {stats['avg_write_ms']} ms｜最大 {stats['max_write_ms']} ms",
+            ]
+        else:
+            lines = [
+                "**🗄️ 資料庫連線池**",
+                f"使用中：{stats['in_use']} / {stats['max']}（最少 {stats['min']}）",
+                f"借出次數：{stats['checkouts']}｜等待次數：{stats['waits']}",
+                f"借出延遲：平均 {stats['avg_checkout_ms']} ms｜最大 {stats['max_checkout_ms']} ms",
+                f"重新連線：{stats['reconnects']}｜健康檢查失敗：{stats['healthcheck_failures']}",
+            ]
+        wb = adb.write_buffer.stats()
+        lines.append(f"Schema 版本：{await adb.schema_version()}")
+        for name, job in self.bot.scheduler.job_stats.items():
+            next_run = job["next_run"].astimezone(utils.TW_TZ).strftime("%m-%d %H:%M") if job["next_run"] else "—"
+            lines.append(f"排程 `{name}`：執行 {job['runs']} 次｜失敗 {job['failures']}｜上次 {job['last_ms'] or '—'} ms｜下次 {next_run}")
+        lines.append(f"寫入緩衝：待寫 {wb['pending']} 筆｜已批次寫回 {wb['flushes']} 次（{wb['flushed_rows']} 筆）")
+        cs = adb.leaderboard_cache.stats()
+        lines.append(
+            f"排行榜快取：{cs['size']} / {cs['maxsize']}｜命中 {cs['hits']}｜未命中 {cs['misses']}"
+            f"（命中率 {cs['hit_rate']:.0%}）｜淘汰 {cs['invalidations']}"
+        )
+        study_cog = self.bot.get_cog("Study")
+        if study_cog:
+            ss = study_cog.sessions.stats()
+            lines.append(
+                f"計時：語音 {ss['voice']}｜文字 {ss['text']}｜暫停 {ss['paused']}"
+                f"（{ss['guilds']} 個伺服器，slot {ss['slots']}，空閒 {ss['free']}，{ss['array_bytes'] // 1024} KiB）"
+            )
+            rs = study_cog.replies.stats()
+            lines.append(
+                f"關鍵字回覆（{rs['mode']}）：排隊 {rs['pending']}｜已送出 {rs['sent']}｜合併 {rs['coalesced']}"
+                f"｜反應 {rs['reactions']}｜失敗 {rs['failed']}｜延遲 平均 {rs['avg_latency_ms']} ms、最大 {rs['max_latency_ms']} ms"
+            )
+            ns = study_cog.member_names.stats()
+            lines.append(
+                f"成員名稱快取：{ns['size']} / {ns['maxsize']}｜命中率 {ns['hit_rate']:.0%}"
+                f"｜資料表載入 {ns['db_loaded']}｜查詢 Discord {ns['queried']}｜待寫回 {ns['pending']}"
+            )
+        await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+    @app_commands.command(name="metrics", description="（管理員）查看事件、指令與資料庫延遲")
+    @app_commands.describe(top="顯示幾項（依總耗時排序）")
+    async def cmd_metrics(self, interaction: discord.Interaction, top: int = 15):
+        if not interaction.user.guild_permissions.manage_guild:
+            return await interaction.response.send_message("需要『管理伺服器』權限。", ephemeral=True)
+
+        snap = metrics.snapshot()
+        hists = snap["histograms"]
+        lag = hists.get("loop.lag")
+        lines = [f"**📈 效能指標**（運行 {utils.format_hms(snap['uptime_s'])}）"]
+        if lag:
+            lines.append(f"Event loop 延遲：p50 {lag['p50_ms']} ms｜p99 {lag['p99_ms']} ms｜最大 {lag['max_ms']} ms")
+
+        ranked = sorted(
+            ((name, h) for name, h in hists.items() if name != "loop.lag"),
+            key=lambda item: item[1]["avg_ms"] * item[1]["count"],
+            reverse=True,
+        )
+        for name, h in ranked[:max(top, 1)]:
+            errors = f"｜錯誤 {h['errors']}" if h["errors"] else ""
+            lines.append(
+                f"`{name}` ×{h['count']}｜平均 {h['avg_ms']}｜p50 {h['p50_ms']}｜p99 {h['p99_ms']}｜最大 {h['max_ms']} ms{errors}"
+            )
+        if snap["counters"]:
+            lines.append("計數：" + "｜".join(f"{name} {value}" for name, value in sorted(snap["counters"].items())))
+        await interaction.response.send_message("\n".join(lines)[:2000], ephemeral=True)
+
+    @app_commands.command(name="export", description="（管理員）匯出本伺服器的讀書資料")
+    @app_commands.describe(
+        dataset="time_log：每日時數；intervals：原始計時區間",
+        format="csv（gzip 壓縮）或 parquet",
+        start_date="起始學習日 YYYY-MM-DD（含，預設不限）",
+        end_date="結束學習日 YYYY-MM-DD（含，預設不限）",
+    )
+    @app_commands.choices(
+        dataset=[app_commands.Choice(name=name, value=name) for name in export.DATASETS],
+        format=[app_commands.Choice(name=name, value=name) for name in export.FORMATS],
+    )
+    async def cmd_export(self, interaction: discord.Interaction, dataset: str = "time_log", format: str = "csv",
+                         start_date: str = None, end_date: str = None):
+        if not interaction.user.guild_permissions.manage_guild:
+            return await interaction.response.send_message("需要『管理伺服器』權限。", ephemeral=True)
+        if format not in export.formats():
+            return await interaction.response.send_message("此環境未安裝 pyarrow，無法匯出 parquet。", ephemeral=True)
+
+        await interaction.response.defer(thinking=True, ephemeral=True)
+        guild = interaction.guild
+        name = export.filename(guild.id, dataset, format, start_date, end_date)
+        await adb.flush()
+        # 寫到暫存檔而不是記憶體，檔案大小不受限於可用記憶體
+        with tempfile.TemporaryDirectory(prefix="export-") as tmp:
+            path = os.path.join(tmp, name)
+            try:
+                stats = await adb.run(export.export, guild.id, path, dataset, format, start_date, end_date)
+            except ValueError as e:
+                return await interaction.followup.send(f"參數錯誤：{e}", ephemeral=True)
+            size = os.path.getsize(path)
+            if size > guild.filesize_limit:
+                return await interaction.followup.send(
+                    f"檔案 {size / 1024 / 1024:.1f} MiB 超過上傳上限 {guild.filesize_limit / 1024 / 1024:.0f} MiB，"
+                    f"請縮小日期範圍，或在主機上執行 `python -m src.export --guild {guild.id}`。",
+                    ephemeral=True
+                )
+            await interaction.followup.send(
+                f"已匯出 {stats['rows']:,} 筆（{size / 1024:,.0f} KiB，{stats['seconds']:.1f} 秒）。",
+                file=discord.File(path, filename=name),
+                ephemeral=True
+            )
+
     @app_commands.command(name="sync", description="（管理員）同步指令")
     async def cmd_sync(self, interaction: discord.Interaction):
         if not interaction.user.guild_permissions.manage_guild:
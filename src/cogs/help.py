@@ -29,13 +29,13 @@ class Help(commands.Cog):
 
         embed.add_field(
             name="📊 查詢指令",
-            value="`/today` 今天排行\n`/week` 本週排行\n`/leaderboard` 7天排行\n`/me` 個人統計\n`/study_status` 誰在讀書",
+            value="`/today` 今天排行\n`/week` 本週排行\n`/leaderboard` 7天排行\n`/month` 本月排行\n`/alltime` 歷史總排行\n`/me` 個人統計（`mode:history` 看歷史）\n`/study_status` 誰在讀書",
             inline=False
         )
 
         embed.add_field(
             name="⚙️ 管理指令",
-            value="`/add_monitor_channel` 新增監聽頻道\n`/remove_monitor_channel` 移除監聽頻道\n`/list_monitor_channels` 列出監聽頻道\n`/set_announce_channel` 設定公告頻道",
+            value="`/add_monitor_channel` 新增監聽頻道\n`/remove_monitor_channel` 移除監聽頻道\n`/list_monitor_channels` 列出監聽頻道\n`/set_announce_channel` 設定公告頻道\n`/export` 匯出讀書資料",
             inline=False
         )
 
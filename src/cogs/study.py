@@ -2,14 +2,41 @@ import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 from datetime import datetime, timedelta, timezone
+import asyncio
 import os
 import json
+import time
+from typing import Optional
 
-from .. import database as db
+from .. import async_db as adb
 from .. import utils
+from .. import history
+from .. import keywords
+from ..monitor_index import MonitorChannelIndex
+from ..member_names import MemberNameCache
+from ..reply_queue import ReplyQueue
+from ..session_store import SessionStore, VOICE, TEXT, kind_of
+from ..scheduler import DailyAt, Every
+from .. import coordination
+from ..metrics import timed, incr
 
 # 載入設定檔
 CONFIG_PATH = "config.json"
+ANNOUNCE_CONCURRENCY = int(os.getenv("ANNOUNCE_CONCURRENCY", "5"))     # 每日公告同時送出的頻道數
+DAILY_JOB = "daily_announce"
+DAILY_AT = DailyAt(6, 0, utils.TW_TZ)  # 每日 06:00 結算並公告
+LEASE_JOB = "guild_leases"
+HEARTBEAT_JOB = "heartbeat"       # 舊版以 shard_id 當 guild_id 欄位寫在這個名稱下，只在升級後第一次對帳時讀取
+MEMBER_NAMES_JOB = "member_names"
+MEMBER_NAMES_FLUSH_INTERVAL = int(os.getenv("MEMBER_NAMES_FLUSH_INTERVAL", "60"))  # 新取得的成員名稱多久寫回一次
+HEARTBEAT_INTERVAL = int(os.getenv("HEARTBEAT_INTERVAL", "60"))    # 記錄存活時間的間隔，重啟後用來結算離線期間離開語音的人
+CONFIG_RELOAD_INTERVAL = int(os.getenv("CONFIG_RELOAD_INTERVAL", "5"))  # 每幾秒檢查 config.json 是否被修改
+
+def config_mtime():
+    try:
+        return os.stat(CONFIG_PATH).st_mtime_ns
+    except OSError:
+        return None
 
 def load_config():
     """載入 config.json"""
@@ -26,133 +53,506 @@ def load_config():
 class Study(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.active_sessions: dict[tuple[int, int], datetime] = {}  # (guild_id, user_id) -> start UTC
-        self.text_sessions: dict[tuple[int, int], datetime] = {}    # 文字頻道觸發的計時 (guild_id, user_id) -> start UTC
+        # 語音與文字計時（含暫停中的文字計時與本次已累積秒數）
+        self.sessions = SessionStore()
+        self._reconciled_shards: set[int] = set()   # 已完成啟動對帳的分片
+        self._deferred_daily: set[datetime] = set()   # 有伺服器等分片對帳完成才補跑的 06:00 deadline
+        self._daily_lock = asyncio.Lock()
         self.announce_channel_id = int(os.getenv("ANNOUNCE_CHANNEL_ID", "0"))
         self.config = load_config()
+        self._config_mtime = config_mtime()
+        self.dispatcher = keywords.KeywordDispatcher(self.config)
+        self.monitor_index = MonitorChannelIndex(self.config.get("monitor_channels", []))
+        self._monitor_index_loaded = False
+        self.member_names = MemberNameCache()
+        self.replies = ReplyQueue()   # 關鍵字回覆經佇列限速、合併後送出
+        self.last_announce_stats: Optional[dict] = None
+        # 多程序部署時只處理持有租約的伺服器；單一程序時為 None（全部都處理）
+        self.owned_guilds: Optional[set[int]] = set() if coordination.MULTI_PROCESS else None
+        self.session_listener: Optional[coordination.SessionListener] = None
         
         # 啟動定時任務
-        self.daily_announce_loop.start()
-
-    def _restore_sessions(self):
-        """從資料庫恢復進行中的計時"""
-        sessions = db.get_all_active_sessions()
-        for guild_id, user_id, session_type, start_time_iso in sessions:
+        self.config_reload_loop.start()
+
+    async def cog_load(self):
+        # 每日 06:00 結算公告交給排程器；重啟後會補跑錯過的伺服器
+        self.bot.scheduler.add(DAILY_JOB, DAILY_AT, self._daily_job, catch_up=True, last_run=self._daily_last_run)
+        self.bot.scheduler.add(HEARTBEAT_JOB, Every(HEARTBEAT_INTERVAL), self._heartbeat)
+        self.bot.scheduler.add(MEMBER_NAMES_JOB, Every(MEMBER_NAMES_FLUSH_INTERVAL), self._flush_member_names)
+        if coordination.MULTI_PROCESS:
+            self.session_listener = coordination.SessionListener(self._on_remote_change, self._resync_all)
+            await self.session_listener.start()
+            self.bot.scheduler.add(LEASE_JOB, Every(coordination.LEASE_RENEW_INTERVAL), self._renew_leases, catch_up=True)
+
+    # ------- 多程序協調 -------
+    def _owns(self, guild_id: int) -> bool:
+        """此程序是否負責這個伺服器（持有租約）"""
+        return self.owned_guilds is None or guild_id in self.owned_guilds
+
+    async def _renew_leases(self, deadline: datetime, catch_up: bool):
+        guild_ids = [guild.id for guild in self.bot.guilds]
+        owned = set(await adb.acquire_guild_leases(guild_ids, coordination.INSTANCE_ID, coordination.LEASE_TTL))
+        gained = owned - self.owned_guilds
+        lost = self.owned_guilds - owned
+        self.owned_guilds = owned
+        if gained or lost:
+            print(f"🔑 租約變動: 取得 {len(gained)}、失去 {len(lost)}，目前負責 {len(owned)} 個伺服器")
+        if gained and self._reconciled_shards:
+            # 接手的伺服器以資料表為準重新載入
+            await self._resync_sessions(gained)
+
+    def _on_remote_change(self, payload: dict):
+        """套用其他程序寫入的變更（依 payload 的 table 分派）"""
+        table = payload.get("table")
+        if table == "monitor_channels":
+            # 每個看得到此伺服器的程序都要更新，租約轉移後才不會用到舊的頻道集合
+            if payload["op"] == "DELETE":
+                self.monitor_index.remove(payload["guild_id"], payload["channel_id"])
+            else:
+                self.monitor_index.add(payload["guild_id"], payload["channel_id"])
+        elif table in ("active_sessions", "paused_sessions"):
+            self._on_remote_session_change(payload)
+        # config（公告頻道）沒有記憶體快取，公告時才從資料表讀取，不需處理
+
+    async def _resync_all(self):
+        """LISTEN 重連後（期間的通知可能遺失）以資料表為準重新載入計時與監聽頻道"""
+        self.monitor_index.load_db_rows(await adb.get_all_monitor_channels())
+        for guild in self.bot.guilds:
+            self.monitor_index.refresh_guild(guild)
+        await self._resync_sessions()
+
+    def _on_remote_session_change(self, payload: dict):
+        """套用其他程序寫入的 active_sessions / paused_sessions 變更"""
+        guild_id, user_id = payload["guild_id"], payload["user_id"]
+        if self.bot.get_guild(guild_id) is None or self._owns(guild_id):
+            return  # 不是這個程序看得到的伺服器，或是由自己負責
+        kind = kind_of(payload["session_type"])
+        paused = payload["table"] == "paused_sessions"
+        if paused and kind != TEXT:
+            return
+        if payload["op"] == "DELETE":
+            # 恢復時「新增進行中」可能比「刪除暫停」先到，只刪除狀態相符的
+            self.sessions.pop(guild_id, user_id, kind, paused=paused)
+        elif paused:
+            self.sessions.pause(guild_id, user_id, kind, datetime.fromisoformat(payload["time"]), payload["accumulated"] or 0)
+        else:
+            self.sessions.start(guild_id, user_id, kind, datetime.fromisoformat(payload["time"]), payload["accumulated"] or 0)
+
+    async def _resync_sessions(self, guild_ids=None):
+        """以資料表為準，重新載入（已對帳分片中）這些伺服器的進行中與暫停中計時"""
+        shards = list(self._reconciled_shards)
+        if not shards:
+            return
+        shard_count = self.bot.shard_count or 1
+        if guild_ids is None:
+            guild_ids = {guild.id for guild in self.bot.guilds if guild.shard_id in self._reconciled_shards}
+        guild_ids = set(guild_ids)
+        active_rows = await adb.get_all_active_sessions(shard_count, shards)
+        paused_rows = await adb.get_all_paused_sessions(shard_count, shards)
+
+        self.sessions.clear_guilds(guild_ids)
+        for guild_id, user_id, session_type, start_time_iso, accumulated in active_rows:
+            if guild_id in guild_ids:
+                self.sessions.start(guild_id, user_id, kind_of(session_type), datetime.fromisoformat(start_time_iso), accumulated)
+        for guild_id, user_id, session_type, pause_time_iso, accumulated in paused_rows:
+            if guild_id in guild_ids and session_type == "text":
+                self.sessions.pause(guild_id, user_id, TEXT, datetime.fromisoformat(pause_time_iso), accumulated)
+
+    def _shard_of(self, guild_id: int) -> int:
+        return utils.shard_id_for(guild_id, self.bot.shard_count or 1)
+
+    def _is_reconciled(self, guild_id: int) -> bool:
+        return self._shard_of(guild_id) in self._reconciled_shards
+
+    @staticmethod
+    def _heartbeat_job(shard_id: int) -> str:
+        """每個分片的 heartbeat 各自一個工作名稱（guild_id 欄位固定為 0）"""
+        return f"{HEARTBEAT_JOB}:{shard_id}"
+
+    async def _get_heartbeat(self, shard_id: int) -> Optional[datetime]:
+        heartbeat = (await adb.get_job_runs(self._heartbeat_job(shard_id))).get(0)
+        if heartbeat is None:
+            heartbeat = (await adb.get_job_runs(HEARTBEAT_JOB)).get(shard_id)  # 舊版紀錄
+        return heartbeat
+
+    async def _heartbeat(self, deadline: datetime, catch_up: bool):
+        # 每個分片各自記錄存活時間；對帳完成前不覆寫上次的紀錄
+        for shard_id in list(self._reconciled_shards):
+            await adb.set_job_runs(self._heartbeat_job(shard_id), [0], deadline)
+
+    async def _flush_member_names(self, deadline: datetime, catch_up: bool):
+        await self.member_names.flush()
+
+    async def _rows_with_names(self, guild: discord.Guild, rows):
+        """批次解析排行榜列的顯示名稱"""
+        return await self.member_names.resolve(guild, [uid for uid, _ in rows])
+
+    def _current_voice_members(self, shard_id: int) -> set[tuple[int, int]]:
+        """此分片目前在語音頻道中的 (guild_id, user_id)，不需要 members intent"""
+        in_voice = set()
+        for guild in self.bot.guilds:
+            if guild.shard_id != shard_id:
+                continue
+            for channel in list(guild.voice_channels) + list(guild.stage_channels):
+                for uid in channel.voice_states:
+                    member = guild.get_member(uid)
+                    if member is None or not member.bot:
+                        in_voice.add((guild.id, uid))
+        return in_voice
+
+    async def _reconcile_sessions(self, shard_id: int):
+        """分片啟動時一次性對帳：批次載入此分片進行中與暫停中的計時，並與目前的語音狀態比對
+
+        - 資料庫有語音計時、但人已不在語音：以此分片最後一次 heartbeat 為結束時間結算；
+          沒有 heartbeat 紀錄時直接移除、不計時數（不能把整段離線時間算進去）
+        - 人在語音、但沒有計時：從現在開始計時
+        - 文字計時與暫停狀態原樣恢復（含已累積秒數）
+        分片重新連線時 on_shard_ready 會再次觸發，每個分片只執行一次。
+        """
+        if shard_id in self._reconciled_shards:
+            return
+        if coordination.MULTI_PROCESS:
+            # 先確定租約，只結算/開啟自己負責的伺服器
+            await self._renew_leases(datetime.now(timezone.utc), False)
+        now = datetime.now(timezone.utc)
+        shard_count = self.bot.shard_count or 1
+        active_rows = await adb.get_all_active_sessions(shard_count, [shard_id])
+        paused_rows = await adb.get_all_paused_sessions(shard_count, [shard_id])
+        heartbeat = await self._get_heartbeat(shard_id)
+
+        in_voice = self._current_voice_members(shard_id)
+        known_guilds = {guild.id for guild in self.bot.guilds if guild.shard_id == shard_id}
+        closed_intervals = []
+        closed_keys = []
+        dropped = 0
+        for guild_id, user_id, session_type, start_time_iso, accumulated in active_rows:
+            key = (guild_id, user_id)
             try:
                 start_dt = datetime.fromisoformat(start_time_iso)
-                key = (guild_id, user_id)
-                if session_type == "voice":
-                    self.active_sessions[key] = start_dt
-                elif session_type == "text":
-                    self.text_sessions[key] = start_dt
-                print(f"✅ 恢復計時: {session_type} {guild_id}/{user_id} 開始於 {start_time_iso}")
-            except Exception as e:
+            except ValueError as e:
                 print(f"❌ 恢復計時失敗: {e}")
-
-    def cog_unload(self):
-        self.daily_announce_loop.cancel()
+                closed_keys.append((guild_id, user_id, session_type))
+                continue
+            if session_type == "text":
+                self.sessions.start(guild_id, user_id, TEXT, start_dt, accumulated)
+            elif session_type == "voice" and guild_id in known_guilds:
+                if key in in_voice or not self._owns(guild_id):
+                    self.sessions.start(guild_id, user_id, VOICE, start_dt)
+                else:
+                    if heartbeat:
+                        end_dt = min(max(start_dt, heartbeat), now)
+                        closed_intervals.append((guild_id, user_id, "voice", start_dt, end_dt))
+                    else:
+                        # 沒有存活紀錄（第一次部署或匯入的計時）：無法得知何時離開，不計入離線時間
+                        dropped += 1
+                    closed_keys.append((guild_id, user_id, "voice"))
+
+        opened = []
+        for guild_id, user_id in in_voice - self.sessions.active_keys(VOICE):
+            if not self._owns(guild_id):
+                continue
+            self.sessions.start(guild_id, user_id, VOICE, now)
+            opened.append((guild_id, user_id, "voice", now.isoformat(), 0))
+
+        for guild_id, user_id, session_type, pause_time_iso, accumulated in paused_rows:
+            if session_type == "text":
+                try:
+                    self.sessions.pause(guild_id, user_id, TEXT, datetime.fromisoformat(pause_time_iso), accumulated)
+                except ValueError as e:
+                    print(f"❌ 恢復暫停計時失敗: {e}")
+
+        self._reconciled_shards.add(shard_id)
+        await self._add_intervals(closed_intervals)
+        await adb.delete_sessions(closed_keys)
+        await adb.save_sessions(opened)
+        await adb.flush()
+        print(
+            f"✅ 分片 {shard_id} 計時對帳完成: 語音 {len(active_rows)} 筆（新開 {len(opened)}、結算 {len(closed_intervals)}、無存活紀錄捨棄 {dropped}）"
+            f"｜暫停 {len(paused_rows)} 筆"
+        )
+        for deadline in sorted(self._deferred_daily):
+            # 依序補跑等這個分片對帳完成的伺服器
+            await self._daily_job(deadline, False)
+
+    async def _get_paused_text(self, guild_id: int, user_id: int):
+        """暫停中的文字計時；此分片對帳完成前直接查資料庫"""
+        if self._is_reconciled(guild_id):
+            session = self.sessions.paused(guild_id, user_id, TEXT)
+            return (session.time.isoformat(), session.accumulated) if session else None
+        return await adb.get_paused_session(guild_id, user_id, "text")
+
+    async def cog_unload(self):
+        self.bot.scheduler.remove(DAILY_JOB)
+        self.bot.scheduler.remove(HEARTBEAT_JOB)
+        self.bot.scheduler.remove(MEMBER_NAMES_JOB)
+        self.config_reload_loop.cancel()
+        await self.member_names.close()
+        await self.replies.close()
+        if coordination.MULTI_PROCESS:
+            self.bot.scheduler.remove(LEASE_JOB)
+            await self.session_listener.stop()
+            # 釋放租約，讓其他程序不用等過期就能接手
+            await adb.flush()
+            await adb.release_guild_leases(coordination.INSTANCE_ID)
+
+    def _reload_config(self):
+        """config.json 變更時重新載入關鍵字與監聽頻道，不需重啟"""
+        self.config = load_config()
+        self.dispatcher.reload(self.config)
+        self.monitor_index.set_config_items(self.config.get("monitor_channels", []))
+        for guild in self.bot.guilds:
+            self.monitor_index.refresh_guild(guild)
+        print("🔄 已重新載入 config.json")
 
 
     # ------- 輔助邏輯 -------
-    def _add_interval(self, guild_id: int, user_id: int, start_dt: datetime, end_dt: datetime):
-        if end_dt <= start_dt:
-            return
+    async def _add_intervals(self, intervals):
+        """記錄多段 (guild_id, user_id, session_type, start, end)：原始區間與切成各學習日的時數一起寫入"""
+        if intervals:
+            await adb.add_intervals(intervals)
 
-        def next_boundary(ts: datetime) -> datetime:
-            local = ts.astimezone(utils.TW_TZ)
-            boundary_local = local.replace(hour=6, minute=0, second=0, microsecond=0)
-            if local >= boundary_local:
-                boundary_local += timedelta(days=1)
-            return boundary_local.astimezone(ts.tzinfo)
-
-        cur_start = start_dt
-        while True:
-            boundary = next_boundary(cur_start)
-            cur_end = min(boundary, end_dt)
-            secs = int((cur_end - cur_start).total_seconds())
-            if secs > 0:
-                sdate = utils.study_date_of(cur_start)
-                db.add_seconds(guild_id, user_id, sdate, secs)
-            if cur_end >= end_dt:
-                break
-            cur_start = cur_end
+    async def _add_interval(self, guild_id: int, user_id: int, session_type: str, start_dt: datetime, end_dt: datetime):
+        await self._add_intervals([(guild_id, user_id, session_type, start_dt, end_dt)])
 
-    async def _perform_daily_cut_and_announce(self):
-        # 1) 把仍在語音的人，06:00 前那段切到「昨天學習日」
-        now = datetime.now(timezone.utc)
-        now_local = now.astimezone(utils.TW_TZ)
-        boundary_local = now_local.replace(hour=6, minute=0, second=0, microsecond=0)
-        boundary = boundary_local.astimezone(now.tzinfo)
+    async def _perform_daily_cut(self, boundary: Optional[datetime] = None):
+        """把所有進行中的語音與文字計時，06:00 前那段切到「昨天學習日」
 
-        for (gid, uid), start in list(self.active_sessions.items()):
-            if start < boundary < now:
-                self._add_interval(gid, uid, start, boundary)
-                self.active_sessions[(gid, uid)] = boundary
+        先在記憶體內一次快照並把開始時間改成 06:00（中間不 await，不會被其他事件插入），
+        再把所有切出的時數與新的開始時間放進寫入緩衝，以單一交易寫回。
+        暫停中的文字計時在暫停時就已記錄，沒有進行中的時間需要切。
+        """
+        now = datetime.now(timezone.utc)
+        if boundary is None:
+            boundary = DAILY_AT.previous(now)
+        boundary = boundary.astimezone(timezone.utc)   # DAILY_AT 回傳台北時間；寫入資料表的時間一律用 UTC
+        if boundary >= now:
+            return
 
-        # 2) 昨日榜 + 本週目前（週一~昨天）公告
-        y_sdate = utils.yesterday_study_date_str()
-        wk_start = utils.current_week_start_study_date()
+        intervals = []
+        session_rows = []
+        for session in list(self.sessions.iter_active(before=boundary)):
+            gid, uid, start = session.guild_id, session.user_id, session.time
+            if not self._owns(gid):
+                continue
+            session_type = "text" if session.kind == TEXT else "voice"
+            intervals.append((gid, uid, session_type, start, boundary))
+            accumulated = 0
+            if session.kind == TEXT:
+                # 切掉的時間併入本次累積，「休」時顯示的總時數不變
+                cut_secs = sum(secs for _, secs in utils.split_by_study_day(start, boundary))
+                accumulated = session.accumulated + cut_secs
+            self.sessions.start(gid, uid, session.kind, boundary, accumulated)
+            session_rows.append((gid, uid, session_type, boundary.isoformat(), accumulated))
+
+        if not session_rows:
+            return
+        await self._add_intervals(intervals)
+        await adb.save_sessions(session_rows)
+        await adb.flush()
+        print(f"✂️ 06:00 切分完成: {len(session_rows)} 個計時")
+
+    @staticmethod
+    def _render_announcement(guild: discord.Guild, y_sdate: str, y_rows, w_rows, names=None) -> str:
+        """昨日榜 + 本週目前累積的公告文字"""
+        y_rank = utils.make_rank_map(y_rows)
+        w_rank = utils.make_rank_map(w_rows)
+        w_dict = dict(w_rows)
+
+        mentions = []
+        lines = [f"**{y_sdate}（06:00 ~ 今日06:00）讀書統計｜含本週目前累積**"]
+
+        # 依昨日榜排序列印
+        for uid, y_secs in y_rows:
+            name = utils.display_name(guild, uid, names)
+            mentions.append(f"<@{uid}>")
+
+            y_rank_no = y_rank.get(uid)
+            w_secs = w_dict.get(uid, 0)
+            w_rank_no = w_rank.get(uid, None)
+
+            lines.append(
+                f"{y_rank_no}. **{name}** — 昨天：{utils.format_hms(y_secs)}（#{y_rank_no}）｜本週目前：{utils.format_hms(w_secs)}（#{'—' if w_rank_no is None else w_rank_no}）"
+            )
+
+        header = " ".join(mentions)
+        body = "\n".join(lines)
+        return f"{header}\n{body}\n（每日 06:00 自動公告）"
+
+    async def _send_announcement(self, semaphore: asyncio.Semaphore, channel, text: str) -> bool:
+        async with semaphore:
+            try:
+                await channel.send(text)
+                return True
+            except discord.HTTPException as e:
+                # discord.py 已自動處理一般的 429；仍失敗時依 retry_after 再試一次
+                retry_after = getattr(e, "retry_after", None)
+                if e.status == 429 and retry_after:
+                    await asyncio.sleep(retry_after)
+                    try:
+                        await channel.send(text)
+                        return True
+                    except Exception as e2:
+                        e = e2
+                print(f"[WARN] announce send failed in guild {channel.guild.id}: {e}")
+            except Exception as e:
+                print(f"[WARN] announce send failed in guild {channel.guild.id}: {e}")
+            return False
+
+    async def _announce_all(self, guild_ids=None, deadline: Optional[datetime] = None):
+        """一次查出所有伺服器的昨日與本週資料，批次產生公告後並行送出
+
+        deadline 為這次公告對應的 06:00（補跑時可能是較早的時間），回傳 (統計, 送出失敗的 guild_id)。
+        """
+        t0 = time.perf_counter()
+        if deadline is None:
+            deadline = DAILY_AT.previous(datetime.now(timezone.utc))
+        today = deadline.astimezone(utils.TW_TZ).date()
+        y_sdate = (today - timedelta(days=1)).isoformat()
+        wk_start = (today - timedelta(days=today.weekday())).isoformat()
         wk_end_for_now = y_sdate
 
-        for guild in self.bot.guilds:
-            ch_id = db.get_config(guild.id, self.announce_channel_id)
+        guilds = {guild.id: guild for guild in self.bot.guilds if guild_ids is None or guild.id in guild_ids}
+        guild_ids = list(guilds)
+        configs = await adb.get_configs(guild_ids)
+        y_all = await adb.fetch_by_date_many(guild_ids, y_sdate)
+        w_all = await adb.fetch_sum_between_many(guild_ids, wk_start, wk_end_for_now)
+        t_query = time.perf_counter()
+
+        y_by_guild: dict[int, list] = {}
+        for gid, uid, secs in y_all:
+            y_by_guild.setdefault(gid, []).append((uid, secs))
+        w_by_guild: dict[int, list] = {}
+        for gid, uid, secs in w_all:
+            w_by_guild.setdefault(gid, []).append((uid, secs))
+
+        targets = []
+        for gid, y_rows in y_by_guild.items():
+            guild = guilds[gid]
+            ch_id = configs.get(gid) or self.announce_channel_id
             channel = guild.get_channel(ch_id) if ch_id else None
-            if channel is None:
-                continue
+            if channel is not None:
+                targets.append((guild, channel, y_rows))
+        names = await asyncio.gather(*(self._rows_with_names(guild, y_rows) for guild, _, y_rows in targets))
+        t_names = time.perf_counter()
+
+        outgoing = []
+        for (guild, channel, y_rows), guild_names in zip(targets, names):
+            outgoing.append((channel, self._render_announcement(guild, y_sdate, y_rows, w_by_guild.get(guild.id, []), guild_names)))
+        t_render = time.perf_counter()
+
+        semaphore = asyncio.Semaphore(ANNOUNCE_CONCURRENCY)
+        results = await asyncio.gather(*(self._send_announcement(semaphore, ch, text) for ch, text in outgoing))
+        t_send = time.perf_counter()
+
+        sent = sum(1 for ok in results if ok)
+        failed_ids = [ch.guild.id for (ch, _), ok in zip(outgoing, results) if not ok]
+        self.last_announce_stats = {
+            "study_date": y_sdate,
+            "guilds": len(guild_ids),
+            "sent": sent,
+            "failed": len(results) - sent,
+            "skipped": len(guild_ids) - len(outgoing),
+            "query_ms": round((t_query - t0) * 1000, 1),
+            "names_ms": round((t_names - t_query) * 1000, 1),
+            "render_ms": round((t_render - t_names) * 1000, 1),
+            "send_ms": round((t_send - t_render) * 1000, 1),
+            "total_ms": round((t_send - t0) * 1000, 1),
+        }
+        print(f"📣 每日公告完成: {self.last_announce_stats}")
+        return self.last_announce_stats, failed_ids
 
-            y_rows = db.fetch_by_date(guild.id, y_sdate)
-            if not y_rows:
-                continue
+    async def _perform_daily_cut_and_announce(self):
+        await self._perform_daily_cut()
+        # 多程序部署時只公告自己負責的伺服器
+        guild_ids = None if self.owned_guilds is None else set(self.owned_guilds)
+        stats, _ = await self._announce_all(guild_ids)
+        return stats
+
+    async def _daily_last_run(self) -> Optional[datetime]:
+        """此程序負責的伺服器中，最久沒完成 06:00 工作的時間；排程器從這之後逐日補跑"""
+        last_runs = await adb.get_job_runs(DAILY_JOB)
+        runs = [last_runs[g.id] for g in self.bot.guilds if self._owns(g.id) and g.id in last_runs]
+        return min(runs) if runs else None
+
+    async def _daily_job(self, deadline: datetime, catch_up: bool):
+        """排程器呼叫：只處理此 deadline 尚未完成的伺服器，完成後記錄
+
+        分片尚未對帳完成的伺服器先跳過（記憶體裡還沒有它們的計時，切分會漏掉），
+        等 _reconcile_sessions 完成後以同一個 deadline 再呼叫一次。
+        """
+        async with self._daily_lock:  # 排程與各分片對帳完成後的補跑不可同時公告
+            last_runs = await adb.get_job_runs(DAILY_JOB)
+            if catch_up and not last_runs:
+                return  # 第一次部署，沒有可補跑的紀錄
+            due = {
+                g.id for g in self.bot.guilds
+                if self._owns(g.id) and (last_runs.get(g.id) is None or last_runs[g.id] < deadline)
+            }
+            pending = {gid for gid in due if self._is_reconciled(gid)}
+            waiting = due - pending
+            shard_count = self.bot.shard_count or 1
+            shard_ids = self.bot.shard_ids if self.bot.shard_ids is not None else range(shard_count)
+            if waiting or not self._reconciled_shards.issuperset(shard_ids):
+                self._deferred_daily.add(deadline)
+            else:
+                self._deferred_daily.discard(deadline)
+            if not pending:
+                return
 
-            w_rows = db.fetch_sum_between(guild.id, wk_start, wk_end_for_now)
-            y_rank = utils.make_rank_map(y_rows)
-            w_rank = utils.make_rank_map(w_rows)
-            w_dict = dict(w_rows)
+            await self._perform_daily_cut(deadline)
+            _, failed_ids = await self._announce_all(pending, deadline)
+            await adb.set_job_runs(DAILY_JOB, pending - set(failed_ids), deadline)
 
-            mentions = []
-            lines = [f"**{y_sdate}（06:00 ~ 今日06:00）讀書統計｜含本週目前累積**"]
+    # ------- 事件監聽 -------
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        self.monitor_index.refresh_guild(guild)
+        if self.announce_channel_id:
+            await adb.set_config(guild.id, self.announce_channel_id)
 
-            # 依昨日榜排序列印
-            for uid, y_secs in y_rows:
-                member = guild.get_member(uid)
-                name = member.display_name if member else f"User {uid}"
-                mention = member.mention if member else f"<@{uid}>"
-                mentions.append(mention)
+    async def _load_monitor_index(self):
+        """從 config.json 與資料庫建立各伺服器的監聽頻道索引（只做一次）"""
+        if self._monitor_index_loaded:
+            return
+        rows = await adb.get_all_monitor_channels()
+        self.monitor_index.load_db_rows(rows)
+        for guild in self.bot.guilds:
+            self.monitor_index.refresh_guild(guild)
+        self._monitor_index_loaded = True
 
-                y_rank_no = y_rank.get(uid)
-                w_secs = w_dict.get(uid, 0)
-                w_rank_no = w_rank.get(uid, None)
+    def _is_monitor_channel(self, channel) -> bool:
+        """檢查是否為監聽的頻道（config.json 或 /add_monitor_channel 設定）"""
+        return self.monitor_index.contains(channel.guild.id, channel.id)
 
-                lines.append(
-                    f"{y_rank_no}. **{name}** — 昨天：{utils.format_hms(y_secs)}（#{y_rank_no}）｜本週目前：{utils.format_hms(w_secs)}（#{'—' if w_rank_no is None else w_rank_no}）"
-                )
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await self._load_monitor_index()
 
-            header = " ".join(mentions)
-            body = "\n".join(lines)
-            text = f"{header}\n{body}\n（每日 06:00 自動公告）"
-            try:
-                await channel.send(text)
-            except Exception as e:
-                print(f"[WARN] announce send failed in guild {guild.id}: {e}")
+    # 頻道建立、改名、刪除時，重新解析以名稱設定的監聽頻道
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel):
+        self.monitor_index.refresh_guild(channel.guild)
 
-    # ------- 事件監聽 -------
     @commands.Cog.listener()
-    async def on_guild_join(self, guild: discord.Guild):
-        if self.announce_channel_id:
-            db.set_config(guild.id, self.announce_channel_id)
+    async def on_guild_channel_update(self, before, after):
+        if before.name != after.name:
+            self.monitor_index.refresh_guild(after.guild)
 
-    def _is_monitor_channel(self, channel) -> bool:
-        """檢查是否為監聽的頻道（從 config.json 讀取）"""
-        monitor_list = self.config.get("monitor_channels", [])
-        for item in monitor_list:
-            # 支援頻道 ID（字串或數字）或頻道名稱
-            if str(channel.id) == str(item):
-                return True
-            if channel.name == item:
-                return True
-        return False
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.monitor_index.refresh_guild(channel.guild)
+
+    @commands.Cog.listener()
+    async def on_thread_create(self, thread):
+        self.monitor_index.refresh_guild(thread.guild)
 
     @commands.Cog.listener()
+    async def on_thread_update(self, before, after):
+        if before.name != after.name:
+            self.monitor_index.refresh_guild(after.guild)
+
+    @commands.Cog.listener()
+    @timed("event.on_message")
     async def on_message(self, message: discord.Message):
         """監聽文字頻道訊息，偵測讀/休關鍵字"""
         # 忽略機器人訊息
@@ -163,125 +563,121 @@ class Study(commands.Cog):
         if message.guild is None:
             return
         
-        # 檢查是否為監聽的頻道（從 config.json）
+        # 檢查是否為監聽的頻道
         if not self._is_monitor_channel(message.channel):
             return
+
+        # 多程序部署時只處理自己負責的伺服器
+        if not self._owns(message.guild.id):
+            return
+
+        if isinstance(message.author, discord.Member):
+            self.member_names.remember(message.author)
         
-        content = message.content.strip()
-        key = (message.guild.id, message.author.id)
+        action = self.dispatcher.classify(message.content)
+        if action is None:
+            return
+        incr(f"keyword.{action}")
+
+        guild_id, user_id = message.guild.id, message.author.id
         now = datetime.now(timezone.utc)
         
-        # 從 config 讀取關鍵字
-        study_keywords = self.config.get("study_keywords", ["讀", "讀書", "開始", "start"])
-        rest_keywords = self.config.get("rest_keywords", ["休", "休息", "結束", "end", "stop"])
-        pause_keywords = self.config.get("pause_keywords", ["拉", "暫停"])
-        resume_keywords = self.config.get("resume_keywords", ["拉完", "爽", "繼續"])
-        
         # 開始讀書
-        if content in study_keywords:
+        if action == keywords.STUDY:
             # 檢查是否有暫停的計時
-            paused = db.get_paused_session(message.guild.id, message.author.id, "text")
+            paused = await self._get_paused_text(guild_id, user_id)
             if paused:
-                # 恢復暫停的計時
+                # 恢復暫停的計時（累積時間一併保存在記憶體）
                 pause_time_iso, accumulated_secs = paused
-                self.text_sessions[key] = now
-                db.delete_paused_session(message.guild.id, message.author.id, "text")
-                db.save_session(message.guild.id, message.author.id, "text", now.isoformat())
-                # 存儲累積時間在記憶體
-                if not hasattr(self, 'accumulated_text_time'):
-                    self.accumulated_text_time = {}
-                self.accumulated_text_time[key] = accumulated_secs
-                await message.add_reaction("📚")
-                await message.reply(f"繼續讀書！已累積 {utils.format_hms(accumulated_secs)} 📖", mention_author=False)
+                self.sessions.start(guild_id, user_id, TEXT, now, accumulated_secs)
+                await adb.delete_paused_session(guild_id, user_id, "text")
+                await adb.save_session(guild_id, user_id, "text", now.isoformat(), accumulated_secs)
+                self.replies.send(message, f"繼續讀書！已累積 {utils.format_hms(accumulated_secs)} 📖", "📚")
                 return
             
-            if key in self.text_sessions:
+            session = self.sessions.active(guild_id, user_id, TEXT)
+            if session:
                 # 已經在讀書中
-                start_time = self.text_sessions[key]
+                start_time = session.time
                 elapsed = now - start_time
-                await message.reply(
-                    f"你已經在讀書中了！開始時間：<t:{int(start_time.timestamp())}:T>，已經過 {utils.format_hms(int(elapsed.total_seconds()))}",
-                    mention_author=False
+                self.replies.send(
+                    message,
+                    f"你已經在讀書中了！開始時間：<t:{int(start_time.timestamp())}:T>，已經過 {utils.format_hms(int(elapsed.total_seconds()))}"
                 )
             else:
-                self.text_sessions[key] = now
-                db.save_session(message.guild.id, message.author.id, "text", now.isoformat())
-                if not hasattr(self, 'accumulated_text_time'):
-                    self.accumulated_text_time = {}
-                self.accumulated_text_time[key] = 0
-                await message.add_reaction("📚")
-                await message.reply(f"開始計時！加油！ 📖", mention_author=False)
+                self.sessions.start(guild_id, user_id, TEXT, now)
+                await adb.save_session(guild_id, user_id, "text", now.isoformat())
+                self.replies.send(message, f"開始計時！加油！ 📖", "📚")
             return
         
         # 暫停讀書
-        if content in pause_keywords:
-            if key in self.text_sessions:
-                start = self.text_sessions.pop(key)
+        if action == keywords.PAUSE:
+            session = self.sessions.active(guild_id, user_id, TEXT)
+            if session:
+                start = session.time
                 elapsed = int((now - start).total_seconds())
-                if not hasattr(self, 'accumulated_text_time'):
-                    self.accumulated_text_time = {}
-                accumulated = self.accumulated_text_time.get(key, 0) + elapsed
-                db.pause_session(message.guild.id, message.author.id, "text", now.isoformat(), accumulated)
-                db.delete_session(message.guild.id, message.author.id, "text")
-                await message.add_reaction("⏸️")
-                await message.reply(f"暫停了！已累積 {utils.format_hms(accumulated)} ⏸️", mention_author=False)
+                accumulated = session.accumulated + elapsed
+                # 暫停前這段先記錄，恢復後重新起算
+                self.sessions.pause(guild_id, user_id, TEXT, now, accumulated)
+                await self._add_interval(guild_id, user_id, "text", start, now)
+                await adb.pause_session(guild_id, user_id, "text", now.isoformat(), accumulated)
+                await adb.delete_session(guild_id, user_id, "text")
+                self.replies.send(message, f"暫停了！已累積 {utils.format_hms(accumulated)} ⏸️", "⏸️")
             else:
-                paused = db.get_paused_session(message.guild.id, message.author.id, "text")
+                paused = await self._get_paused_text(guild_id, user_id)
                 if paused:
                     _, accumulated_secs = paused
-                    await message.reply(f"已暫停，累積時間 {utils.format_hms(accumulated_secs)}。打「繼續」繼續讀書。", mention_author=False)
+                    self.replies.send(message, f"已暫停，累積時間 {utils.format_hms(accumulated_secs)}。打「繼續」繼續讀書。")
                 else:
-                    await message.reply("你還沒開始讀書喔！", mention_author=False)
+                    self.replies.send(message, "你還沒開始讀書喔！")
             return
         
         # 繼續讀書（從暫停狀態）
-        if content in resume_keywords:
-            if key in self.text_sessions:
-                await message.reply("你已經在讀書中了！", mention_author=False)
+        if action == keywords.RESUME:
+            if self.sessions.active(guild_id, user_id, TEXT):
+                self.replies.send(message, "你已經在讀書中了！")
                 return
-            paused = db.get_paused_session(message.guild.id, message.author.id, "text")
+            paused = await self._get_paused_text(guild_id, user_id)
             if not paused:
-                await message.reply("沒有暫停的計時。打「讀」開始新的計時。", mention_author=False)
+                self.replies.send(message, "沒有暫停的計時。打「讀」開始新的計時。")
                 return
             # 恢復計時
             pause_time_iso, accumulated_secs = paused
-            self.text_sessions[key] = now
-            db.delete_paused_session(message.guild.id, message.author.id, "text")
-            db.save_session(message.guild.id, message.author.id, "text", now.isoformat())
-            if not hasattr(self, 'accumulated_text_time'):
-                self.accumulated_text_time = {}
-            self.accumulated_text_time[key] = accumulated_secs
-            await message.add_reaction("📚")
-            await message.reply(f"繼續讀書！已累積 {utils.format_hms(accumulated_secs)} 📖", mention_author=False)
+            self.sessions.start(guild_id, user_id, TEXT, now, accumulated_secs)
+            await adb.delete_paused_session(guild_id, user_id, "text")
+            await adb.save_session(guild_id, user_id, "text", now.isoformat(), accumulated_secs)
+            self.replies.send(message, f"繼續讀書！已累積 {utils.format_hms(accumulated_secs)} 📖", "📚")
             return
         
         # 結束讀書
-        if content in rest_keywords:
-            if key in self.text_sessions:
-                start = self.text_sessions.pop(key)
+        if action == keywords.REST:
+            session = self.sessions.pop(guild_id, user_id, TEXT, paused=False)
+            if session:
+                start = session.time
                 elapsed = int((now - start).total_seconds())
-                if not hasattr(self, 'accumulated_text_time'):
-                    self.accumulated_text_time = {}
-                accumulated = self.accumulated_text_time.pop(key, 0) + elapsed
+                accumulated = session.accumulated + elapsed
                 # 計算結束時間
-                self._add_interval(message.guild.id, message.author.id, start, now)
-                db.delete_session(message.guild.id, message.author.id, "text")
-                db.delete_paused_session(message.guild.id, message.author.id, "text")
-                await message.add_reaction("🎉")
-                await message.reply(
+                await self._add_interval(guild_id, user_id, "text", start, now)
+                await adb.delete_session(guild_id, user_id, "text")
+                await adb.delete_paused_session(guild_id, user_id, "text")
+                self.replies.send(
+                    message,
                     f"辛苦了！這次讀書時間：{utils.format_hms(elapsed)}（含暫停累積 {utils.format_hms(accumulated)}） ☕",
-                    mention_author=False
+                    "🎉"
                 )
             else:
-                await message.reply("還沒讀書就想休息喔，傻屌。滾去讀書吧!", mention_author=False)
+                self.replies.send(message, "還沒讀書就想休息喔，傻屌。滾去讀書吧!")
             return
 
     @commands.Cog.listener()
+    @timed("event.on_voice_state_update")
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
         if member.bot or member.guild is None:
             return
+        if not self._owns(member.guild.id):
+            return  # 由其他程序處理，狀態經 NOTIFY 同步
+        self.member_names.remember(member)
 
-        key = (member.guild.id, member.id)
         now = datetime.now(timezone.utc)
 
         joined_before = before.channel is not None
@@ -289,28 +685,32 @@ class Study(commands.Cog):
 
         # 進入語音：開始計時
         if (not joined_before) and joined_after:
-            self.active_sessions[key] = now
-            db.save_session(member.guild.id, member.id, "voice", now.isoformat())
+            self.sessions.start(member.guild.id, member.id, VOICE, now)
+            await adb.save_session(member.guild.id, member.id, "voice", now.isoformat())
             return
 
         # 離開語音：結束計時
         if joined_before and (not joined_after):
-            start = self.active_sessions.pop(key, None)
-            if start:
-                self._add_interval(member.guild.id, member.id, start, now)
-            db.delete_session(member.guild.id, member.id, "voice")
+            session = self.sessions.pop(member.guild.id, member.id, VOICE)
+            if session:
+                await self._add_interval(member.guild.id, member.id, "voice", session.time, now)
+            await adb.delete_session(member.guild.id, member.id, "voice")
             return
         # 在語音內換頻道：忽略
 
     # ------- 定時任務 -------
-    @tasks.loop(minutes=1)
-    async def daily_announce_loop(self):
-        now_local = datetime.now(utils.TW_TZ)
-        if now_local.hour == 6 and now_local.minute == 0:
-            await self._perform_daily_cut_and_announce()
-
-    @daily_announce_loop.before_loop
-    async def _before_daily_announce(self):
+    @tasks.loop(seconds=CONFIG_RELOAD_INTERVAL)
+    async def config_reload_loop(self):
+        mtime = config_mtime()
+        if mtime != self._config_mtime:
+            self._config_mtime = mtime
+            try:
+                self._reload_config()
+            except Exception as e:
+                print(f"❌ 重新載入 config.json 失敗: {e}")
+
+    @config_reload_loop.before_loop
+    async def _before_config_reload(self):
         await self.bot.wait_until_ready()
 
     # ------- Slash Commands -------
@@ -322,11 +722,12 @@ class Study(commands.Cog):
             return await interaction.followup.send("僅能在伺服器內使用。", ephemeral=True)
 
         sdate = utils.study_date_of(datetime.now(timezone.utc))
-        rows = db.fetch_by_date(guild.id, sdate)
+        rows = await adb.fetch_by_date(guild.id, sdate)
         if not rows:
             return await interaction.followup.send("今天目前還沒有記錄。", ephemeral=True)
 
-        await interaction.followup.send(utils.format_table(guild, rows, title=f"今天（學習日 {sdate}）"), ephemeral=True)
+        names = await self._rows_with_names(guild, rows)
+        await interaction.followup.send(utils.format_table(guild, rows, title=f"今天（學習日 {sdate}）", names=names), ephemeral=True)
 
     @app_commands.command(name="week", description="顯示本週（週一06:00起）各成員累積讀書時間")
     async def cmd_week(self, interaction: discord.Interaction):
@@ -336,11 +737,41 @@ class Study(commands.Cog):
             return await interaction.followup.send("僅能在伺服器內使用。", ephemeral=True)
 
         start_date, end_date = utils.current_week_range()
-        rows = db.fetch_sum_between(guild.id, start_date, end_date)
+        rows = await adb.fetch_week(guild.id, start_date)
         if not rows:
             return await interaction.followup.send("本週尚無記錄。", ephemeral=True)
 
-        await interaction.followup.send(utils.format_table(guild, rows, title=f"本週（{start_date} ~ {end_date}）"), ephemeral=True)
+        names = await self._rows_with_names(guild, rows)
+        await interaction.followup.send(utils.format_table(guild, rows, title=f"本週（{start_date} ~ {end_date}）", names=names), ephemeral=True)
+
+    @app_commands.command(name="month", description="顯示本月各成員累積讀書時間")
+    async def cmd_month(self, interaction: discord.Interaction):
+        await interaction.response.defer(thinking=True, ephemeral=True)
+        guild = interaction.guild
+        if guild is None:
+            return await interaction.followup.send("僅能在伺服器內使用。", ephemeral=True)
+
+        month = utils.study_date_of(datetime.now(timezone.utc))[:7]
+        rows = await adb.fetch_month(guild.id, month)
+        if not rows:
+            return await interaction.followup.send("本月尚無記錄。", ephemeral=True)
+
+        names = await self._rows_with_names(guild, rows)
+        await interaction.followup.send(utils.format_table(guild, rows, title=f"本月（{month}）", names=names), ephemeral=True)
+
+    @app_commands.command(name="alltime", description="顯示歷史累積讀書時間總排行")
+    async def cmd_alltime(self, interaction: discord.Interaction):
+        await interaction.response.defer(thinking=True, ephemeral=True)
+        guild = interaction.guild
+        if guild is None:
+            return await interaction.followup.send("僅能在伺服器內使用。", ephemeral=True)
+
+        rows = await adb.fetch_alltime(guild.id)
+        if not rows:
+            return await interaction.followup.send("目前還沒有任何記錄。", ephemeral=True)
+
+        names = await self._rows_with_names(guild, rows)
+        await interaction.followup.send(utils.format_table(guild, rows, title="歷史總排行", names=names), ephemeral=True)
 
     @app_commands.command(name="leaderboard", description="顯示最近 7 天合計讀書時間排行榜")
     async def cmd_leaderboard(self, interaction: discord.Interaction):
@@ -351,24 +782,42 @@ class Study(commands.Cog):
 
         end_date = utils.study_date_of(datetime.now(timezone.utc))
         start_date = (datetime.fromisoformat(end_date).date() - timedelta(days=6)).isoformat()
-        rows = db.fetch_sum_between(guild.id, start_date, end_date)
+        rows = await adb.fetch_sum_between(guild.id, start_date, end_date)
         if not rows:
             return await interaction.followup.send("最近 7 天沒有記錄。", ephemeral=True)
 
-        await interaction.followup.send(utils.format_table(guild, rows, title=f"最近 7 天（{start_date} ~ {end_date}）"), ephemeral=True)
+        names = await self._rows_with_names(guild, rows)
+        await interaction.followup.send(utils.format_table(guild, rows, title=f"最近 7 天（{start_date} ~ {end_date}）", names=names), ephemeral=True)
 
     @app_commands.command(name="me", description="顯示你今天與本週的累積時數")
-    async def cmd_me(self, interaction: discord.Interaction):
+    @app_commands.describe(mode="summary：今天與本週（預設）；history：連續天數、平均、分布與熱度圖")
+    @app_commands.choices(mode=[
+        app_commands.Choice(name="summary", value="summary"),
+        app_commands.Choice(name="history", value="history"),
+    ])
+    async def cmd_me(self, interaction: discord.Interaction, mode: str = "summary"):
         await interaction.response.defer(thinking=True, ephemeral=True)
         guild = interaction.guild
         user = interaction.user
         if guild is None:
             return await interaction.followup.send("僅能在伺服器內使用。", ephemeral=True)
 
-        today = utils.study_date_of(datetime.now(timezone.utc))
+        now = datetime.now(timezone.utc)
+        today = utils.study_date_of(now)
+        if mode == "history":
+            daily, intervals = await asyncio.gather(
+                adb.fetch_user_daily(guild.id, user.id),
+                adb.fetch_user_intervals(guild.id, user.id, (now - timedelta(days=history.HISTORY_INTERVAL_DAYS)).isoformat()),
+            )
+            daily = [row for row in daily if row[0] <= today]
+            if not daily:
+                return await interaction.followup.send("你還沒有任何記錄。", ephemeral=True)
+            stats = history.analyze(daily, intervals, today)
+            return await interaction.followup.send(history.render(stats, user.mention), ephemeral=True)
+
         wk_start = utils.current_week_start_study_date()
-        me_today = db.fetch_user_sum_on(guild.id, user.id, today)
-        me_week  = db.fetch_user_sum_between(guild.id, user.id, wk_start, today)
+        me_today = await adb.fetch_user_sum_on(guild.id, user.id, today)
+        me_week  = await adb.fetch_user_sum_between(guild.id, user.id, wk_start, today)
 
         await interaction.followup.send(
             f"{user.mention}\n今天：{utils.format_hms(me_today)}\n本週：{utils.format_hms(me_week)}",
@@ -380,7 +829,7 @@ class Study(commands.Cog):
     async def cmd_set_announce_channel(self, interaction: discord.Interaction, channel: discord.TextChannel):
         if not interaction.user.guild_permissions.manage_guild:
             return await interaction.response.send_message("需要『管理伺服器』權限。", ephemeral=True)
-        db.set_config(interaction.guild.id, channel.id)
+        await adb.set_config(interaction.guild.id, channel.id)
         await interaction.response.send_message(f"已設定公告頻道為 {channel.mention}。", ephemeral=True)
 
     @app_commands.command(name="add_monitor_channel", description="新增監聽頻道（在此頻道打「讀」「休」可計時）")
@@ -388,7 +837,8 @@ class Study(commands.Cog):
     async def cmd_add_monitor_channel(self, interaction: discord.Interaction, channel: discord.TextChannel):
         if not interaction.user.guild_permissions.manage_guild:
             return await interaction.response.send_message("需要『管理伺服器』權限。", ephemeral=True)
-        db.add_monitor_channel(interaction.guild.id, channel.id)
+        await adb.add_monitor_channel(interaction.guild.id, channel.id)
+        self.monitor_index.add(interaction.guild.id, channel.id)
         await interaction.response.send_message(
             f"已新增監聽頻道 {channel.mention}。\n"
             f"成員可在此頻道輸入「讀」開始計時，「休」結束計時。",
@@ -400,7 +850,8 @@ class Study(commands.Cog):
     async def cmd_remove_monitor_channel(self, interaction: discord.Interaction, channel: discord.TextChannel):
         if not interaction.user.guild_permissions.manage_guild:
             return await interaction.response.send_message("需要『管理伺服器』權限。", ephemeral=True)
-        db.remove_monitor_channel(interaction.guild.id, channel.id)
+        await adb.remove_monitor_channel(interaction.guild.id, channel.id)
+        self.monitor_index.remove(interaction.guild.id, channel.id)
         await interaction.response.send_message(f"已移除監聽頻道 {channel.mention}。", ephemeral=True)
 
     @app_commands.command(name="list_monitor_channels", description="列出所有監聽頻道")
@@ -409,7 +860,7 @@ class Study(commands.Cog):
         if guild is None:
             return await interaction.response.send_message("僅能在伺服器內使用。", ephemeral=True)
         
-        channel_ids = db.get_monitor_channels(guild.id)
+        channel_ids = await adb.get_monitor_channels(guild.id)
         if not channel_ids:
             return await interaction.response.send_message("目前沒有設定任何監聽頻道。", ephemeral=True)
         
@@ -432,29 +883,29 @@ class Study(commands.Cog):
         if guild is None:
             return await interaction.response.send_message("僅能在伺服器內使用。", ephemeral=True)
         
+        voice, text = [], []
+        for session in self.sessions.guild_sessions(guild.id):
+            if not session.paused:
+                (text if session.kind == TEXT else voice).append((session.user_id, session.time))
+        if not voice and not text:
+            return await interaction.response.send_message("目前沒有人在讀書中。", ephemeral=True)
+
+        await interaction.response.defer(thinking=True, ephemeral=True)
+        names = await self._rows_with_names(guild, voice + text)
         now = datetime.now(timezone.utc)
         studying = []
-        
+
         # 語音讀書中的成員
-        for (gid, uid), start in self.active_sessions.items():
-            if gid == guild.id:
-                member = guild.get_member(uid)
-                name = member.display_name if member else f"User {uid}"
-                elapsed = utils.format_hms(int((now - start).total_seconds()))
-                studying.append(f"🎧 {name} — {elapsed}（語音）")
-        
+        for uid, start in voice:
+            elapsed = utils.format_hms(int((now - start).total_seconds()))
+            studying.append(f"🎧 {utils.display_name(guild, uid, names)} — {elapsed}（語音）")
+
         # 文字頻道讀書中的成員
-        for (gid, uid), start in self.text_sessions.items():
-            if gid == guild.id:
-                member = guild.get_member(uid)
-                name = member.display_name if member else f"User {uid}"
-                elapsed = utils.format_hms(int((now - start).total_seconds()))
-                studying.append(f"📚 {name} — {elapsed}（文字）")
-        
-        if not studying:
-            return await interaction.response.send_message("目前沒有人在讀書中。", ephemeral=True)
-        
-        await interaction.response.send_message(
+        for uid, start in text:
+            elapsed = utils.format_hms(int((now - start).total_seconds()))
+            studying.append(f"📚 {utils.display_name(guild, uid, names)} — {elapsed}（文字）")
+
+        await interaction.followup.send(
             "**📖 正在讀書中：**\n" + "\n".join(studying),
             ephemeral=True
         )
@@ -0,0 +1,103 @@
+"""
+多程序協調：active_sessions / paused_sessions 表是唯一的真實狀態，
+各程序透過 PostgreSQL LISTEN/NOTIFY 收到其他程序的變更並同步記憶體（monitor_channels / config 的變更也走同一個通道）；
+伺服器租約（guild_leases）決定哪個程序處理該伺服器的事件與 06:00 工作。
+
+MULTI_PROCESS=1 時啟用；單一程序部署不需要。
+"""
+import asyncio
+import json
+import os
+
+import psycopg2
+
+from . import database as db
+
+MULTI_PROCESS = os.environ.get('MULTI_PROCESS', '0') == '1'
+LEASE_TTL = int(os.environ.get('LEASE_TTL', '90'))                       # 租約有效秒數
+LEASE_RENEW_INTERVAL = int(os.environ.get('LEASE_RENEW_INTERVAL', '30')) # 續約間隔
+LISTEN_RECONNECT_DELAY = 5
+
+INSTANCE_ID = db.INSTANCE_ID
+
+
+class SessionListener:
+    """以獨立的 autocommit 連線 LISTEN，把其他程序的 session 變更交給 on_change
+
+    連線中斷時自動重連，重連後呼叫 on_resync，讓呼叫端從資料表重新載入（期間的通知可能遺失）。
+    """
+
+    def __init__(self, on_change, on_resync=None, channel: str = db.SESSION_NOTIFY_CHANNEL):
+        self.on_change = on_change
+        self.on_resync = on_resync
+        self.channel = channel
+        self._conn = None
+        self._loop = None
+        self._closing = False
+        self.received = 0
+        self.reconnects = 0
+
+    def _connect(self):
+        conn = psycopg2.connect(db.DATABASE_URL, sslmode=db.DB_SSLMODE, application_name=f"{INSTANCE_ID}-listen")
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel}")
+        return conn
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._closing = False
+        self._conn = await self._loop.run_in_executor(None, self._connect)
+        self._loop.add_reader(self._conn.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except psycopg2.Error as e:
+            print(f"[WARN] LISTEN 連線中斷: {e}")
+            self._drop()
+            self._loop.create_task(self._reconnect())
+            return
+        while self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            try:
+                payload = json.loads(notify.payload)
+            except ValueError:
+                continue
+            if payload.get("origin") == INSTANCE_ID:
+                continue  # 自己寫入的變更
+            self.received += 1
+            try:
+                self.on_change(payload)
+            except Exception as e:
+                print(f"[WARN] 處理 session 通知失敗: {e}")
+
+    def _drop(self):
+        if self._conn is None:
+            return
+        try:
+            self._loop.remove_reader(self._conn.fileno())
+        except (ValueError, OSError):
+            pass
+        try:
+            self._conn.close()
+        except psycopg2.Error:
+            pass
+        self._conn = None
+
+    async def _reconnect(self):
+        while not self._closing:
+            await asyncio.sleep(LISTEN_RECONNECT_DELAY)
+            try:
+                await self.start()
+            except psycopg2.Error as e:
+                print(f"[WARN] LISTEN 重連失敗: {e}")
+                continue
+            self.reconnects += 1
+            if self.on_resync is not None:
+                await self.on_resync()
+            return
+
+    async def stop(self):
+        self._closing = True
+        self._drop()
@@ -1,31 +1,208 @@
 import psycopg2
 from psycopg2 import extras
+from psycopg2 import pool as pg_pool
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+import csv
+import functools
+import io
 import os
+import socket
+import threading
+import time
+
+from . import utils
 
 # ========= DB 設定 =========
 # Railway 會自動提供 DATABASE_URL 環境變數，本地測試時需手動設定
 DATABASE_URL = os.environ.get('DATABASE_URL')
+DB_SSLMODE = os.environ.get('DB_SSLMODE', 'require')   # 本機無 SSL 的資料庫可設為 disable
 
-def db_exec(sql: str, params=(), commit=False):
-    """執行 SQL 指令並回傳結果"""
-    # PostgreSQL 使用 %s 而不是 ?
-    sql = sql.replace('?', '%s')
-    
-    conn = psycopg2.connect(DATABASE_URL, sslmode='require')
-    try:
-        with conn:
+# 連線池設定（可用環境變數調整）
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))          # 借連線最多等幾秒
+DB_HEALTHCHECK_IDLE = float(os.environ.get('DB_HEALTHCHECK_IDLE', '30'))  # 閒置超過幾秒，借出前先 SELECT 1
+
+# 此程序的識別名稱，設為連線的 application_name，
+# 讓 LISTEN/NOTIFY 的通知可以分辨是不是自己寫入的
+INSTANCE_ID = os.environ.get('INSTANCE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+
+# ========= 連線池 =========
+class ConnectionPool:
+    """執行緒安全的 PostgreSQL 連線池：借出前健康檢查、斷線自動重連、統計資訊"""
+
+    def __init__(self, dsn: str, minconn: int, maxconn: int, timeout: float, healthcheck_idle: float):
+        self._pool = pg_pool.ThreadedConnectionPool(
+            minconn, maxconn, dsn, sslmode=DB_SSLMODE, application_name=INSTANCE_ID
+        )
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used: dict[int, float] = {}
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        # 統計
+        self.in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.reconnects = 0
+        self.healthcheck_failures = 0
+        self.total_checkout_ms = 0.0
+        self.max_checkout_ms = 0.0
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        idle = time.monotonic() - self._last_used.get(id(conn), 0.0)
+        if idle < self.healthcheck_idle:
+            return True
+        try:
             with conn.cursor() as cur:
-                cur.execute(sql, params)
-                if commit:
-                    conn.commit()
-                if cur.description: # 如果有回傳結果 (SELECT)
-                    return cur.fetchall()
-                return []
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        try:
+            self._pool.putconn(conn, close=True)
+        except pg_pool.PoolError:
+            pass
+
+    def getconn(self):
+        t0 = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                raise pg_pool.PoolError(f"連線池已滿（{self.maxconn}），等待 {self.timeout} 秒仍無可用連線")
+        try:
+            conn = self._pool.getconn()
+            if not self._is_healthy(conn):
+                with self._lock:
+                    self.healthcheck_failures += 1
+                    self.reconnects += 1
+                self._discard(conn)
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.total_checkout_ms += elapsed_ms
+            self.max_checkout_ms = max(self.max_checkout_ms, elapsed_ms)
+        return conn
+
+    def putconn(self, conn, broken: bool = False):
+        try:
+            if broken or conn.closed:
+                with self._lock:
+                    self.reconnects += 1
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            avg = self.total_checkout_ms / self.checkouts if self.checkouts else 0.0
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "reconnects": self.reconnects,
+                "healthcheck_failures": self.healthcheck_failures,
+                "avg_checkout_ms": round(avg, 3),
+                "max_checkout_ms": round(self.max_checkout_ms, 3),
+            }
+
+    def closeall(self):
+        self._pool.closeall()
+        self._last_used.clear()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """取得（必要時建立）全域連線池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_HEALTHCHECK_IDLE)
+    return _pool
+
+def pool_stats() -> dict:
+    """連線池統計（尚未建立時回傳空 dict）"""
+    return _pool.stats() if _pool is not None else {}
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+@contextmanager
+def connection():
+    """從連線池借出一條連線，用完自動歸還；連線中斷時丟棄"""
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = bool(conn.closed)
+        raise
     finally:
-        conn.close()
+        pool.putconn(conn, broken=broken)
 
-def ensure_db():
-    """初始化資料庫表結構"""
+@functools.lru_cache(maxsize=512)
+def _pg_sql(sql: str) -> str:
+    """PostgreSQL 使用 %s 而不是 ?；SQL 字串固定，轉換結果快取起來"""
+    return sql.replace('?', '%s')
+
+def db_exec(sql: str, params=(), commit=False):
+    """執行 SQL 指令並回傳結果"""
+    sql = _pg_sql(sql)
+
+    # 唯讀查詢在連線剛好斷掉時重試一次；寫入不重試，避免重複累加
+    attempts = 1 if commit else 2
+    for attempt in range(attempts):
+        try:
+            with connection() as conn:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.execute(sql, params)
+                        if cur.description: # 如果有回傳結果 (SELECT)
+                            return cur.fetchall()
+                        return []
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            if attempt + 1 >= attempts:
+                raise
+
+# ========= Schema 版本管理 =========
+# 每個 migration 只會執行一次，版本記錄在 schema_version 表；
+# 多個程序同時啟動時以 advisory lock 保證只有一個在跑 migration。
+SCHEMA_LOCK_KEY = 7_420_001
+TIME_LOG_PARTITION_MONTHS_AHEAD = 2
+
+def _migrate_1_baseline(conn):
+    """基本資料表與週/月/總計彙總表"""
     commands = [
         # 使用 BIGINT 確保 Discord ID 不會報錯
         """
@@ -68,17 +245,418 @@ def ensure_db():
             channel_id BIGINT NOT NULL,
             PRIMARY KEY (guild_id, channel_id)
         );
+        """,
+        # 排行榜用的彙總表，與 time_log 在同一個交易內更新
+        """
+        CREATE TABLE IF NOT EXISTS time_log_weekly (
+            guild_id   BIGINT NOT NULL,
+            user_id    BIGINT NOT NULL,
+            week_start TEXT   NOT NULL,
+            seconds    BIGINT NOT NULL,
+            PRIMARY KEY (guild_id, week_start, user_id)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS time_log_monthly (
+            guild_id   BIGINT NOT NULL,
+            user_id    BIGINT NOT NULL,
+            month      TEXT   NOT NULL,
+            seconds    BIGINT NOT NULL,
+            PRIMARY KEY (guild_id, month, user_id)
+        );
+        """,
         """
+        CREATE TABLE IF NOT EXISTS time_log_alltime (
+            guild_id   BIGINT NOT NULL,
+            user_id    BIGINT NOT NULL,
+            seconds    BIGINT NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        );
+        """,
+    ]
+
+    # 彙總表第一次建立時，從既有的 time_log 回填
+    backfill = [
+        """
+        INSERT INTO time_log_weekly(guild_id, user_id, week_start, seconds)
+        SELECT guild_id, user_id, to_char(date_trunc('week', study_date::date), 'YYYY-MM-DD'), SUM(seconds)
+        FROM time_log
+        WHERE NOT EXISTS (SELECT 1 FROM time_log_weekly)
+        GROUP BY 1, 2, 3
+        """,
+        """
+        INSERT INTO time_log_monthly(guild_id, user_id, month, seconds)
+        SELECT guild_id, user_id, substr(study_date, 1, 7), SUM(seconds)
+        FROM time_log
+        WHERE NOT EXISTS (SELECT 1 FROM time_log_monthly)
+        GROUP BY 1, 2, 3
+        """,
+        """
+        INSERT INTO time_log_alltime(guild_id, user_id, seconds)
+        SELECT guild_id, user_id, SUM(seconds)
+        FROM time_log
+        WHERE NOT EXISTS (SELECT 1 FROM time_log_alltime)
+        GROUP BY 1, 2
+        """,
     ]
     
-    conn = psycopg2.connect(DATABASE_URL, sslmode='require')
-    try:
+    with conn.cursor() as cur:
+        for cmd in commands + backfill:
+            cur.execute(cmd)
+    conn.commit()
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+def _next_month(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _create_time_log_partition(cur, parent: str, month: date):
+    """建立 parent 的單月分區；若 DEFAULT 分區已有該月資料，先搬出再掛上"""
+    name = f"{parent}_p{month:%Y_%m}"
+    start, end = month.isoformat(), _next_month(month).isoformat()
+    cur.execute("SELECT to_regclass(%s)", (name,))
+    if cur.fetchone()[0] is not None:
+        return
+    cur.execute(f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS)")
+    cur.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {parent}_default WHERE study_date >= %s AND study_date < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+        """,
+        (start, end),
+    )
+    cur.execute(f"ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+
+def _study_today() -> date:
+    """目前的學習日（Asia/Taipei 06:00 換日）；time_log 依學習日分區，不能用主機時區的 date.today()"""
+    return date.fromisoformat(utils.study_date_of(datetime.now(timezone.utc)))
+
+def ensure_time_log_partitions(months_ahead: int = TIME_LOG_PARTITION_MONTHS_AHEAD, parent: str = "time_log"):
+    """確保本月與未來幾個月的 time_log 分區存在（啟動時與每日排程呼叫）"""
+    with connection() as conn:
         with conn:
             with conn.cursor() as cur:
-                for cmd in commands:
-                    cur.execute(cmd)
-    finally:
-        conn.close()
+                month = _month_start(_study_today())
+                for _ in range(months_ahead + 1):
+                    _create_time_log_partition(cur, parent, month)
+                    month = _next_month(month)
+
+def _migrate_2_date_partitioned_time_log(conn):
+    """study_date 改為 DATE、time_log 依月份分區、加上 covering index（線上遷移）
+
+    1. 建立分區表 time_log_new，並在舊表加 trigger，把遷移期間的寫入同步過去
+    2. 依月份分批複製舊資料（每批各自 commit，不長時間鎖表）
+    3. 短交易內鎖表、移除 trigger、互換表名；舊表保留為 time_log_legacy 供人工確認後刪除
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('time_log')")
+        row = cur.fetchone()
+        if row and row[0] == 'p':
+            return  # 已是分區表
+
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS time_log_new (
+                guild_id   BIGINT  NOT NULL,
+                user_id    BIGINT  NOT NULL,
+                study_date DATE    NOT NULL,
+                seconds    INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, user_id, study_date)
+            ) PARTITION BY RANGE (study_date)
+            """
+        )
+        cur.execute("CREATE TABLE IF NOT EXISTS time_log_new_default PARTITION OF time_log_new DEFAULT")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS time_log_guild_date_cover_idx "
+            "ON time_log_new (guild_id, study_date, user_id) INCLUDE (seconds)"
+        )
+
+        cur.execute("SELECT MIN(study_date), MAX(study_date) FROM time_log")
+        lo, hi = cur.fetchone()
+        today = _study_today()
+        first = _month_start(date.fromisoformat(lo)) if lo else _month_start(today)
+        last = _month_start(max(date.fromisoformat(hi) if hi else today, today))
+        month = first
+        while month <= last:
+            _create_time_log_partition(cur, "time_log_new", month)
+            month = _next_month(month)
+
+        cur.execute(
+            """
+            CREATE OR REPLACE FUNCTION time_log_mirror() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO time_log_new(guild_id, user_id, study_date, seconds)
+                VALUES (NEW.guild_id, NEW.user_id, NEW.study_date::date, NEW.seconds)
+                ON CONFLICT (guild_id, user_id, study_date) DO UPDATE SET seconds = excluded.seconds;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+            """
+        )
+        cur.execute("DROP TRIGGER IF EXISTS time_log_mirror ON time_log")
+        cur.execute(
+            "CREATE TRIGGER time_log_mirror AFTER INSERT OR UPDATE ON time_log "
+            "FOR EACH ROW EXECUTE FUNCTION time_log_mirror()"
+        )
+    conn.commit()
+
+    # 依月份分批複製；trigger 已同步的列比較新，因此 DO NOTHING
+    month = first
+    while month <= last:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO time_log_new(guild_id, user_id, study_date, seconds)
+                SELECT guild_id, user_id, study_date::date, seconds
+                FROM time_log
+                WHERE study_date >= %s AND study_date < %s
+                ON CONFLICT (guild_id, user_id, study_date) DO NOTHING
+                """,
+                (month.isoformat(), _next_month(month).isoformat()),
+            )
+        conn.commit()
+        month = _next_month(month)
+
+    with conn.cursor() as cur:
+        cur.execute("LOCK TABLE time_log IN ACCESS EXCLUSIVE MODE")
+        cur.execute("DROP TRIGGER IF EXISTS time_log_mirror ON time_log")
+        cur.execute("DROP FUNCTION IF EXISTS time_log_mirror()")
+        cur.execute("ALTER TABLE time_log RENAME TO time_log_legacy")
+        cur.execute("ALTER TABLE time_log_new RENAME TO time_log")
+        cur.execute("ALTER TABLE time_log_new_default RENAME TO time_log_default")
+        cur.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'time_log'::regclass AND c.relname LIKE 'time_log_new_p%'"
+        )
+        for (part,) in cur.fetchall():
+            cur.execute(f"ALTER TABLE {part} RENAME TO {part.replace('time_log_new_', 'time_log_', 1)}")
+        cur.execute("ALTER TABLE time_log_weekly ALTER COLUMN week_start TYPE DATE USING week_start::date")
+        # time_log_monthly.month 維持 TEXT：它是 'YYYY-MM' 月份鍵而非某一天，只做等值查詢與 upsert，
+        # 字串排序即時間順序；改成 DATE 需另外約定以每月 1 日表示，查詢端與 SQLite 後端都得跟著改，沒有好處
+    conn.commit()
+
+def _migrate_3_job_runs(conn):
+    """排程工作的執行紀錄（每個伺服器最後完成時間），用於重啟後補跑"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_runs (
+                job      TEXT        NOT NULL,
+                guild_id BIGINT      NOT NULL,
+                last_run TIMESTAMPTZ NOT NULL,
+                PRIMARY KEY (job, guild_id)
+            )
+            """
+        )
+    conn.commit()
+
+def _migrate_4_session_accumulated(conn):
+    """active_sessions 記錄文字計時本次已累積秒數，重啟後可恢復"""
+    with conn.cursor() as cur:
+        cur.execute("ALTER TABLE active_sessions ADD COLUMN IF NOT EXISTS accumulated_seconds INTEGER NOT NULL DEFAULT 0")
+    conn.commit()
+
+SESSION_NOTIFY_CHANNEL = "study_sessions"
+
+def _migrate_5_session_notify_and_leases(conn):
+    """active/paused_sessions 變更時 NOTIFY，以及各伺服器的擁有權租約（多程序部署）"""
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION notify_session_change() RETURNS trigger AS $$
+            DECLARE
+                r record;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+                PERFORM pg_notify('{SESSION_NOTIFY_CHANNEL}', json_build_object(
+                    'table', TG_TABLE_NAME,
+                    'op', TG_OP,
+                    'guild_id', r.guild_id,
+                    'user_id', r.user_id,
+                    'session_type', r.session_type,
+                    'time', CASE WHEN TG_TABLE_NAME = 'active_sessions' THEN to_jsonb(r)->>'start_time'
+                                 ELSE to_jsonb(r)->>'pause_time' END,
+                    'accumulated', r.accumulated_seconds,
+                    'origin', current_setting('application_name')
+                )::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """
+        )
+        for table in ("active_sessions", "paused_sessions"):
+            cur.execute(f"DROP TRIGGER IF EXISTS {table}_notify ON {table}")
+            cur.execute(
+                f"CREATE TRIGGER {table}_notify AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION notify_session_change()"
+            )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS guild_leases (
+                guild_id   BIGINT      PRIMARY KEY,
+                owner      TEXT        NOT NULL,
+                expires_at TIMESTAMPTZ NOT NULL
+            )
+            """
+        )
+    conn.commit()
+
+def _migrate_6_member_names(conn):
+    """成員顯示名稱快取，沒有 members intent 時排行榜也能顯示名稱"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS member_names (
+                guild_id     BIGINT      NOT NULL,
+                user_id      BIGINT      NOT NULL,
+                display_name TEXT        NOT NULL,
+                updated_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (guild_id, user_id)
+            )
+            """
+        )
+    conn.commit()
+
+def _migrate_7_session_intervals(conn):
+    """每段結束的計時原始區間（只新增不修改），time_log 與彙總表可由它重建"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_intervals (
+                id           BIGSERIAL   PRIMARY KEY,
+                guild_id     BIGINT      NOT NULL,
+                user_id      BIGINT      NOT NULL,
+                session_type TEXT        NOT NULL,
+                start_time   TIMESTAMPTZ NOT NULL,
+                end_time     TIMESTAMPTZ NOT NULL,
+                recorded_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS session_intervals_guild_user_start_idx "
+            "ON session_intervals (guild_id, user_id, start_time)"
+        )
+        # 只允許新增；需要人工修正時先 DROP TRIGGER
+        cur.execute(
+            """
+            CREATE OR REPLACE FUNCTION session_intervals_append_only() RETURNS trigger AS $$
+            BEGIN
+                RAISE EXCEPTION 'session_intervals 只允許新增';
+            END;
+            $$ LANGUAGE plpgsql
+            """
+        )
+        cur.execute("DROP TRIGGER IF EXISTS session_intervals_append_only ON session_intervals")
+        cur.execute(
+            "CREATE TRIGGER session_intervals_append_only BEFORE UPDATE OR DELETE ON session_intervals "
+            "FOR EACH ROW EXECUTE FUNCTION session_intervals_append_only()"
+        )
+    conn.commit()
+
+def _migrate_8_import_checkpoints(conn):
+    """匯入舊版 SQLite 的進度（每個來源檔、每張表已匯入到哪個 rowid），與資料在同一個交易內更新"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS import_checkpoints (
+                source     TEXT        NOT NULL,
+                table_name TEXT        NOT NULL,
+                last_rowid BIGINT      NOT NULL,
+                imported   BIGINT      NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (source, table_name)
+            )
+            """
+        )
+    conn.commit()
+
+def _migrate_9_config_notify(conn):
+    """monitor_channels / config 變更時也 NOTIFY，其他程序據此更新監聽頻道索引"""
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION notify_config_change() RETURNS trigger AS $$
+            DECLARE
+                r record;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+                PERFORM pg_notify('{SESSION_NOTIFY_CHANNEL}', json_build_object(
+                    'table', TG_TABLE_NAME,
+                    'op', TG_OP,
+                    'guild_id', r.guild_id,
+                    'channel_id', CASE WHEN TG_TABLE_NAME = 'monitor_channels' THEN to_jsonb(r)->'channel_id'
+                                       ELSE to_jsonb(r)->'announce_channel_id' END,
+                    'origin', current_setting('application_name')
+                )::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """
+        )
+        for table in ("monitor_channels", "config"):
+            cur.execute(f"DROP TRIGGER IF EXISTS {table}_notify ON {table}")
+            cur.execute(
+                f"CREATE TRIGGER {table}_notify AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION notify_config_change()"
+            )
+    conn.commit()
+
+SCHEMA_MIGRATIONS = [
+    (1, "基本資料表與彙總表", _migrate_1_baseline),
+    (2, "study_date 改為 DATE、time_log 月分區與 covering index", _migrate_2_date_partitioned_time_log),
+    (3, "排程工作執行紀錄", _migrate_3_job_runs),
+    (4, "active_sessions.accumulated_seconds", _migrate_4_session_accumulated),
+    (5, "session 變更通知與伺服器租約", _migrate_5_session_notify_and_leases),
+    (6, "成員顯示名稱快取", _migrate_6_member_names),
+    (7, "計時原始區間紀錄", _migrate_7_session_intervals),
+    (8, "SQLite 匯入進度", _migrate_8_import_checkpoints),
+    (9, "監聽頻道與公告頻道變更通知", _migrate_9_config_notify),
+]
+
+def schema_version() -> int:
+    res = db_exec("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return int(res[0][0]) if res else 0
+
+def ensure_db():
+    """初始化資料庫：依序執行尚未套用的 schema migration"""
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (SCHEMA_LOCK_KEY,))
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version    INTEGER PRIMARY KEY,
+                        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    )
+                    """
+                )
+                cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+                current = cur.fetchone()[0]
+            conn.commit()
+
+            for version, description, migrate in SCHEMA_MIGRATIONS:
+                if version <= current:
+                    continue
+                print(f"🛠️ 套用 schema migration {version}: {description}")
+                migrate(conn)
+                with conn.cursor() as cur:
+                    cur.execute("INSERT INTO schema_version(version) VALUES (%s)", (version,))
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (SCHEMA_LOCK_KEY,))
+            conn.commit()
+
+    ensure_time_log_partitions()
 
 # ------- 查詢功能 -------
 
@@ -100,6 +678,30 @@ def fetch_sum_between(guild_id: int, start_date: str, end_date: str):
         (guild_id, start_date, end_date),
     )
 
+def fetch_by_date_many(guild_ids: list[int], sdate: str):
+    """一次取得多個伺服器某學習日的排行 (guild_id, user_id, seconds)，各伺服器內依秒數遞減"""
+    if not guild_ids:
+        return []
+    return db_exec(
+        "SELECT guild_id, user_id, seconds FROM time_log WHERE guild_id = ANY(?) AND study_date = ? ORDER BY guild_id, seconds DESC",
+        (list(guild_ids), sdate),
+    )
+
+def fetch_sum_between_many(guild_ids: list[int], start_date: str, end_date: str):
+    """一次取得多個伺服器區間合計 (guild_id, user_id, total)，各伺服器內依合計遞減"""
+    if not guild_ids:
+        return []
+    return db_exec(
+        """
+        SELECT guild_id, user_id, SUM(seconds) as total
+        FROM time_log
+        WHERE guild_id = ANY(?) AND study_date BETWEEN ? AND ?
+        GROUP BY guild_id, user_id
+        ORDER BY guild_id, total DESC
+        """,
+        (list(guild_ids), start_date, end_date),
+    )
+
 def fetch_user_sum_on(guild_id: int, user_id: int, sdate: str) -> int:
     res = db_exec(
         "SELECT COALESCE(SUM(seconds), 0) FROM time_log WHERE guild_id = ? AND user_id = ? AND study_date = ?",
@@ -114,12 +716,59 @@ def fetch_user_sum_between(guild_id: int, user_id: int, start_date: str, end_dat
     )
     return int(res[0][0]) if res else 0
 
+def fetch_user_daily(guild_id: int, user_id: int):
+    """某人每個學習日的時數 [(study_date, seconds)]，依日期排序（走主鍵索引）"""
+    return db_exec(
+        "SELECT to_char(study_date, 'YYYY-MM-DD'), seconds FROM time_log "
+        "WHERE guild_id = ? AND user_id = ? ORDER BY study_date",
+        (guild_id, user_id),
+    )
+
+def fetch_user_intervals(guild_id: int, user_id: int, since_iso: str):
+    """某人 since_iso 之後開始的計時區間 [(start_time, end_time)]"""
+    return db_exec(
+        "SELECT start_time, end_time FROM session_intervals "
+        "WHERE guild_id = ? AND user_id = ? AND start_time >= ? ORDER BY start_time",
+        (guild_id, user_id, since_iso),
+    )
+
+def fetch_week(guild_id: int, week_start: str):
+    """從週彙總表取得某週（週一為 week_start）的排行"""
+    return db_exec(
+        "SELECT user_id, seconds FROM time_log_weekly WHERE guild_id = ? AND week_start = ? ORDER BY seconds DESC",
+        (guild_id, week_start),
+    )
+
+def fetch_month(guild_id: int, month: str):
+    """從月彙總表取得某月（YYYY-MM）的排行"""
+    return db_exec(
+        "SELECT user_id, seconds FROM time_log_monthly WHERE guild_id = ? AND month = ? ORDER BY seconds DESC",
+        (guild_id, month),
+    )
+
+def fetch_alltime(guild_id: int):
+    """從總計彙總表取得歷史總排行"""
+    return db_exec(
+        "SELECT user_id, seconds FROM time_log_alltime WHERE guild_id = ? ORDER BY seconds DESC",
+        (guild_id,),
+    )
+
 # ------- Config & Monitor -------
 
 def get_config(guild_id: int, default_channel_id: int = 0):
     res = db_exec("SELECT announce_channel_id FROM config WHERE guild_id = ?", (guild_id,))
     return res[0][0] if res and res[0][0] else (default_channel_id or None)
 
+def get_configs(guild_ids: list[int]) -> dict[int, int]:
+    """一次取得多個伺服器的公告頻道 {guild_id: announce_channel_id}"""
+    if not guild_ids:
+        return {}
+    res = db_exec(
+        "SELECT guild_id, announce_channel_id FROM config WHERE guild_id = ANY(?) AND announce_channel_id IS NOT NULL",
+        (list(guild_ids),),
+    )
+    return {gid: ch_id for gid, ch_id in res}
+
 def set_config(guild_id: int, channel_id: int):
     db_exec(
         """
@@ -135,6 +784,10 @@ def get_monitor_channels(guild_id: int) -> list[int]:
     res = db_exec("SELECT channel_id FROM monitor_channels WHERE guild_id = ?", (guild_id,))
     return [row[0] for row in res]
 
+def get_all_monitor_channels():
+    """取得所有伺服器的監聽頻道 (guild_id, channel_id)"""
+    return db_exec("SELECT guild_id, channel_id FROM monitor_channels")
+
 def add_monitor_channel(guild_id: int, channel_id: int):
     # PostgreSQL 的 INSERT IGNORE 要改成 ON CONFLICT DO NOTHING
     db_exec(
@@ -148,27 +801,75 @@ def remove_monitor_channel(guild_id: int, channel_id: int):
 
 # ------- 核心邏輯 -------
 
-def add_seconds(guild_id: int, user_id: int, study_date: str, seconds: int):
-    db_exec(
+def _week_start_of(study_date: str) -> str:
+    d = date.fromisoformat(study_date)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+def _sum_by(rows, key):
+    totals = {}
+    for row in rows:
+        k = key(row)
+        totals[k] = totals.get(k, 0) + row[3]
+    return [(*k, secs) for k, secs in totals.items()]
+
+def _upsert_time_rows(cur, rows):
+    """把 (guild_id, user_id, study_date, seconds) 累加進 time_log 與週/月/總計彙總表"""
+    extras.execute_values(
+        cur,
         """
         INSERT INTO time_log(guild_id, user_id, study_date, seconds)
-        VALUES(?, ?, ?, ?)
+        VALUES %s
         ON CONFLICT(guild_id, user_id, study_date)
         DO UPDATE SET seconds = time_log.seconds + excluded.seconds
         """,
-        (guild_id, user_id, study_date, seconds),
-        commit=True
+        _sum_by(rows, lambda r: (r[0], r[1], r[2])),
+    )
+    extras.execute_values(
+        cur,
+        """
+        INSERT INTO time_log_weekly(guild_id, user_id, week_start, seconds)
+        VALUES %s
+        ON CONFLICT(guild_id, week_start, user_id)
+        DO UPDATE SET seconds = time_log_weekly.seconds + excluded.seconds
+        """,
+        _sum_by(rows, lambda r: (r[0], r[1], _week_start_of(r[2]))),
+    )
+    extras.execute_values(
+        cur,
+        """
+        INSERT INTO time_log_monthly(guild_id, user_id, month, seconds)
+        VALUES %s
+        ON CONFLICT(guild_id, month, user_id)
+        DO UPDATE SET seconds = time_log_monthly.seconds + excluded.seconds
+        """,
+        _sum_by(rows, lambda r: (r[0], r[1], r[2][:7])),
+    )
+    extras.execute_values(
+        cur,
+        """
+        INSERT INTO time_log_alltime(guild_id, user_id, seconds)
+        VALUES %s
+        ON CONFLICT(guild_id, user_id)
+        DO UPDATE SET seconds = time_log_alltime.seconds + excluded.seconds
+        """,
+        _sum_by(rows, lambda r: (r[0], r[1])),
     )
 
-def save_session(guild_id: int, user_id: int, session_type: str, start_time_iso: str):
+def add_seconds(guild_id: int, user_id: int, study_date: str, seconds: int):
+    with connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                _upsert_time_rows(cur, [(guild_id, user_id, study_date, seconds)])
+
+def save_session(guild_id: int, user_id: int, session_type: str, start_time_iso: str, accumulated_secs: int = 0):
     db_exec(
         """
-        INSERT INTO active_sessions(guild_id, user_id, session_type, start_time)
-        VALUES(?, ?, ?, ?)
+        INSERT INTO active_sessions(guild_id, user_id, session_type, start_time, accumulated_seconds)
+        VALUES(?, ?, ?, ?, ?)
         ON CONFLICT(guild_id, user_id, session_type)
-        DO UPDATE SET start_time = excluded.start_time
+        DO UPDATE SET start_time = excluded.start_time, accumulated_seconds = excluded.accumulated_seconds
         """,
-        (guild_id, user_id, session_type, start_time_iso),
+        (guild_id, user_id, session_type, start_time_iso, accumulated_secs),
         commit=True
     )
 
@@ -198,6 +899,335 @@ def get_paused_session(guild_id: int, user_id: int, session_type: str):
 def delete_paused_session(guild_id: int, user_id: int, session_type: str):
     db_exec("DELETE FROM paused_sessions WHERE guild_id = ? AND user_id = ? AND session_type = ?", (guild_id, user_id, session_type), commit=True)
 
-def get_all_active_sessions():
-    """取得所有進行中的計時（用於機器人重啟時恢復狀態）"""
-    return db_exec("SELECT guild_id, user_id, session_type, start_time FROM active_sessions")
\ No newline at end of file
+def _shard_filter(shard_count, shard_ids):
+    """只取屬於這些分片的伺服器；未指定分片時不過濾"""
+    if not shard_count or shard_ids is None:
+        return "", ()
+    # %% 是 psycopg2 中 % 的跳脫
+    return " WHERE ((guild_id >> 22) %% ?) = ANY(?)", (shard_count, list(shard_ids))
+
+def get_all_active_sessions(shard_count: int = 0, shard_ids=None):
+    """取得進行中的計時（用於機器人重啟時恢復狀態），可只取指定分片"""
+    where, params = _shard_filter(shard_count, shard_ids)
+    return db_exec(
+        "SELECT guild_id, user_id, session_type, start_time, accumulated_seconds FROM active_sessions" + where,
+        params,
+    )
+
+def get_all_paused_sessions(shard_count: int = 0, shard_ids=None):
+    """取得暫停中的計時 (guild_id, user_id, session_type, pause_time, accumulated_seconds)，可只取指定分片"""
+    where, params = _shard_filter(shard_count, shard_ids)
+    return db_exec(
+        "SELECT guild_id, user_id, session_type, pause_time, accumulated_seconds FROM paused_sessions" + where,
+        params,
+    )
+
+# ------- 排程紀錄 -------
+
+def get_job_runs(job: str) -> dict:
+    """取得排程工作在各伺服器最後完成的時間 {guild_id: datetime}"""
+    res = db_exec("SELECT guild_id, last_run FROM job_runs WHERE job = ?", (job,))
+    return {gid: last_run for gid, last_run in res}
+
+def set_job_runs(job: str, guild_ids, last_run):
+    """記錄排程工作在這些伺服器完成的時間"""
+    rows = [(job, gid, last_run) for gid in guild_ids]
+    if not rows:
+        return
+    with connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                extras.execute_values(
+                    cur,
+                    """
+                    INSERT INTO job_runs(job, guild_id, last_run)
+                    VALUES %s
+                    ON CONFLICT(job, guild_id) DO UPDATE SET last_run = excluded.last_run
+                    """,
+                    rows,
+                )
+
+# ------- 多程序協調：伺服器租約 -------
+
+def acquire_guild_leases(guild_ids, owner: str, ttl_seconds: int) -> list[int]:
+    """為這些伺服器取得或續約租約，回傳目前由 owner 持有的 guild_id
+
+    已過期或本來就屬於 owner 的租約才會被更新，其他程序持有中的不受影響。
+    """
+    if not guild_ids:
+        return []
+    res = db_exec(
+        """
+        INSERT INTO guild_leases(guild_id, owner, expires_at)
+        SELECT gid, ?, now() + ? * interval '1 second' FROM unnest(?::bigint[]) AS gid
+        ON CONFLICT(guild_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+        WHERE guild_leases.owner = excluded.owner OR guild_leases.expires_at < now()
+        RETURNING guild_id
+        """,
+        (owner, ttl_seconds, list(guild_ids)),
+        commit=True
+    )
+    return [row[0] for row in res]
+
+def release_guild_leases(owner: str):
+    """釋放 owner 持有的所有租約（正常關機時呼叫，讓其他程序立即接手）"""
+    db_exec("DELETE FROM guild_leases WHERE owner = ?", (owner,), commit=True)
+
+# ------- 成員顯示名稱 -------
+
+def get_member_names(guild_id: int, user_ids) -> dict:
+    """取得已記錄的顯示名稱 {user_id: (display_name, updated_at)}"""
+    if not user_ids:
+        return {}
+    res = db_exec(
+        "SELECT user_id, display_name, updated_at FROM member_names WHERE guild_id = ? AND user_id = ANY(?)",
+        (guild_id, list(user_ids)),
+    )
+    return {uid: (name, updated_at) for uid, name, updated_at in res}
+
+def save_member_names(rows):
+    """批次寫入顯示名稱 [(guild_id, user_id, display_name)]"""
+    if not rows:
+        return
+    with connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                extras.execute_values(
+                    cur,
+                    """
+                    INSERT INTO member_names(guild_id, user_id, display_name)
+                    VALUES %s
+                    ON CONFLICT(guild_id, user_id)
+                    DO UPDATE SET display_name = excluded.display_name, updated_at = now()
+                    """,
+                    rows,
+                )
+
+# ------- 批次寫入（write-behind 緩衝用） -------
+
+_INTERVAL_COLUMNS = "guild_id, user_id, session_type, start_time, end_time"
+
+def _copy_intervals(cur, rows):
+    """以 COPY FROM STDIN 批次寫入計時區間，比多列 INSERT 少了解析與逐列處理的成本"""
+    buf = io.StringIO()
+    for guild_id, user_id, session_type, start_iso, end_iso in rows:
+        buf.write(f"{guild_id}\t{user_id}\t{session_type}\t{start_iso}\t{end_iso}\n")
+    buf.seek(0)
+    cur.copy_expert(f"COPY session_intervals({_INTERVAL_COLUMNS}) FROM STDIN", buf)
+
+def flush_writes(time_rows=(), session_upserts=(), session_deletes=(), paused_upserts=(), paused_deletes=(), interval_rows=()):
+    """在同一個交易內，以多列 upsert / delete 一次寫入緩衝中的變更
+
+    time_rows:       [(guild_id, user_id, study_date, seconds)]
+    session_upserts: [(guild_id, user_id, session_type, start_time_iso, accumulated_seconds)]
+    session_deletes: [(guild_id, user_id, session_type)]
+    paused_upserts:  [(guild_id, user_id, session_type, pause_time_iso, accumulated_seconds)]
+    paused_deletes:  [(guild_id, user_id, session_type)]
+    interval_rows:   [(guild_id, user_id, session_type, start_time_iso, end_time_iso)]
+    """
+    with connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                if interval_rows:
+                    _copy_intervals(cur, interval_rows)
+                if time_rows:
+                    _upsert_time_rows(cur, time_rows)
+                if session_deletes:
+                    extras.execute_values(
+                        cur,
+                        "DELETE FROM active_sessions WHERE (guild_id, user_id, session_type) IN (VALUES %s)",
+                        session_deletes,
+                    )
+                if session_upserts:
+                    extras.execute_values(
+                        cur,
+                        """
+                        INSERT INTO active_sessions(guild_id, user_id, session_type, start_time, accumulated_seconds)
+                        VALUES %s
+                        ON CONFLICT(guild_id, user_id, session_type)
+                        DO UPDATE SET start_time = excluded.start_time, accumulated_seconds = excluded.accumulated_seconds
+                        """,
+                        session_upserts,
+                    )
+                if paused_deletes:
+                    extras.execute_values(
+                        cur,
+                        "DELETE FROM paused_sessions WHERE (guild_id, user_id, session_type) IN (VALUES %s)",
+                        paused_deletes,
+                    )
+                if paused_upserts:
+                    extras.execute_values(
+                        cur,
+                        """
+                        INSERT INTO paused_sessions(guild_id, user_id, session_type, pause_time, accumulated_seconds)
+                        VALUES %s
+                        ON CONFLICT(guild_id, user_id, session_type)
+                        DO UPDATE SET pause_time = excluded.pause_time, accumulated_seconds = excluded.accumulated_seconds
+                        """,
+                        paused_upserts,
+                    )
+
+# ------- 串流讀取（重建、匯出） -------
+
+def _stream(name: str, sql: str, params, chunk_size: int):
+    """以 server-side（具名）cursor 分批讀出查詢結果，每批只從伺服器取 chunk_size 列，不會把整個結果載入記憶體"""
+    with connection() as conn:
+        with conn:
+            with conn.cursor(name=name) as cur:
+                cur.itersize = chunk_size
+                cur.execute(_pg_sql(sql), params)
+                while True:
+                    chunk = cur.fetchmany(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+
+def _where(conditions) -> tuple[str, tuple]:
+    """[(SQL 條件, 參數)]，參數為 None 的條件略過"""
+    used = [(sql, value) for sql, value in conditions if value is not None]
+    if not used:
+        return "", ()
+    return " WHERE " + " AND ".join(sql for sql, _ in used), tuple(value for _, value in used)
+
+def iter_session_intervals(guild_id=None, chunk_size: int = 10000, since=None, until=None):
+    """依寫入順序分批讀出計時區間 [(guild_id, user_id, session_type, start_time, end_time)]
+
+    since / until（ISO 時間）只取開始時間落在 [since, until) 的區間。
+    """
+    where, params = _where((("guild_id = ?", guild_id), ("start_time >= ?", since), ("start_time < ?", until)))
+    return _stream(
+        "session_intervals_stream",
+        f"SELECT {_INTERVAL_COLUMNS} FROM session_intervals{where} ORDER BY id",
+        params,
+        chunk_size,
+    )
+
+def iter_time_log(guild_id: int, start_date=None, end_date=None, chunk_size: int = 10000):
+    """依學習日分批讀出某伺服器的 time_log [(guild_id, user_id, study_date, seconds)]，可限定學習日範圍（含兩端）"""
+    where, params = _where((("guild_id = ?", guild_id), ("study_date >= ?", start_date), ("study_date <= ?", end_date)))
+    return _stream(
+        "time_log_stream",
+        f"SELECT guild_id, user_id, to_char(study_date, 'YYYY-MM-DD'), seconds FROM time_log{where} "
+        f"ORDER BY study_date, user_id",
+        params,
+        chunk_size,
+    )
+
+# ------- 計時區間重建 -------
+
+def _recompute_rollups(cur, guild_id=None):
+    """由 time_log 重算週/月/總計彙總表（全部或單一伺服器）"""
+    where = "" if guild_id is None else " WHERE guild_id = %s"
+    params = () if guild_id is None else (guild_id,)
+    for table in ("time_log_weekly", "time_log_monthly", "time_log_alltime"):
+        cur.execute(f"DELETE FROM {table}{where}", params)
+    cur.execute(
+        f"""
+        INSERT INTO time_log_weekly(guild_id, user_id, week_start, seconds)
+        SELECT guild_id, user_id, date_trunc('week', study_date)::date, SUM(seconds)
+        FROM time_log{where}
+        GROUP BY 1, 2, 3
+        """,
+        params,
+    )
+    cur.execute(
+        f"""
+        INSERT INTO time_log_monthly(guild_id, user_id, month, seconds)
+        SELECT guild_id, user_id, to_char(study_date, 'YYYY-MM'), SUM(seconds)
+        FROM time_log{where}
+        GROUP BY 1, 2, 3
+        """,
+        params,
+    )
+    cur.execute(
+        f"""
+        INSERT INTO time_log_alltime(guild_id, user_id, seconds)
+        SELECT guild_id, user_id, SUM(seconds)
+        FROM time_log{where}
+        GROUP BY 1, 2
+        """,
+        params,
+    )
+
+def replace_time_log(rows, since: str, guild_id=None):
+    """以重建結果取代 study_date >= since 的 time_log，再由 time_log 重算週/月/總計彙總表（單一交易）
+
+    rows: [(guild_id, user_id, study_date, seconds)]，每個 (guild_id, user_id, study_date) 只出現一次
+    """
+    scope = "" if guild_id is None else " AND guild_id = %s"
+    params = () if guild_id is None else (guild_id,)
+    with connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(f"DELETE FROM time_log WHERE study_date >= %s{scope}", (since, *params))
+                if rows:
+                    buf = io.StringIO()
+                    for g, u, sdate, secs in rows:
+                        buf.write(f"{g}\t{u}\t{sdate}\t{secs}\n")
+                    buf.seek(0)
+                    cur.copy_expert("COPY time_log(guild_id, user_id, study_date, seconds) FROM STDIN", buf)
+                _recompute_rollups(cur, guild_id)
+
+# ------- 匯入舊版 SQLite（src/import_sqlite.py） -------
+
+def get_import_checkpoints(source: str) -> dict:
+    """{table_name: (last_rowid, 已匯入列數)}"""
+    res = db_exec("SELECT table_name, last_rowid, imported FROM import_checkpoints WHERE source = ?", (source,))
+    return {table: (int(last), int(rows)) for table, last, rows in res}
+
+def clear_import_checkpoints(source: str):
+    db_exec("DELETE FROM import_checkpoints WHERE source = ?", (source,), commit=True)
+
+def create_time_log_partitions(first: str, last: str):
+    """建立 first ~ last（學習日）之間每個月的 time_log 分區，讓匯入的舊資料不會全部落進 DEFAULT 分區"""
+    with connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                month = _month_start(date.fromisoformat(first))
+                end = date.fromisoformat(last)
+                while month <= end:
+                    _create_time_log_partition(cur, "time_log", month)
+                    month = _next_month(month)
+
+def import_batch(table: str, columns, rows, conflict: str, source: str, last_rowid: int, update_columns=()):
+    """把一批列 COPY 進暫存表再合併到 table，並在同一個交易內記錄匯入進度（中斷後重跑不會重複匯入）
+
+    conflict：衝突欄位（例如 "guild_id, user_id, study_date"）；空字串表示沒有唯一鍵，直接新增。
+    update_columns：[(欄位, 更新運算式)]，衝突時更新；為空時保留既有的列（DO NOTHING）。
+    """
+    cols = ", ".join(columns)
+    if not conflict:
+        on_conflict = ""
+    elif update_columns:
+        sets = ", ".join(f"{col} = {expr}" for col, expr in update_columns)
+        on_conflict = f" ON CONFLICT ({conflict}) DO UPDATE SET {sets}"
+    else:
+        on_conflict = f" ON CONFLICT ({conflict}) DO NOTHING"
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    with connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(f"CREATE TEMP TABLE import_stage ON COMMIT DROP AS SELECT {cols} FROM {table} WITH NO DATA")
+                cur.copy_expert(f"COPY import_stage({cols}) FROM STDIN WITH (FORMAT csv)", buf)
+                cur.execute(f"INSERT INTO {table}({cols}) SELECT {cols} FROM import_stage{on_conflict}")
+                cur.execute(
+                    """
+                    INSERT INTO import_checkpoints(source, table_name, last_rowid, imported)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT(source, table_name)
+                    DO UPDATE SET last_rowid = excluded.last_rowid,
+                                  imported = import_checkpoints.imported + excluded.imported,
+                                  updated_at = now()
+                    """,
+                    (source, table, last_rowid, len(rows)),
+                )
+
+def recompute_rollups(guild_ids):
+    """由 time_log 重算這些伺服器的週/月/總計彙總表（匯入 time_log 後呼叫）"""
+    with connection() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                for guild_id in guild_ids:
+                    _recompute_rollups(cur, guild_id)
@@ -0,0 +1,134 @@
+"""
+匯出伺服器的讀書資料（/export 與 CLI）
+
+用法（在專案根目錄）：
+    python -m src.export --guild 123                                   # time_log → time_log_123.csv.gz
+    python -m src.export --guild 123 --dataset intervals --start 2026-01-01 --end 2026-03-31
+    python -m src.export --guild 123 --format parquet --output data.parquet
+
+資料以固定大小的批次串流讀出（PostgreSQL 使用 server-side cursor），每批寫完就丟掉，
+記憶體用量只跟 chunk_size 有關，不隨歷史資料量增加。
+CSV 以 gzip 壓縮；Parquet 需要安裝 pyarrow（選用），每批寫成一個 row group。
+"""
+import argparse
+import csv
+import gzip
+import sys
+import time
+from datetime import date, timedelta
+
+from . import utils
+from .storage import backend as db
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 為選用套件
+    pa = pq = None
+
+EXPORT_CHUNK_SIZE = 10000
+DATASETS = ("time_log", "intervals")
+FORMATS = ("csv", "parquet")
+
+# 各資料集的欄位與型別（int / str），Parquet 依此建立 schema
+_COLUMNS = {
+    "time_log": (("guild_id", int), ("user_id", int), ("study_date", str), ("seconds", int)),
+    "intervals": (
+        ("guild_id", int), ("user_id", int), ("session_type", str),
+        ("start_time", str), ("end_time", str), ("study_date", str), ("seconds", int),
+    ),
+}
+
+
+def formats() -> tuple[str, ...]:
+    """目前環境可用的匯出格式"""
+    return FORMATS if pq is not None else ("csv",)
+
+
+def filename(guild_id: int, dataset: str, fmt: str, start_date=None, end_date=None) -> str:
+    span = f"_{start_date or 'begin'}_{end_date or 'end'}" if start_date or end_date else ""
+    return f"{dataset}_{guild_id}{span}." + ("csv.gz" if fmt == "csv" else "parquet")
+
+
+def _chunks(guild_id: int, dataset: str, start_date, end_date, chunk_size: int):
+    """依 dataset 分批產生要寫出的列（欄位見 _COLUMNS）"""
+    if dataset == "time_log":
+        yield from db.iter_time_log(guild_id, start_date, end_date, chunk_size)
+        return
+    # 區間依開始時間所在的學習日篩選：[start_date 06:00, end_date 隔天 06:00)
+    since = utils.study_day_start(start_date).isoformat() if start_date else None
+    until = None
+    if end_date:
+        until = utils.study_day_start((date.fromisoformat(end_date) + timedelta(days=1)).isoformat()).isoformat()
+    for chunk in db.iter_session_intervals(guild_id, chunk_size, since, until):
+        yield [
+            (g, u, t, start.isoformat(), end.isoformat(), utils.study_date_of(start), int((end - start).total_seconds()))
+            for g, u, t, start, end in chunk
+        ]
+
+
+def _write_csv(path: str, columns, chunks) -> int:
+    rows = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in columns])
+        for chunk in chunks:
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+
+def _write_parquet(path: str, columns, chunks) -> int:
+    schema = pa.schema([(name, pa.int64() if kind is int else pa.string()) for name, kind in columns])
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            # 列轉成欄，每批寫成一個 row group
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+def export(guild_id: int, path: str, dataset: str = "time_log", fmt: str = "csv",
+           start_date=None, end_date=None, chunk_size: int = EXPORT_CHUNK_SIZE) -> dict:
+    """把某伺服器的資料串流寫入 path，回傳 {"rows", "seconds"}（同步，會佔用一條資料庫連線直到寫完）"""
+    if dataset not in DATASETS:
+        raise ValueError(f"不支援的資料集: {dataset}（可用 {', '.join(DATASETS)}）")
+    if fmt not in formats():
+        raise ValueError(f"不支援的格式: {fmt}（可用 {', '.join(formats())}）")
+    for d in (start_date, end_date):
+        if d:
+            date.fromisoformat(d)  # 格式錯誤時丟出 ValueError
+    t0 = time.perf_counter()
+    chunks = _chunks(guild_id, dataset, start_date, end_date, chunk_size)
+    write = _write_csv if fmt == "csv" else _write_parquet
+    rows = write(path, _COLUMNS[dataset], chunks)
+    return {"rows": rows, "seconds": time.perf_counter() - t0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="匯出伺服器的 time_log 或計時區間")
+    parser.add_argument("--guild", type=int, required=True, help="伺服器 ID")
+    parser.add_argument("--dataset", choices=DATASETS, default="time_log", help="time_log：每日時數；intervals：原始計時區間")
+    parser.add_argument("--format", choices=FORMATS, default="csv", help="csv（gzip 壓縮）或 parquet（需要 pyarrow）")
+    parser.add_argument("--start", help="起始學習日 YYYY-MM-DD（含）")
+    parser.add_argument("--end", help="結束學習日 YYYY-MM-DD（含）")
+    parser.add_argument("--output", help="輸出檔案；預設依伺服器、資料集與日期範圍命名")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="每批讀取的列數")
+    args = parser.parse_args(argv)
+
+    path = args.output or filename(args.guild, args.dataset, args.format, args.start, args.end)
+    db.ensure_db()
+    try:
+        stats = export(args.guild, path, args.dataset, args.format, args.start, args.end, args.chunk_size)
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        db.close_pool()
+    secs = stats["seconds"]
+    print(f"已匯出 {stats['rows']:,} 筆到 {path}，{secs:.1f} 秒（{stats['rows'] / secs if secs else 0:,.0f} 筆/秒）")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+個人讀書歷史分析（/me mode:history）
+
+一次載入某人每個學習日的時數（與近期的原始計時區間），在記憶體中整批計算：
+連續天數、近 30/90 天日均、最佳單日、星期與時段分布，並畫成文字熱度圖。
+有安裝 numpy 時以陣列運算一次算完；沒有時退回等價的純 Python 迴圈。
+"""
+from datetime import date, timedelta
+
+from . import utils
+
+try:
+    import numpy as np
+except ImportError:  # numpy 為選用套件
+    np = None
+
+HISTORY_INTERVAL_DAYS = 90     # 時段分布只看最近幾天的原始區間
+HEATMAP_WEEKS = 12
+WEEKDAY_NAMES = "一二三四五六日"
+_HEAT_LEVELS = ((3600, "░"), (7200, "▒"), (14400, "▓"))   # (未滿幾秒, 符號)，沒讀為 ·，以上為 █
+_SPARK = "▁▂▃▄▅▆▇█"
+_DAY_SECS = 86400
+
+
+def _daily_array(daily_rows, today: date):
+    """把 [(study_date, seconds)]（不含今天之後的日期）展開成從第一天到今天、每天一格的秒數序列"""
+    first = date.fromisoformat(daily_rows[0][0])
+    n = (today - first).days + 1
+    offsets = [(date.fromisoformat(d) - first).days for d, _ in daily_rows]
+    seconds = [int(s) for _, s in daily_rows]
+    if np is not None:
+        days = np.zeros(n, dtype=np.int64)
+        np.add.at(days, np.asarray(offsets), np.asarray(seconds, dtype=np.int64))
+        return first, days
+    days = [0] * n
+    for i, s in zip(offsets, seconds):
+        days[i] += s
+    return first, days
+
+
+def _streaks(days) -> tuple[int, int]:
+    """(目前連續天數, 最長連續天數)；今天還沒讀不算中斷"""
+    if np is not None:
+        edges = np.diff(np.concatenate(([0], (days > 0).astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        if not len(starts):
+            return 0, 0
+        longest = int((ends - starts).max())
+        last_end = int(ends[-1])
+        current = int(ends[-1] - starts[-1]) if last_end >= len(days) - 1 else 0
+        return current, longest
+    longest = run = 0
+    for secs in days:
+        run = run + 1 if secs > 0 else 0
+        longest = max(longest, run)
+    current = run
+    if not current:
+        # 今天還沒讀：從昨天往回數
+        for secs in reversed(days[:-1]):
+            if secs <= 0:
+                break
+            current += 1
+    return current, longest
+
+
+def _weekday_totals(days, first: date) -> list[int]:
+    """週一到週日各自的總秒數"""
+    if np is not None:
+        weekday = (np.arange(len(days)) + first.weekday()) % 7
+        return [int(v) for v in np.bincount(weekday, weights=days, minlength=7)]
+    totals = [0] * 7
+    base = first.weekday()
+    for i, secs in enumerate(days):
+        totals[(base + i) % 7] += secs
+    return totals
+
+
+def _hour_cum(t: float, hour: int) -> float:
+    """從 epoch 到當地時間戳 t 之間，落在每天第 hour 小時的秒數"""
+    return (t // _DAY_SECS) * 3600 + min(max(t % _DAY_SECS - hour * 3600, 0), 3600)
+
+def _hour_totals(intervals) -> list[int]:
+    """各區間落在當地每個整點小時（0~23）的秒數合計
+
+    每段區間在第 h 小時的秒數為 _hour_cum(end, h) - _hour_cum(start, h)，numpy 版一次算完 (區間數, 24) 個。
+    """
+    local = [
+        (s.timestamp() + s.astimezone(utils.TW_TZ).utcoffset().total_seconds(),
+         e.timestamp() + e.astimezone(utils.TW_TZ).utcoffset().total_seconds())
+        for s, e in intervals
+    ]
+    if np is not None:
+        if not local:
+            return [0] * 24
+        bounds = np.asarray(local, dtype=np.float64)                  # (n, 2)
+        hours = np.arange(24, dtype=np.float64) * 3600                # (24,)
+        cum = (bounds[..., None] // _DAY_SECS) * 3600 + np.clip(bounds[..., None] % _DAY_SECS - hours, 0, 3600)
+        return [int(v) for v in (cum[:, 1, :] - cum[:, 0, :]).sum(axis=0)]
+    totals = [0.0] * 24
+    for start, end in local:
+        for h in range(24):
+            totals[h] += _hour_cum(end, h) - _hour_cum(start, h)
+    return [int(v) for v in totals]
+
+
+def analyze(daily_rows, intervals, today: str) -> dict:
+    """daily_rows: [(study_date, seconds)] 依日期排序、不含今天之後；intervals: 近期的 [(start, end)]；today: 今天的學習日"""
+    today_d = date.fromisoformat(today)
+    first, days = _daily_array(daily_rows, today_d)
+    n = len(days)
+    if np is not None:
+        total = int(days.sum())
+        active_days = int((days > 0).sum())
+        best = int(days.argmax())
+        avg30 = float(days[-30:].sum()) / min(30, n)
+        avg90 = float(days[-90:].sum()) / min(90, n)
+    else:
+        total = sum(days)
+        active_days = sum(1 for s in days if s > 0)
+        best = max(range(n), key=days.__getitem__)
+        avg30 = sum(days[-30:]) / min(30, n)
+        avg90 = sum(days[-90:]) / min(90, n)
+    current, longest = _streaks(days)
+
+    # 熱度圖：最近 HEATMAP_WEEKS 週（週一開始），每格一天
+    grid_start = today_d - timedelta(days=today_d.weekday() + 7 * (HEATMAP_WEEKS - 1))
+    heatmap = []
+    for offset in range(7 * HEATMAP_WEEKS):
+        d = grid_start + timedelta(days=offset)
+        i = (d - first).days
+        heatmap.append(None if d > today_d else (int(days[i]) if 0 <= i < n else 0))
+
+    return {
+        "first": first.isoformat(),
+        "total": total,
+        "active_days": active_days,
+        "avg30": int(avg30),
+        "avg90": int(avg90),
+        "best_date": (first + timedelta(days=best)).isoformat(),
+        "best_seconds": int(days[best]),
+        "current_streak": current,
+        "longest_streak": longest,
+        "weekday": _weekday_totals(days, first),
+        "hours": _hour_totals(intervals),
+        "heatmap": heatmap,
+    }
+
+
+def _heat(secs) -> str:
+    if secs is None:
+        return " "
+    if not secs:
+        return "·"
+    for limit, ch in _HEAT_LEVELS:
+        if secs < limit:
+            return ch
+    return "█"
+
+
+def render(stats: dict, mention: str) -> str:
+    """組成 /me history 的訊息（程式碼區塊內對齊）"""
+    lines = [
+        f"📈 {mention} 的讀書歷史（{stats['first']} 起，{stats['active_days']} 天有記錄）",
+        f"總計：{utils.format_hms(stats['total'])}｜近 30 天日均：{utils.format_hms(stats['avg30'])}｜近 90 天日均：{utils.format_hms(stats['avg90'])}",
+        f"連續：目前 {stats['current_streak']} 天｜最長 {stats['longest_streak']} 天",
+        f"最佳單日：{stats['best_date']}（{utils.format_hms(stats['best_seconds'])}）",
+        "```",
+        "星期分布",
+    ]
+    weekday = stats["weekday"]
+    peak = max(weekday) or 1
+    total = sum(weekday) or 1
+    for name, secs in zip(WEEKDAY_NAMES, weekday):
+        bar = "█" * round(12 * secs / peak)
+        lines.append(f"{name} {bar:<12} {secs * 100 // total:>3}%")
+
+    hours = stats["hours"]
+    if any(hours):
+        # 從學習日開始的 06:00 排到隔天 05:00
+        order = [(utils.STUDY_DAY_START_HOUR + i) % 24 for i in range(24)]
+        peak = max(hours)
+        spark = "".join(_SPARK[min(len(_SPARK) - 1, hours[h] * len(_SPARK) // (peak + 1))] if hours[h] else " " for h in order)
+        lines += ["", f"時段分布（近 {HISTORY_INTERVAL_DAYS} 天）", spark, "06    12    18    00    "]
+
+    lines += ["", f"近 {HEATMAP_WEEKS} 週（· 0｜░ <1h｜▒ <2h｜▓ <4h｜█ 4h+）"]
+    heatmap = stats["heatmap"]
+    for wd, name in enumerate(WEEKDAY_NAMES):
+        lines.append(f"{name} " + "".join(_heat(heatmap[w * 7 + wd]) for w in range(HEATMAP_WEEKS)))
+    lines.append("```")
+    return "\n".join(lines)
@@ -0,0 +1,172 @@
+"""
+把舊版部署的 SQLite 資料庫（study_time.db）匯入 PostgreSQL（DATABASE_URL）
+
+用法（在專案根目錄，請先停止機器人，避免緩衝中的寫入與彙總表重算互相覆蓋）：
+    python -m src.import_sqlite study_time.db --dry-run        # 只列出各表列數
+    python -m src.import_sqlite study_time.db                  # 匯入；中斷後再執行同一指令會從進度接續
+    python -m src.import_sqlite study_time.db --on-conflict add --batch-size 20000
+
+每張表依 rowid 分批讀出，每批以 COPY 寫入暫存表後 upsert 合併，並在同一個交易內記錄進度
+（import_checkpoints），因此中斷後重跑不會重複匯入（進度以 rowid 記錄，接續前請勿修改來源檔）。time_log 匯入後依 time_log 重算週/月/總計彙總表。
+
+--on-conflict 決定 PostgreSQL 已有同一主鍵時怎麼做：
+    replace（預設）：以 SQLite 的值取代   add：time_log 秒數相加（其他表同 replace）   keep：保留 PostgreSQL 的值
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()  # database 在匯入時讀取 DATABASE_URL 與連線池設定
+
+from . import database as db
+
+IMPORT_BATCH_SIZE = 5000
+PROGRESS_INTERVAL = 5.0    # 每隔幾秒印一次進度
+CONFLICT_MODES = ("replace", "add", "keep")
+
+# (表名, [(欄位, SQLite 缺少此欄位時的預設值)], 主鍵)；依此順序匯入
+TABLES = (
+    ("time_log", (("guild_id", None), ("user_id", None), ("study_date", None), ("seconds", None)),
+     "guild_id, user_id, study_date"),
+    ("config", (("guild_id", None), ("announce_channel_id", None)), "guild_id"),
+    ("monitor_channels", (("guild_id", None), ("channel_id", None)), "guild_id, channel_id"),
+    ("active_sessions", (("guild_id", None), ("user_id", None), ("session_type", None), ("start_time", None),
+                         ("accumulated_seconds", "0")), "guild_id, user_id, session_type"),
+    ("paused_sessions", (("guild_id", None), ("user_id", None), ("session_type", None), ("pause_time", None),
+                         ("accumulated_seconds", "0")), "guild_id, user_id, session_type"),
+    # 新版 SQLite 後端才有；只新增，沒有主鍵可合併
+    ("session_intervals", (("guild_id", None), ("user_id", None), ("session_type", None), ("start_time", None),
+                           ("end_time", None)), ""),
+)
+TABLE_NAMES = tuple(name for name, _, _ in TABLES)
+
+
+def _update_columns(table: str, columns, conflict: str, mode: str):
+    """衝突時要更新的 [(欄位, 運算式)]；keep 或沒有非主鍵欄位時為空（DO NOTHING）"""
+    if mode == "keep":
+        return ()
+    keys = {c.strip() for c in conflict.split(",")}
+    if table == "time_log" and mode == "add":
+        return (("seconds", "time_log.seconds + excluded.seconds"),)
+    return tuple((col, f"excluded.{col}") for col in columns if col not in keys)
+
+
+def _select_list(src: sqlite3.Connection, table: str, columns):
+    """SQLite 端的 SELECT 欄位；舊版缺少的欄位以預設值代替。表不存在時回傳 None"""
+    present = {row[1] for row in src.execute(f"PRAGMA table_info({table})")}
+    if not present:
+        return None
+    exprs = []
+    for col, default in columns:
+        if col in present:
+            exprs.append(col if default is None else f"COALESCE({col}, {default})")
+        elif default is not None:
+            exprs.append(default)
+        else:
+            raise RuntimeError(f"{table} 缺少必要欄位 {col}")
+    return ", ".join(exprs)
+
+
+def _prepare_time_log(src: sqlite3.Connection, after: int):
+    """為尚未匯入的 time_log 建立月分區"""
+    lo, hi = src.execute("SELECT MIN(study_date), MAX(study_date) FROM time_log WHERE rowid > ?", (after,)).fetchone()
+    if lo:
+        db.create_time_log_partitions(lo, hi)
+
+
+def import_table(src: sqlite3.Connection, source: str, table: str, columns, conflict: str,
+                 mode: str, batch_size: int, after: int) -> int:
+    """從 rowid > after 開始分批匯入一張表，回傳本次匯入列數"""
+    select = _select_list(src, table, columns)
+    names = [col for col, _ in columns]
+    updates = _update_columns(table, names, conflict, mode)
+    if table == "time_log":
+        _prepare_time_log(src, after)
+
+    total = src.execute(f"SELECT COUNT(*) FROM {table} WHERE rowid > ?", (after,)).fetchone()[0]
+    done = 0
+    t0 = last_report = time.perf_counter()
+    while True:
+        batch = src.execute(
+            f"SELECT rowid, {select} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?", (after, batch_size)
+        ).fetchall()
+        if not batch:
+            break
+        after = batch[-1][0]
+        db.import_batch(table, names, [row[1:] for row in batch], conflict, source, after, updates)
+        done += len(batch)
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            print(f"  {table}: {done:,} / {total:,}（{done / (now - t0):,.0f} 筆/秒）")
+    elapsed = time.perf_counter() - t0
+    print(f"{table}: 匯入 {done:,} 筆，{elapsed:.1f} 秒（{done / elapsed if elapsed else 0:,.0f} 筆/秒）")
+    return done
+
+
+def run_import(path: str, tables=TABLE_NAMES, mode: str = "replace", batch_size: int = IMPORT_BATCH_SIZE,
+               restart: bool = False, dry_run: bool = False) -> dict:
+    """匯入 path 的 SQLite 資料庫，回傳 {表名: 本次匯入列數}（dry_run 時為尚未匯入的列數）"""
+    source = os.path.realpath(path)
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    try:
+        if restart and not dry_run:
+            db.clear_import_checkpoints(source)
+        checkpoints = {} if restart else db.get_import_checkpoints(source)
+        result = {}
+        for table, columns, conflict in TABLES:
+            if table not in tables or _select_list(src, table, columns) is None:
+                continue
+            after, imported = checkpoints.get(table, (0, 0))
+            if imported:
+                print(f"{table}: 從進度接續（已匯入 {imported:,} 筆，rowid > {after}）")
+            if dry_run:
+                result[table] = src.execute(f"SELECT COUNT(*) FROM {table} WHERE rowid > ?", (after,)).fetchone()[0]
+                print(f"{table}: 待匯入 {result[table]:,} 筆")
+                continue
+            result[table] = import_table(src, source, table, columns, conflict, mode, batch_size, after)
+
+        if "time_log" in result and not dry_run:
+            t0 = time.perf_counter()
+            guild_ids = [g for (g,) in src.execute("SELECT DISTINCT guild_id FROM time_log")]
+            db.recompute_rollups(guild_ids)
+            print(f"重算 {len(guild_ids)} 個伺服器的彙總表，{time.perf_counter() - t0:.1f} 秒")
+        return result
+    finally:
+        src.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把舊版 SQLite 資料庫（study_time.db）匯入 PostgreSQL")
+    parser.add_argument("path", help="SQLite 資料庫檔案")
+    parser.add_argument("--tables", nargs="+", choices=TABLE_NAMES, default=TABLE_NAMES, help="只匯入這些表")
+    parser.add_argument("--on-conflict", choices=CONFLICT_MODES, default="replace",
+                        help="PostgreSQL 已有同一主鍵時：replace 取代、add time_log 秒數相加、keep 保留")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="每批匯入的列數")
+    parser.add_argument("--restart", action="store_true", help="忽略先前的進度，從頭匯入")
+    parser.add_argument("--dry-run", action="store_true", help="只列出各表待匯入的列數")
+    args = parser.parse_args(argv)
+
+    if not db.DATABASE_URL:
+        parser.error("需要設定 DATABASE_URL（匯入目標的 PostgreSQL）")
+    if not os.path.exists(args.path):
+        parser.error(f"找不到 {args.path}")
+
+    db.ensure_db()
+    try:
+        t0 = time.perf_counter()
+        result = run_import(args.path, args.tables, args.on_conflict, args.batch_size, args.restart, args.dry_run)
+        if not args.dry_run:
+            rows = sum(result.values())
+            elapsed = time.perf_counter() - t0
+            print(f"完成：共 {rows:,} 筆，{elapsed:.1f} 秒（{rows / elapsed if elapsed else 0:,.0f} 筆/秒）")
+    finally:
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
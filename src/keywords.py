@@ -0,0 +1,45 @@
+"""
+關鍵字分派表：把 config.json 的四組關鍵字預先編成「正規化關鍵字 → 動作」的 dict，
+on_message 只需正規化一次再查表。
+"""
+import unicodedata
+from typing import Optional
+
+STUDY = "study"
+PAUSE = "pause"
+RESUME = "resume"
+REST = "rest"
+
+# 同一個關鍵字出現在多組時，依此順序優先（與原本 on_message 的判斷順序相同）
+ACTIONS = (
+    (STUDY, "study_keywords", ["讀", "讀書", "開始", "start"]),
+    (PAUSE, "pause_keywords", ["拉", "暫停"]),
+    (RESUME, "resume_keywords", ["拉完", "爽", "繼續"]),
+    (REST, "rest_keywords", ["休", "休息", "結束", "end", "stop"]),
+)
+
+
+def normalize(text: str) -> str:
+    """全形轉半形（NFKC）、去除前後空白並忽略大小寫"""
+    return unicodedata.normalize("NFKC", text).strip().casefold()
+
+
+def build_table(config: dict) -> dict[str, str]:
+    """由設定檔建立分派表"""
+    table: dict[str, str] = {}
+    for action, config_key, default in ACTIONS:
+        for keyword in config.get(config_key, default):
+            table.setdefault(normalize(str(keyword)), action)
+    return table
+
+
+class KeywordDispatcher:
+    def __init__(self, config: dict):
+        self._table = build_table(config)
+
+    def reload(self, config: dict):
+        self._table = build_table(config)
+
+    def classify(self, content: str) -> Optional[str]:
+        """回傳訊息對應的動作（STUDY / PAUSE / RESUME / REST），不是關鍵字則回傳 None"""
+        return self._table.get(normalize(content))
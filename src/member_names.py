@@ -0,0 +1,192 @@
+"""
+成員顯示名稱快取：排行榜、公告與 /study_status 需要把 user_id 轉成名稱，
+沒有 members intent 時 guild.get_member 大多拿不到，逐列呼叫 API 又太慢。
+
+查找順序：gateway 快取（guild.get_member）→ 記憶體 LRU → member_names 資料表 → 批次查詢 Discord。
+超過 MEMBER_NAME_TTL 的名稱先照用，背景再批次更新；新取得的名稱定時批次寫回資料表。
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import discord
+
+from . import async_db as adb
+
+MEMBER_NAME_CACHE_SIZE = int(os.environ.get('MEMBER_NAME_CACHE_SIZE', '50000'))
+MEMBER_NAME_TTL = int(os.environ.get('MEMBER_NAME_TTL', str(24 * 3600)))       # 名稱多久後背景更新（秒）
+MEMBER_QUERY_TIMEOUT = float(os.environ.get('MEMBER_QUERY_TIMEOUT', '3'))      # 指令最多等查詢幾秒，逾時先顯示 User ID
+MEMBER_FETCH_CONCURRENCY = int(os.environ.get('MEMBER_FETCH_CONCURRENCY', '4')) # 無法走 gateway 查詢時，REST 同時查幾個
+MEMBER_QUERY_CHUNK = 100  # Request Guild Members 一次最多 100 個 user_id
+
+
+class MemberNameCache:
+    def __init__(self, maxsize: int = MEMBER_NAME_CACHE_SIZE, ttl: int = MEMBER_NAME_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # (guild_id, user_id) -> (顯示名稱或 None（查不到，可能已離開）, 取得時間 time.time())
+        self._data: OrderedDict[tuple[int, int], tuple[Optional[str], float]] = OrderedDict()
+        self._dirty: dict[tuple[int, int], str] = {}     # 尚未寫回資料表的名稱
+        self._inflight: set[tuple[int, int]] = set()     # 查詢中，避免重複送出
+        self._tasks: set[asyncio.Task] = set()
+        self._gateway_query = True   # query_members 不可用（例如未開 members intent）時改用 REST
+        self._fetch_semaphore: Optional[asyncio.Semaphore] = None
+        self.hits = 0
+        self.misses = 0
+        self.db_loaded = 0
+        self.queried = 0
+
+    def _put(self, key: tuple[int, int], name: Optional[str], fetched_at: float):
+        self._data[key] = (name, fetched_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def remember(self, member: discord.Member):
+        """從事件中順手拿到的 Member 更新名稱（不呼叫 API）"""
+        key = (member.guild.id, member.id)
+        name = member.display_name
+        entry = self._data.get(key)
+        now = time.time()
+        if entry is not None and entry[0] == name and now - entry[1] < self.ttl:
+            return
+        self._put(key, name, now)
+        self._dirty[key] = name
+
+    def _fresh(self, entry) -> bool:
+        return time.time() - entry[1] < self.ttl
+
+    async def resolve(self, guild: discord.Guild, user_ids) -> dict[int, str]:
+        """回傳 {user_id: 顯示名稱}；查不到的不會出現在結果中（由呼叫端顯示 User ID）"""
+        names: dict[int, str] = {}
+        missing: list[int] = []
+        stale: list[int] = []
+        for uid in dict.fromkeys(user_ids):
+            member = guild.get_member(uid)
+            if member is not None:
+                self.remember(member)
+                names[uid] = member.display_name
+                continue
+            entry = self._data.get((guild.id, uid))
+            if entry is None:
+                missing.append(uid)
+                continue
+            self.hits += 1
+            self._data.move_to_end((guild.id, uid))
+            if entry[0] is not None:
+                names[uid] = entry[0]
+            if not self._fresh(entry):
+                stale.append(uid)
+
+        if missing:
+            self.misses += len(missing)
+            rows = await adb.get_member_names(guild.id, missing)
+            self.db_loaded += len(rows)
+            for uid, (name, updated_at) in rows.items():
+                fetched_at = updated_at.timestamp()
+                self._put((guild.id, uid), name, fetched_at)
+                names[uid] = name
+                if time.time() - fetched_at >= self.ttl:
+                    stale.append(uid)
+            missing = [uid for uid in missing if uid not in rows]
+
+        if missing:
+            # 沒見過的 ID 等查詢結果（有上限），逾時的部分在背景繼續
+            task = self._spawn(self._query(guild, missing))
+            await asyncio.wait({task}, timeout=MEMBER_QUERY_TIMEOUT)
+            for uid in missing:
+                entry = self._data.get((guild.id, uid))
+                if entry is not None and entry[0] is not None:
+                    names[uid] = entry[0]
+        if stale:
+            self._spawn(self._query(guild, stale))
+        return names
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _query(self, guild: discord.Guild, user_ids: list[int]):
+        """分批向 Discord 查詢這些成員並更新快取"""
+        user_ids = [uid for uid in user_ids if (guild.id, uid) not in self._inflight]
+        if not user_ids:
+            return
+        keys = {(guild.id, uid) for uid in user_ids}
+        self._inflight |= keys
+        try:
+            found: dict[int, str] = {}
+            for i in range(0, len(user_ids), MEMBER_QUERY_CHUNK):
+                chunk = user_ids[i:i + MEMBER_QUERY_CHUNK]
+                found.update(await self._query_chunk(guild, chunk))
+            now = time.time()
+            for uid in user_ids:
+                name = found.get(uid)
+                self._put((guild.id, uid), name, now)
+                if name is not None:
+                    self._dirty[(guild.id, uid)] = name
+            self.queried += len(user_ids)
+        except Exception as e:
+            print(f"[WARN] 查詢成員名稱失敗 guild={guild.id}: {e}")
+        finally:
+            self._inflight -= keys
+
+    async def _query_chunk(self, guild: discord.Guild, user_ids: list[int]) -> dict[int, str]:
+        if self._gateway_query:
+            try:
+                members = await guild.query_members(user_ids=user_ids, limit=len(user_ids), cache=False)
+                return {m.id: m.display_name for m in members}
+            except discord.ClientException:
+                # 需要 members intent；之後都改走 REST
+                self._gateway_query = False
+            except asyncio.TimeoutError:
+                # gateway 沒有及時回應：這一批改走 REST，之後仍先試 gateway
+                pass
+
+        if self._fetch_semaphore is None:
+            self._fetch_semaphore = asyncio.Semaphore(MEMBER_FETCH_CONCURRENCY)
+
+        async def fetch(uid):
+            async with self._fetch_semaphore:
+                try:
+                    return uid, (await guild.fetch_member(uid)).display_name
+                except discord.NotFound:
+                    return uid, None
+
+        results = await asyncio.gather(*(fetch(uid) for uid in user_ids))
+        return {uid: name for uid, name in results if name is not None}
+
+    async def flush(self):
+        """把新取得的名稱批次寫回資料表"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        try:
+            await adb.save_member_names([(gid, uid, name) for (gid, uid), name in dirty.items()])
+        except Exception:
+            for key, name in dirty.items():
+                self._dirty.setdefault(key, name)
+            raise
+
+    async def close(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "db_loaded": self.db_loaded,
+            "queried": self.queried,
+            "pending": len(self._dirty),
+        }
@@ -0,0 +1,219 @@
+"""
+內建指標：各事件處理、slash 指令與資料庫函式的延遲分布、呼叫次數與錯誤次數，以及 event loop 延遲。
+
+- timed(name)：裝飾同步或 async 函式，記錄每次呼叫的耗時與是否拋出例外
+- observe(name, ms, error)：手動記錄（例如指令由 CommandTree 計時）
+- LoopLagMonitor：定時 sleep，量測實際醒來比預期晚多少（event loop 被卡住的時間）
+- METRICS_PORT 設定時，在本機提供 Prometheus 文字格式的 /metrics
+"""
+import asyncio
+import functools
+import inspect
+import math
+import os
+import threading
+import time
+from typing import Optional
+
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '0'))              # 0 = 不開 HTTP 端點
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+LOOP_LAG_INTERVAL = float(os.environ.get('LOOP_LAG_INTERVAL', '0.5'))  # 量測 event loop 延遲的間隔（秒）
+
+# 延遲分布的桶上限（毫秒）
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, math.inf)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "errors", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float, error: bool = False):
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        if error:
+            self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        """以桶上限估計分位數（落在最後一個桶時回傳最大值）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5), 2),
+            "p99_ms": round(self.quantile(0.99), 2),
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()   # 資料庫函式在執行緒池中記錄
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[str, int] = {}
+        self.started = time.time()
+
+    def observe(self, name: str, ms: float, error: bool = False):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(ms, error)
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def timed(self, name: str):
+        """記錄函式耗時的裝飾器，同步與 async 函式皆可"""
+        def decorator(fn):
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    t0 = time.perf_counter()
+                    error = True
+                    try:
+                        result = await fn(*args, **kwargs)
+                        error = False
+                        return result
+                    finally:
+                        self.observe(name, (time.perf_counter() - t0) * 1000, error)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                error = True
+                try:
+                    result = fn(*args, **kwargs)
+                    error = False
+                    return result
+                finally:
+                    self.observe(name, (time.perf_counter() - t0) * 1000, error)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "uptime_s": round(time.time() - self.started),
+                "histograms": {name: hist.summary() for name, hist in self.histograms.items()},
+                "counters": dict(self.counters),
+            }
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文字格式"""
+        lines = []
+        with self._lock:
+            for name, hist in sorted(self.histograms.items()):
+                label = f'name="{name}"'
+                cumulative = 0
+                for bound, n in zip(BUCKETS_MS, hist.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == math.inf else str(bound)
+                    lines.append(f'studybot_latency_ms_bucket{{{label},le="{le}"}} {cumulative}')
+                lines.append(f"studybot_latency_ms_sum{{{label}}} {hist.total_ms:.3f}")
+                lines.append(f"studybot_latency_ms_count{{{label}}} {hist.count}")
+                lines.append(f"studybot_errors_total{{{label}}} {hist.errors}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'studybot_events_total{{name="{name}"}} {value}')
+        lines.append(f"studybot_uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+timed = metrics.timed
+observe = metrics.observe
+incr = metrics.incr
+
+
+class LoopLagMonitor:
+    """每 interval 秒 sleep 一次，記錄實際醒來時間比預期晚了多少"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, name: str = "loop.lag"):
+        self.interval = interval
+        self.name = name
+        self.last_lag_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.last_lag_ms = max(0.0, (time.perf_counter() - t0 - self.interval) * 1000)
+            metrics.observe(self.name, self.last_lag_ms)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class MetricsServer:
+    """極簡 HTTP 端點：GET /metrics 回傳 Prometheus 格式，其他路徑 404"""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        print(f"📈 指標端點: http://{self.host}:{self.port}/metrics")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # 讀掉其餘標頭
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", metrics.render_prometheus().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
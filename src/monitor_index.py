@@ -0,0 +1,55 @@
+"""
+監聽頻道索引：把 config.json 的 monitor_channels（ID 或名稱）與資料庫 monitor_channels 表
+整理成每個伺服器一個 channel_id 集合，on_message 只需做一次 set 查詢。
+"""
+import discord
+
+
+class MonitorChannelIndex:
+    def __init__(self, config_items=()):
+        self._config_ids: set[int] = set()
+        self._config_names: set[str] = set()
+        self.set_config_items(config_items)
+        self._db_ids: dict[int, set[int]] = {}      # guild_id -> 資料庫設定的頻道
+        self._name_ids: dict[int, set[int]] = {}    # guild_id -> 依名稱解析出的頻道
+        self._index: dict[int, frozenset[int]] = {} # guild_id -> 合併後的頻道集合
+
+    def set_config_items(self, items):
+        """設定 config.json 的 monitor_channels（支援頻道 ID 字串/數字或頻道名稱）"""
+        self._config_ids = {int(item) for item in items if str(item).isdigit()}
+        self._config_names = {str(item) for item in items if not str(item).isdigit()}
+
+    def load_db_rows(self, rows):
+        """從 (guild_id, channel_id) 列表載入資料庫設定"""
+        self._db_ids = {}
+        for guild_id, channel_id in rows:
+            self._db_ids.setdefault(guild_id, set()).add(channel_id)
+
+    def _rebuild(self, guild_id: int):
+        self._index[guild_id] = frozenset(
+            self._config_ids | self._db_ids.get(guild_id, set()) | self._name_ids.get(guild_id, set())
+        )
+
+    def refresh_guild(self, guild: discord.Guild):
+        """重新解析此伺服器中名稱符合的頻道（頻道建立、改名、刪除時呼叫）"""
+        if self._config_names:
+            channels = list(guild.channels) + list(guild.threads)
+            self._name_ids[guild.id] = {ch.id for ch in channels if ch.name in self._config_names}
+        else:
+            self._name_ids.pop(guild.id, None)
+        self._rebuild(guild.id)
+
+    def add(self, guild_id: int, channel_id: int):
+        self._db_ids.setdefault(guild_id, set()).add(channel_id)
+        self._rebuild(guild_id)
+
+    def remove(self, guild_id: int, channel_id: int):
+        self._db_ids.get(guild_id, set()).discard(channel_id)
+        self._rebuild(guild_id)
+
+    def contains(self, guild_id: int, channel_id: int) -> bool:
+        channels = self._index.get(guild_id)
+        if channels is None:
+            # 尚未建立索引的伺服器只看 config.json 的頻道 ID
+            return channel_id in self._config_ids
+        return channel_id in channels
@@ -0,0 +1,125 @@
+"""
+從 session_intervals 重建 time_log 與週/月/總計彙總表
+
+用法（在專案根目錄，請先停止機器人，避免緩衝中的寫入在重建期間寫回）：
+    python -m src.rebuild                          # 重建全部伺服器
+    python -m src.rebuild --guild 123 --dry-run    # 只計算並比對，不寫入
+    python -m src.rebuild --since 2026-01-01       # 只取代這天（含）之後的 time_log
+
+區間依寫入順序分批串流讀出，只在記憶體保留 (guild_id, user_id, 學習日) 的合計。
+未指定 --since 時，每個伺服器從它第一個區間之後的第一個完整學習日開始取代；
+之前的 time_log（開始記錄區間前的時數、第一天不完整的部分）與沒有任何區間的伺服器都原樣保留。
+指定 --since 時，所有有區間的伺服器都從該日取代（早於區間紀錄開始的日子會被清空，會先警告）。
+"""
+import argparse
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from . import utils
+from .storage import backend as db
+
+REBUILD_CHUNK_SIZE = 10000
+
+
+def aggregate(chunks, since=None):
+    """把區間切成各學習日並合計，回傳 ({(guild_id, user_id, study_date): seconds}, 區間數, {guild_id: 最早的區間開始時間})
+
+    手動加的 manual 區間整段計入起點的學習日（與 /debug_add_time 寫入 time_log 的方式相同）。
+    """
+    totals: dict[tuple[int, int, str], int] = {}
+    count = 0
+    first_start: dict[int, datetime] = {}
+    first_manual: dict[int, datetime] = {}
+    for chunk in chunks:
+        for guild_id, user_id, session_type, start, end in chunk:
+            count += 1
+            # manual 區間可能補登在開始記錄之前的日子，不能代表區間紀錄從那天起完整；只在沒有其他區間時採用
+            manual = session_type == utils.MANUAL_SESSION_TYPE
+            if not manual and (first_start.get(guild_id) is None or start < first_start[guild_id]):
+                first_start[guild_id] = start
+            elif manual:
+                first_manual[guild_id] = min(first_manual.get(guild_id, start), start)
+            if manual:
+                segments = [(utils.study_date_of(start), int((end - start).total_seconds()))]
+            else:
+                segments = utils.split_by_study_day(start, end)
+            for sdate, secs in segments:
+                if since is not None and sdate < since:
+                    continue
+                key = (guild_id, user_id, sdate)
+                totals[key] = totals.get(key, 0) + secs
+    for guild_id, start in first_manual.items():
+        first_start.setdefault(guild_id, start)
+    return totals, count, first_start
+
+
+def first_full_day(first_start: datetime) -> str:
+    """第一個區間之後的第一個完整學習日：區間剛好從 06:00 開始時就是當天，否則是隔天"""
+    sdate = utils.study_date_of(first_start)
+    if first_start <= utils.study_day_start(sdate):
+        return sdate
+    return (date.fromisoformat(sdate) + timedelta(days=1)).isoformat()
+
+
+def _current_total(guild_id: int, since: str) -> int:
+    res = db.db_exec(
+        "SELECT COALESCE(SUM(seconds), 0) FROM time_log WHERE study_date >= ? AND guild_id = ?", (since, guild_id)
+    )
+    return int(res[0][0]) if res else 0
+
+
+def rebuild(guild_id=None, since=None, chunk_size: int = REBUILD_CHUNK_SIZE, dry_run: bool = False) -> dict:
+    t0 = time.perf_counter()
+    totals, count, first_start = aggregate(db.iter_session_intervals(guild_id, chunk_size), since)
+    read_s = time.perf_counter() - t0
+    print(f"讀取 {count:,} 個區間，{read_s:.1f} 秒（{count / read_s if read_s else 0:,.0f} 筆/秒）")
+    if not first_start:
+        print("沒有區間紀錄，不需重建")
+        return {"intervals": 0, "rows": 0, "guilds": {}}
+
+    by_guild: dict[int, list[tuple[int, int, str, int]]] = {g: [] for g in first_start}
+    for (g, u, d), secs in totals.items():
+        by_guild[g].append((g, u, d, secs))
+
+    result = {}
+    for g in sorted(first_start):
+        covered = first_full_day(first_start[g])
+        g_since = since or covered
+        if since is not None and since < covered:
+            print(f"⚠️ 伺服器 {g}：--since {since} 早於區間紀錄涵蓋的第一個完整學習日 {covered}，這段期間的 time_log 會被清空")
+        rows = [row for row in by_guild[g] if row[2] >= g_since]
+        rebuilt = sum(secs for *_, secs in rows)
+        current = _current_total(g, g_since)
+        print(
+            f"伺服器 {g} 學習日 {g_since} 起：重建 {len(rows):,} 筆、共 {utils.format_hms(rebuilt)}"
+            f"｜目前 time_log 共 {utils.format_hms(current)}（差 {rebuilt - current:+,} 秒）"
+        )
+        if not dry_run:
+            t1 = time.perf_counter()
+            db.replace_time_log(rows, g_since, g)
+            write_s = time.perf_counter() - t1
+            print(f"  寫入 {len(rows):,} 筆並重算彙總表，{write_s:.1f} 秒")
+        result[g] = {"since": g_since, "rows": len(rows), "seconds": rebuilt, "previous_seconds": current}
+    if dry_run:
+        print("--dry-run：未寫入")
+    return {"intervals": count, "rows": sum(r["rows"] for r in result.values()), "guilds": result}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="從 session_intervals 重建 time_log 與彙總表")
+    parser.add_argument("--guild", type=int, help="只重建這個伺服器")
+    parser.add_argument("--since", help="取代這個學習日（YYYY-MM-DD，含）之後的 time_log；預設為各伺服器區間紀錄涵蓋的第一個完整學習日")
+    parser.add_argument("--chunk-size", type=int, default=REBUILD_CHUNK_SIZE, help="每批讀取的區間數")
+    parser.add_argument("--dry-run", action="store_true", help="只計算並與目前的 time_log 比對")
+    args = parser.parse_args(argv)
+
+    db.ensure_db()
+    try:
+        rebuild(args.guild, args.since, args.chunk_size, args.dry_run)
+    finally:
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+關鍵字回覆的送出佇列：每則「讀」「拉」「休」原本要呼叫 add_reaction 與 reply 兩次 API，
+讀書會時一次湧入幾十則，很快撞上 Discord 的每頻道限速、被 429 退避拖慢所有回覆。
+
+- 每個頻道一個 token bucket（REPLY_RATE 次 / REPLY_RATE_PERIOD 秒），每個 API 呼叫（回覆、摘要、反應）前先等 token，不等 429
+- 送出後的 REPLY_COALESCE_WINDOW 秒內（以及等 token 期間）累積的回覆合併成一則摘要訊息，
+  摘要以 mention 列出每個人（不通知），不再逐則加反應
+- REPLY_MODE=reaction：確認類回覆只加反應、不發文字；沒有反應的提示（例如「你還沒開始讀書喔」）仍會回覆
+頻道安靜時第一則回覆立即送出，不會多等。
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+import discord
+
+from .metrics import incr
+
+REPLY_MODE = os.environ.get('REPLY_MODE', 'reply').lower()                      # reply 或 reaction
+REPLY_RATE = int(os.environ.get('REPLY_RATE', '4'))                             # 每頻道每個週期最多幾次 API 呼叫
+REPLY_RATE_PERIOD = float(os.environ.get('REPLY_RATE_PERIOD', '5'))             # 週期（秒）
+REPLY_COALESCE_WINDOW = float(os.environ.get('REPLY_COALESCE_WINDOW', '1.5'))   # 送出後等多久合併接著來的回覆
+MESSAGE_LIMIT = 2000
+_NO_MENTIONS = discord.AllowedMentions.none()
+
+
+class TokenBucket:
+    def __init__(self, rate: int, period: float):
+        self.capacity = max(rate, 1)
+        self.refill_per_sec = self.capacity / period
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_sec)
+        self.updated = now
+
+    async def acquire(self):
+        """等到有 token 再取走一個"""
+        self._refill()
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) / self.refill_per_sec)
+            self._refill()
+        self.tokens -= 1
+
+
+class ReplyQueue:
+    def __init__(self, mode: str = REPLY_MODE, rate: int = REPLY_RATE, period: float = REPLY_RATE_PERIOD,
+                 coalesce_window: float = REPLY_COALESCE_WINDOW):
+        if mode not in ("reply", "reaction"):
+            raise ValueError(f"不支援的 REPLY_MODE: {mode}（可用 reply、reaction）")
+        self.mode = mode
+        self.rate = rate
+        self.period = period
+        self.coalesce_window = coalesce_window
+        # channel_id -> [(message, text, reaction, 排入時間 time.monotonic())]
+        self._pending: dict[int, list[tuple[discord.Message, Optional[str], Optional[str], float]]] = {}
+        self._buckets: dict[int, TokenBucket] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        # 統計
+        self.queued = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.reactions = 0
+        self.failed = 0
+        self.max_latency_ms = 0.0
+        self._total_latency_ms = 0.0
+        self._delivered = 0
+
+    def send(self, message: discord.Message, text: Optional[str], reaction: Optional[str] = None):
+        """排入回覆：text 回覆文字、reaction 要加在原訊息的反應（都可為 None）"""
+        if self.mode == "reaction" and reaction:
+            text = None
+        channel_id = message.channel.id
+        self._pending.setdefault(channel_id, []).append((message, text, reaction, time.monotonic()))
+        self.queued += 1
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._drain(channel_id))
+
+    async def _drain(self, channel_id: int):
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            bucket = self._buckets[channel_id] = TokenBucket(self.rate, self.period)
+        try:
+            while self._pending.get(channel_id):
+                await bucket.acquire()
+                batch = self._pending.pop(channel_id)
+                await self._deliver(bucket, batch)
+                # 讓緊接著的關鍵字合併成下一則；這段時間沒有新回覆就結束
+                await asyncio.sleep(self.coalesce_window)
+        finally:
+            self._workers.pop(channel_id, None)
+
+    async def _deliver(self, bucket: TokenBucket, batch):
+        texts = [(message, text) for message, text, _, _ in batch if text]
+        single = len(texts) <= 1
+        calls = 0
+
+        async def take_token():
+            # _drain 已為這批的第一個 API 呼叫取得 token，之後的反應與訊息各取一個
+            nonlocal calls
+            if calls:
+                await bucket.acquire()
+            calls += 1
+
+        # 只有一則文字時照原本的方式加反應；合併成摘要時只替沒有文字的回覆（reaction 模式）加反應
+        for message, text, reaction, _ in batch:
+            if reaction and (single or not text):
+                await take_token()
+                await self._call(message.add_reaction(reaction))
+                self.reactions += 1
+        if single:
+            for message, text in texts:
+                await take_token()
+                if await self._call(message.reply(text, mention_author=False)):
+                    self.sent += 1
+        else:
+            # 多則合併成摘要，省下每則的 reply 與反應
+            lines = [f"{message.author.mention} {text}" for message, text in texts]
+            channel = texts[0][0].channel
+            for chunk in _chunks(lines):
+                await take_token()
+                if await self._call(channel.send(chunk, allowed_mentions=_NO_MENTIONS)):
+                    self.sent += 1
+            self.coalesced += len(texts)
+            incr("reply.coalesced", len(texts))
+        now = time.monotonic()
+        for *_, queued_at in batch:
+            latency_ms = (now - queued_at) * 1000
+            self._total_latency_ms += latency_ms
+            self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        self._delivered += len(batch)
+
+    async def _call(self, coro) -> bool:
+        try:
+            await coro
+            return True
+        except discord.HTTPException as e:
+            self.failed += 1
+            incr("reply.failed")
+            print(f"[WARN] reply failed: {e}")
+            return False
+
+    async def close(self, timeout: float = 5.0):
+        """關機前盡量送完佇列中的回覆，逾時則放棄"""
+        tasks = list(self._workers.values())
+        if not tasks:
+            return
+        _, still_running = await asyncio.wait(tasks, timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        await asyncio.gather(*still_running, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "pending": sum(len(items) for items in self._pending.values()),
+            "channels": len(self._workers),
+            "queued": self.queued,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "reactions": self.reactions,
+            "failed": self.failed,
+            "avg_latency_ms": round(self._total_latency_ms / self._delivered, 1) if self._delivered else 0.0,
+            "max_latency_ms": round(self.max_latency_ms, 1),
+        }
+
+
+def _chunks(lines: list[str]) -> list[str]:
+    """把多行合併成不超過 Discord 訊息長度上限的幾則"""
+    chunks, current = [], ""
+    for line in lines:
+        line = line[:MESSAGE_LIMIT]
+        if current and len(current) + 1 + len(line) > MESSAGE_LIMIT:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
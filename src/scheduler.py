@@ -0,0 +1,138 @@
+"""
+排程器：每個工作各自睡到下一個截止時間才醒來，不再每分鐘輪詢。
+
+- DailyAt：每天固定時刻（例如 06:00 公告）
+- Every：固定間隔（例如分區維護、心跳）
+- catch_up=True 的工作在啟動時先補跑錯過的截止時間：有提供 last_run（回傳持久化的最後完成時間）時，
+  依序補跑 last_run 之後到現在的每個截止時間（最多 SCHEDULER_MAX_CATCH_UP 次，更早的略過並記錄），
+  否則只以「最近一次應執行的時間」呼叫一次；由工作本身依執行紀錄決定哪些伺服器需要補跑
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+SCHEDULER_MAX_CATCH_UP = int(os.environ.get('SCHEDULER_MAX_CATCH_UP', '7'))   # 啟動時最多補跑幾個錯過的截止時間
+
+
+class DailyAt:
+    def __init__(self, hour: int, minute: int, tz):
+        self.hour = hour
+        self.minute = minute
+        self.tz = tz
+
+    def _today(self, now: datetime) -> datetime:
+        local = now.astimezone(self.tz)
+        return local.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+
+    def previous(self, now: datetime) -> datetime:
+        """最近一次 <= now 的截止時間"""
+        deadline = self._today(now)
+        return deadline if deadline <= now else deadline - timedelta(days=1)
+
+    def next(self, now: datetime) -> datetime:
+        """下一次 > now 的截止時間"""
+        deadline = self._today(now)
+        return deadline if deadline > now else deadline + timedelta(days=1)
+
+
+class Every:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def previous(self, now: datetime) -> datetime:
+        return now
+
+    def next(self, now: datetime) -> datetime:
+        return now + timedelta(seconds=self.seconds)
+
+
+async def _sleep_until(deadline: datetime):
+    while True:
+        remaining = (deadline - datetime.now(timezone.utc)).total_seconds()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(remaining)
+
+
+class Scheduler:
+    def __init__(self, wait_ready=None):
+        self._wait_ready = wait_ready  # 例如 bot.wait_until_ready
+        self._tasks: dict[str, asyncio.Task] = {}
+        self.job_stats: dict[str, dict] = {}
+
+    def add(self, name: str, trigger, callback, catch_up: bool = False, last_run=None):
+        """註冊工作；callback(deadline, catch_up) 為 coroutine function
+
+        last_run：回傳最後完成時間（datetime 或 None）的 coroutine function，catch_up 時用來找出所有錯過的截止時間
+        """
+        self.remove(name)
+        self.job_stats[name] = {"runs": 0, "failures": 0, "last_run": None, "last_ms": None, "next_run": None}
+        self._tasks[name] = asyncio.get_running_loop().create_task(
+            self._run(name, trigger, callback, catch_up, last_run)
+        )
+
+    def remove(self, name: str):
+        task = self._tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _invoke(self, name: str, callback, deadline: datetime, catch_up: bool):
+        stats = self.job_stats[name]
+        t0 = time.perf_counter()
+        try:
+            await callback(deadline, catch_up)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            stats["failures"] += 1
+            print(f"❌ 排程工作 {name} 失敗: {e}")
+        stats["runs"] += 1
+        stats["last_run"] = deadline
+        stats["last_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    async def _missed(self, name: str, trigger, last_run) -> list[datetime]:
+        """last_run 之後、現在之前（含）的截止時間，由舊到新"""
+        now = datetime.now(timezone.utc)
+        latest = trigger.previous(now)
+        since = await last_run() if last_run is not None else None
+        if since is None or since >= latest:
+            return [latest]
+        deadlines = deque(maxlen=SCHEDULER_MAX_CATCH_UP)
+        skipped = 0
+        deadline = trigger.next(since)
+        while deadline <= now:
+            if len(deadlines) == deadlines.maxlen:
+                skipped += 1
+            deadlines.append(deadline)
+            deadline = trigger.next(deadline)
+        if skipped:
+            print(f"⚠️ 排程工作 {name} 錯過 {skipped + len(deadlines)} 次，只補跑最近 {len(deadlines)} 次")
+        return list(deadlines) or [latest]
+
+    async def _run(self, name: str, trigger, callback, catch_up: bool, last_run=None):
+        if self._wait_ready is not None:
+            await self._wait_ready()
+
+        if catch_up:
+            try:
+                deadlines = await self._missed(name, trigger, last_run)
+            except Exception as e:
+                print(f"❌ 排程工作 {name} 讀取執行紀錄失敗: {e}")
+                deadlines = [trigger.previous(datetime.now(timezone.utc))]
+            for deadline in deadlines:
+                await self._invoke(name, callback, deadline, catch_up=True)
+
+        while True:
+            deadline = trigger.next(datetime.now(timezone.utc))
+            self.job_stats[name]["next_run"] = deadline
+            await _sleep_until(deadline)
+            await self._invoke(name, callback, deadline, catch_up=False)
@@ -0,0 +1,179 @@
+"""
+進行中／暫停中計時的記憶體儲存：以平行 array 存放每筆計時（開始或暫停時間的 epoch 秒、已累積秒數、類型與暫停旗標），
+每個伺服器一個 {user_id 與類型: slot} 索引，不需為每人各建 tuple、datetime 與多個 dict 項目。
+
+- 單人查詢、開始、暫停、結束都是 O(1)
+- /study_status、重新同步等只走訪該伺服器的計時（O(伺服器人數)）
+- 刪除後的 slot 放進 free list 重複使用
+"""
+from array import array
+from datetime import datetime, timezone
+from typing import Iterator, NamedTuple, Optional
+
+VOICE = 0
+TEXT = 1
+KIND_NAMES = ("voice", "text")
+_PAUSED = 0x2   # flags 的第 2 個 bit；第 1 個 bit 是類型
+
+
+def kind_of(session_type: str) -> int:
+    """資料庫的 session_type（"voice"/"text"）轉成 VOICE/TEXT"""
+    return KIND_NAMES.index(session_type)
+
+
+class Session(NamedTuple):
+    guild_id: int
+    user_id: int
+    kind: int
+    time: datetime      # 進行中為開始時間，暫停中為暫停時間（UTC）
+    accumulated: int    # 本次已累積秒數（文字計時的暫停前、06:00 前）
+    paused: bool
+
+
+class SessionStore:
+    __slots__ = ("_guild", "_user", "_time", "_acc", "_flags", "_free", "_index")
+
+    def __init__(self):
+        self._guild = array("q")
+        self._user = array("q")
+        self._time = array("d")
+        self._acc = array("q")
+        self._flags = array("B")
+        self._free: list[int] = []
+        self._index: dict[int, dict[int, int]] = {}   # guild_id -> {(user_id << 1) | kind: slot}
+
+    # ------- 內部 -------
+    @staticmethod
+    def _key(user_id: int, kind: int) -> int:
+        return (user_id << 1) | kind
+
+    def _slot(self, guild_id: int, user_id: int, kind: int) -> Optional[int]:
+        sessions = self._index.get(guild_id)
+        return sessions.get(self._key(user_id, kind)) if sessions else None
+
+    def _session(self, slot: int) -> Session:
+        flags = self._flags[slot]
+        return Session(
+            self._guild[slot],
+            self._user[slot],
+            flags & 1,
+            datetime.fromtimestamp(self._time[slot], timezone.utc),
+            self._acc[slot],
+            bool(flags & _PAUSED),
+        )
+
+    def _set(self, guild_id: int, user_id: int, kind: int, ts: datetime, accumulated: int, paused: bool):
+        flags = kind | (_PAUSED if paused else 0)
+        sessions = self._index.setdefault(guild_id, {})
+        key = self._key(user_id, kind)
+        slot = sessions.get(key)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+                self._guild[slot] = guild_id
+                self._user[slot] = user_id
+            else:
+                slot = len(self._flags)
+                self._guild.append(guild_id)
+                self._user.append(user_id)
+                self._time.append(0.0)
+                self._acc.append(0)
+                self._flags.append(0)
+            sessions[key] = slot
+        self._time[slot] = ts.timestamp()
+        self._acc[slot] = accumulated
+        self._flags[slot] = flags
+
+    def _remove(self, guild_id: int, key: int):
+        sessions = self._index[guild_id]
+        slot = sessions.pop(key)
+        if not sessions:
+            del self._index[guild_id]
+        self._flags[slot] = 0
+        self._free.append(slot)
+
+    # ------- 寫入 -------
+    def start(self, guild_id: int, user_id: int, kind: int, start: datetime, accumulated: int = 0):
+        """開始（或恢復、06:00 切分後重設）計時"""
+        self._set(guild_id, user_id, kind, start, accumulated, False)
+
+    def pause(self, guild_id: int, user_id: int, kind: int, pause_time: datetime, accumulated: int):
+        """把計時改成暫停狀態，保留已累積秒數"""
+        self._set(guild_id, user_id, kind, pause_time, accumulated, True)
+
+    def pop(self, guild_id: int, user_id: int, kind: int, paused: Optional[bool] = None) -> Optional[Session]:
+        """移除並回傳這筆計時；paused 指定時只移除狀態相符的（進行中/暫停中）"""
+        slot = self._slot(guild_id, user_id, kind)
+        if slot is None:
+            return None
+        session = self._session(slot)
+        if paused is not None and session.paused != paused:
+            return None
+        self._remove(guild_id, self._key(user_id, kind))
+        return session
+
+    def clear_guilds(self, guild_ids):
+        """移除這些伺服器的所有計時（重新同步前）"""
+        for guild_id in guild_ids:
+            for key in list(self._index.get(guild_id, ())):
+                self._remove(guild_id, key)
+
+    # ------- 查詢 -------
+    def get(self, guild_id: int, user_id: int, kind: int) -> Optional[Session]:
+        slot = self._slot(guild_id, user_id, kind)
+        return None if slot is None else self._session(slot)
+
+    def active(self, guild_id: int, user_id: int, kind: int) -> Optional[Session]:
+        """進行中的計時（不含暫停中）"""
+        session = self.get(guild_id, user_id, kind)
+        return session if session is not None and not session.paused else None
+
+    def paused(self, guild_id: int, user_id: int, kind: int) -> Optional[Session]:
+        session = self.get(guild_id, user_id, kind)
+        return session if session is not None and session.paused else None
+
+    def guild_sessions(self, guild_id: int) -> Iterator[Session]:
+        """此伺服器的所有計時（只走訪該伺服器的索引）"""
+        for slot in list(self._index.get(guild_id, {}).values()):
+            yield self._session(slot)
+
+    def active_keys(self, kind: int) -> set[tuple[int, int]]:
+        """進行中計時的 (guild_id, user_id)"""
+        return {
+            (self._guild[slot], self._user[slot])
+            for sessions in self._index.values()
+            for slot in sessions.values()
+            if self._flags[slot] == kind
+        }
+
+    def iter_active(self, before: Optional[datetime] = None) -> Iterator[Session]:
+        """所有進行中的計時；指定 before 時只回傳開始時間早於它的（06:00 切分用）"""
+        limit = before.timestamp() if before is not None else None
+        for sessions in list(self._index.values()):
+            for slot in list(sessions.values()):
+                if self._flags[slot] & _PAUSED:
+                    continue
+                if limit is not None and self._time[slot] >= limit:
+                    continue
+                yield self._session(slot)
+
+    def __len__(self) -> int:
+        return len(self._flags) - len(self._free)
+
+    def stats(self) -> dict:
+        counts = {"voice": 0, "text": 0, "paused": 0}
+        for sessions in self._index.values():
+            for slot in sessions.values():
+                flags = self._flags[slot]
+                if flags & _PAUSED:
+                    counts["paused"] += 1
+                else:
+                    counts[KIND_NAMES[flags & 1]] += 1
+        array_bytes = sum(a.itemsize * len(a) for a in (self._guild, self._user, self._time, self._acc, self._flags))
+        return {
+            **counts,
+            "slots": len(self._flags),
+            "free": len(self._free),
+            "guilds": len(self._index),
+            "array_bytes": array_bytes,
+        }
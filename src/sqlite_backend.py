@@ -0,0 +1,727 @@
+"""
+SQLite 儲存後端（DB_BACKEND=sqlite）：小型部署不需要資料庫伺服器，也沒有網路往返。
+
+- WAL 模式：讀取不會被寫入擋住，寫入也不必等讀取結束
+- 讀取：每個執行緒一條唯讀連線，SQL 固定不變，由 sqlite3 快取 prepared statement
+- 寫入：全部交給單一寫入執行緒、在同一條連線上依序以 BEGIN IMMEDIATE 交易執行，不會互相搶鎖
+- 函式名稱、參數與回傳格式與 database.py 相同（見 storage.BACKEND_FUNCTIONS）
+
+只支援單一程序；多程序部署（MULTI_PROCESS）請使用 PostgreSQL。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'study_time.db')
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', '5'))   # 其他程序（例如備份）持有鎖時最多等幾秒
+SQLITE_STATEMENT_CACHE = 256
+# 同時讀取的執行緒數；async_db 預設依此決定執行緒池大小
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '4'))
+
+# ========= 連線 =========
+_local = threading.local()
+_readers: list[sqlite3.Connection] = []
+_lock = threading.Lock()
+_generation = 0            # close_pool 後 +1，讓各執行緒重新連線
+
+_writer = None             # 單一寫入執行緒
+_writer_conn = None
+# 統計
+_writes = 0
+_pending_writes = 0
+_total_write_ms = 0.0
+_max_write_ms = 0.0
+
+
+def _connect(readonly: bool) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        SQLITE_PATH,
+        timeout=SQLITE_BUSY_TIMEOUT,
+        isolation_level=None,           # 自行控制交易
+        check_same_thread=False,        # 只在建立它的執行緒使用；關閉時由 close_pool 統一處理
+        cached_statements=SQLITE_STATEMENT_CACHE,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if readonly:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+def _reader() -> sqlite3.Connection:
+    """此執行緒的唯讀連線"""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "generation", None) != _generation:
+        conn = _connect(readonly=True)
+        with _lock:
+            _readers.append(conn)
+        _local.conn = conn
+        _local.generation = _generation
+    return conn
+
+def _run_write(fn, args):
+    """在寫入執行緒上以單一交易執行 fn(conn, *args)"""
+    global _writer_conn, _writes, _pending_writes, _total_write_ms, _max_write_ms
+    if _writer_conn is None:
+        _writer_conn = _connect(readonly=False)
+    conn = _writer_conn
+    t0 = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = fn(conn, *args)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        with _lock:
+            _writes += 1
+            _pending_writes -= 1
+            _total_write_ms += elapsed_ms
+            _max_write_ms = max(_max_write_ms, elapsed_ms)
+    return result
+
+def _write(fn, *args):
+    """把寫入交給寫入執行緒並等待結果"""
+    global _writer, _pending_writes
+    with _lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        _pending_writes += 1
+        writer = _writer
+    return writer.submit(_run_write, fn, args).result()
+
+def _ids(values) -> str:
+    """清單參數以 JSON 傳入，SQL 用 IN (SELECT value FROM json_each(?))，語句固定可重複使用"""
+    return json.dumps([int(v) for v in values])
+
+def pool_stats() -> dict:
+    with _lock:
+        return {
+            "backend": "sqlite",
+            "path": SQLITE_PATH,
+            "readers": len(_readers),
+            "writes": _writes,
+            "pending_writes": _pending_writes,
+            "avg_write_ms": round(_total_write_ms / _writes, 3) if _writes else 0.0,
+            "max_write_ms": round(_max_write_ms, 3),
+        }
+
+def close_pool():
+    global _writer, _writer_conn, _generation
+    with _lock:
+        writer, _writer = _writer, None
+        readers = list(_readers)
+        _readers.clear()
+        _generation += 1
+    if writer is not None:
+        def _close_writer():
+            global _writer_conn
+            if _writer_conn is not None:
+                _writer_conn.close()
+                _writer_conn = None
+        writer.submit(_close_writer).result()
+        writer.shutdown(wait=True)
+    for conn in readers:
+        conn.close()
+
+def db_exec(sql: str, params=(), commit=False):
+    """執行 SQL 指令並回傳結果（SQLite 原生使用 ? 參數，不需轉換）"""
+    if commit:
+        return _write(lambda conn: conn.execute(sql, params).fetchall())
+    return _reader().execute(sql, params).fetchall()
+
+# ========= Schema 版本管理 =========
+
+def _columns(conn, table: str) -> set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def _migrate_1_baseline(conn):
+    """所有資料表；沿用舊版 study_time.db 時補上新欄位並回填彙總表"""
+    for cmd in (
+        """
+        CREATE TABLE IF NOT EXISTS time_log (
+            guild_id   INTEGER NOT NULL,
+            user_id    INTEGER NOT NULL,
+            study_date TEXT    NOT NULL,
+            seconds    INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id, study_date)
+        )
+        """,
+        # 排行榜查詢的 covering index
+        "CREATE INDEX IF NOT EXISTS time_log_guild_date ON time_log(guild_id, study_date, user_id, seconds)",
+        """
+        CREATE TABLE IF NOT EXISTS config (
+            guild_id INTEGER PRIMARY KEY,
+            announce_channel_id INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS active_sessions (
+            guild_id     INTEGER NOT NULL,
+            user_id      INTEGER NOT NULL,
+            session_type TEXT    NOT NULL,
+            start_time   TEXT    NOT NULL,
+            accumulated_seconds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, user_id, session_type)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS paused_sessions (
+            guild_id     INTEGER NOT NULL,
+            user_id      INTEGER NOT NULL,
+            session_type TEXT    NOT NULL,
+            pause_time   TEXT    NOT NULL,
+            accumulated_seconds INTEGER DEFAULT 0,
+            PRIMARY KEY (guild_id, user_id, session_type)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS monitor_channels (
+            guild_id   INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, channel_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS time_log_weekly (
+            guild_id   INTEGER NOT NULL,
+            user_id    INTEGER NOT NULL,
+            week_start TEXT    NOT NULL,
+            seconds    INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, week_start, user_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS time_log_monthly (
+            guild_id INTEGER NOT NULL,
+            user_id  INTEGER NOT NULL,
+            month    TEXT    NOT NULL,
+            seconds  INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, month, user_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS time_log_alltime (
+            guild_id INTEGER NOT NULL,
+            user_id  INTEGER NOT NULL,
+            seconds  INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS job_runs (
+            job      TEXT    NOT NULL,
+            guild_id INTEGER NOT NULL,
+            last_run TEXT    NOT NULL,
+            PRIMARY KEY (job, guild_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS member_names (
+            guild_id     INTEGER NOT NULL,
+            user_id      INTEGER NOT NULL,
+            display_name TEXT    NOT NULL,
+            updated_at   TEXT    NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        )
+        """,
+    ):
+        conn.execute(cmd)
+
+    # 舊版 study_time.db 的 active_sessions 沒有累積秒數欄位
+    if "accumulated_seconds" not in _columns(conn, "active_sessions"):
+        conn.execute("ALTER TABLE active_sessions ADD COLUMN accumulated_seconds INTEGER NOT NULL DEFAULT 0")
+
+    # 彙總表第一次建立時，從既有的 time_log 回填（date(d, 'weekday 0', '-6 days') 為該週週一）
+    for cmd in (
+        """
+        INSERT INTO time_log_weekly(guild_id, user_id, week_start, seconds)
+        SELECT guild_id, user_id, date(study_date, 'weekday 0', '-6 days'), SUM(seconds)
+        FROM time_log
+        WHERE NOT EXISTS (SELECT 1 FROM time_log_weekly)
+        GROUP BY 1, 2, 3
+        """,
+        """
+        INSERT INTO time_log_monthly(guild_id, user_id, month, seconds)
+        SELECT guild_id, user_id, substr(study_date, 1, 7), SUM(seconds)
+        FROM time_log
+        WHERE NOT EXISTS (SELECT 1 FROM time_log_monthly)
+        GROUP BY 1, 2, 3
+        """,
+        """
+        INSERT INTO time_log_alltime(guild_id, user_id, seconds)
+        SELECT guild_id, user_id, SUM(seconds)
+        FROM time_log
+        WHERE NOT EXISTS (SELECT 1 FROM time_log_alltime)
+        GROUP BY 1, 2
+        """,
+    ):
+        conn.execute(cmd)
+
+def _migrate_2_session_intervals(conn):
+    """每段結束的計時原始區間（只新增不修改），time_log 與彙總表可由它重建"""
+    for cmd in (
+        """
+        CREATE TABLE IF NOT EXISTS session_intervals (
+            id           INTEGER PRIMARY KEY,
+            guild_id     INTEGER NOT NULL,
+            user_id      INTEGER NOT NULL,
+            session_type TEXT    NOT NULL,
+            start_time   TEXT    NOT NULL,
+            end_time     TEXT    NOT NULL,
+            recorded_at  TEXT    NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS session_intervals_guild_user_start ON session_intervals(guild_id, user_id, start_time)",
+        # 只允許新增；需要人工修正時先 DROP TRIGGER
+        """
+        CREATE TRIGGER IF NOT EXISTS session_intervals_no_update BEFORE UPDATE ON session_intervals
+        BEGIN SELECT RAISE(ABORT, 'session_intervals 只允許新增'); END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS session_intervals_no_delete BEFORE DELETE ON session_intervals
+        BEGIN SELECT RAISE(ABORT, 'session_intervals 只允許新增'); END
+        """,
+    ):
+        conn.execute(cmd)
+
+SCHEMA_MIGRATIONS = [
+    (1, "所有資料表（含舊版 study_time.db 升級）", _migrate_1_baseline),
+    (2, "計時原始區間紀錄", _migrate_2_session_intervals),
+]
+
+def schema_version() -> int:
+    res = db_exec("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return int(res[0][0]) if res else 0
+
+def _apply_migrations(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version    INTEGER PRIMARY KEY,
+            applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+    for version, description, migrate in SCHEMA_MIGRATIONS:
+        if version <= current:
+            continue
+        print(f"🛠️ 套用 schema migration {version}: {description}")
+        migrate(conn)
+        conn.execute("INSERT INTO schema_version(version) VALUES (?)", (version,))
+
+def ensure_db():
+    """初始化資料庫：在寫入執行緒上以單一交易套用尚未執行的 migration"""
+    _write(_apply_migrations)
+
+def ensure_time_log_partitions(months_ahead: int = 0, parent: str = "time_log"):
+    """SQLite 不分區，保留介面"""
+
+# ------- 查詢功能 -------
+
+def fetch_by_date(guild_id: int, sdate: str):
+    return db_exec(
+        "SELECT user_id, seconds FROM time_log WHERE guild_id = ? AND study_date = ? ORDER BY seconds DESC",
+        (guild_id, sdate),
+    )
+
+def fetch_sum_between(guild_id: int, start_date: str, end_date: str):
+    return db_exec(
+        """
+        SELECT user_id, SUM(seconds) as total
+        FROM time_log
+        WHERE guild_id = ? AND study_date BETWEEN ? AND ?
+        GROUP BY user_id
+        ORDER BY total DESC
+        """,
+        (guild_id, start_date, end_date),
+    )
+
+def fetch_by_date_many(guild_ids: list[int], sdate: str):
+    """一次取得多個伺服器某學習日的排行 (guild_id, user_id, seconds)，各伺服器內依秒數遞減"""
+    if not guild_ids:
+        return []
+    return db_exec(
+        """
+        SELECT guild_id, user_id, seconds FROM time_log
+        WHERE guild_id IN (SELECT value FROM json_each(?)) AND study_date = ?
+        ORDER BY guild_id, seconds DESC
+        """,
+        (_ids(guild_ids), sdate),
+    )
+
+def fetch_sum_between_many(guild_ids: list[int], start_date: str, end_date: str):
+    """一次取得多個伺服器區間合計 (guild_id, user_id, total)，各伺服器內依合計遞減"""
+    if not guild_ids:
+        return []
+    return db_exec(
+        """
+        SELECT guild_id, user_id, SUM(seconds) as total
+        FROM time_log
+        WHERE guild_id IN (SELECT value FROM json_each(?)) AND study_date BETWEEN ? AND ?
+        GROUP BY guild_id, user_id
+        ORDER BY guild_id, total DESC
+        """,
+        (_ids(guild_ids), start_date, end_date),
+    )
+
+def fetch_user_sum_on(guild_id: int, user_id: int, sdate: str) -> int:
+    res = db_exec(
+        "SELECT COALESCE(SUM(seconds), 0) FROM time_log WHERE guild_id = ? AND user_id = ? AND study_date = ?",
+        (guild_id, user_id, sdate),
+    )
+    return int(res[0][0]) if res else 0
+
+def fetch_user_sum_between(guild_id: int, user_id: int, start_date: str, end_date: str) -> int:
+    res = db_exec(
+        "SELECT COALESCE(SUM(seconds), 0) FROM time_log WHERE guild_id = ? AND user_id = ? AND study_date BETWEEN ? AND ?",
+        (guild_id, user_id, start_date, end_date),
+    )
+    return int(res[0][0]) if res else 0
+
+def fetch_user_daily(guild_id: int, user_id: int):
+    """某人每個學習日的時數 [(study_date, seconds)]，依日期排序（走主鍵索引）"""
+    return db_exec(
+        "SELECT study_date, seconds FROM time_log WHERE guild_id = ? AND user_id = ? ORDER BY study_date",
+        (guild_id, user_id),
+    )
+
+def fetch_user_intervals(guild_id: int, user_id: int, since_iso: str):
+    """某人 since_iso 之後開始的計時區間 [(start_time, end_time)]"""
+    res = db_exec(
+        "SELECT start_time, end_time FROM session_intervals "
+        "WHERE guild_id = ? AND user_id = ? AND start_time >= ? ORDER BY start_time",
+        (guild_id, user_id, since_iso),
+    )
+    return [(datetime.fromisoformat(start), datetime.fromisoformat(end)) for start, end in res]
+
+def fetch_week(guild_id: int, week_start: str):
+    """從週彙總表取得某週（週一為 week_start）的排行"""
+    return db_exec(
+        "SELECT user_id, seconds FROM time_log_weekly WHERE guild_id = ? AND week_start = ? ORDER BY seconds DESC",
+        (guild_id, week_start),
+    )
+
+def fetch_month(guild_id: int, month: str):
+    """從月彙總表取得某月（YYYY-MM）的排行"""
+    return db_exec(
+        "SELECT user_id, seconds FROM time_log_monthly WHERE guild_id = ? AND month = ? ORDER BY seconds DESC",
+        (guild_id, month),
+    )
+
+def fetch_alltime(guild_id: int):
+    """從總計彙總表取得歷史總排行"""
+    return db_exec(
+        "SELECT user_id, seconds FROM time_log_alltime WHERE guild_id = ? ORDER BY seconds DESC",
+        (guild_id,),
+    )
+
+# ------- Config & Monitor -------
+
+def get_config(guild_id: int, default_channel_id: int = 0):
+    res = db_exec("SELECT announce_channel_id FROM config WHERE guild_id = ?", (guild_id,))
+    return res[0][0] if res and res[0][0] else (default_channel_id or None)
+
+def get_configs(guild_ids: list[int]) -> dict[int, int]:
+    """一次取得多個伺服器的公告頻道 {guild_id: announce_channel_id}"""
+    if not guild_ids:
+        return {}
+    res = db_exec(
+        """
+        SELECT guild_id, announce_channel_id FROM config
+        WHERE guild_id IN (SELECT value FROM json_each(?)) AND announce_channel_id IS NOT NULL
+        """,
+        (_ids(guild_ids),),
+    )
+    return {gid: ch_id for gid, ch_id in res}
+
+def set_config(guild_id: int, channel_id: int):
+    db_exec(
+        """
+        INSERT INTO config(guild_id, announce_channel_id)
+        VALUES(?, ?)
+        ON CONFLICT(guild_id) DO UPDATE SET announce_channel_id=excluded.announce_channel_id
+        """,
+        (guild_id, channel_id),
+        commit=True
+    )
+
+def get_monitor_channels(guild_id: int) -> list[int]:
+    res = db_exec("SELECT channel_id FROM monitor_channels WHERE guild_id = ?", (guild_id,))
+    return [row[0] for row in res]
+
+def get_all_monitor_channels():
+    """取得所有伺服器的監聽頻道 (guild_id, channel_id)"""
+    return db_exec("SELECT guild_id, channel_id FROM monitor_channels")
+
+def add_monitor_channel(guild_id: int, channel_id: int):
+    db_exec(
+        "INSERT INTO monitor_channels(guild_id, channel_id) VALUES(?, ?) ON CONFLICT DO NOTHING",
+        (guild_id, channel_id),
+        commit=True
+    )
+
+def remove_monitor_channel(guild_id: int, channel_id: int):
+    db_exec("DELETE FROM monitor_channels WHERE guild_id = ? AND channel_id = ?", (guild_id, channel_id), commit=True)
+
+# ------- 核心邏輯 -------
+
+_UPSERT_TIME_SQL = (
+    """
+    INSERT INTO time_log(guild_id, user_id, study_date, seconds) VALUES(?, ?, ?, ?)
+    ON CONFLICT(guild_id, user_id, study_date) DO UPDATE SET seconds = seconds + excluded.seconds
+    """,
+    """
+    INSERT INTO time_log_weekly(guild_id, user_id, week_start, seconds) VALUES(?, ?, date(?, 'weekday 0', '-6 days'), ?)
+    ON CONFLICT(guild_id, week_start, user_id) DO UPDATE SET seconds = seconds + excluded.seconds
+    """,
+    """
+    INSERT INTO time_log_monthly(guild_id, user_id, month, seconds) VALUES(?, ?, substr(?, 1, 7), ?)
+    ON CONFLICT(guild_id, month, user_id) DO UPDATE SET seconds = seconds + excluded.seconds
+    """,
+)
+
+def _upsert_time_rows(conn, rows):
+    """把 (guild_id, user_id, study_date, seconds) 累加進 time_log 與週/月/總計彙總表
+
+    SQLite 在同一個程序內執行，逐列 upsert 沒有網路往返，不需先在 Python 端合併。
+    """
+    for sql in _UPSERT_TIME_SQL:
+        conn.executemany(sql, rows)
+    conn.executemany(
+        """
+        INSERT INTO time_log_alltime(guild_id, user_id, seconds) VALUES(?, ?, ?)
+        ON CONFLICT(guild_id, user_id) DO UPDATE SET seconds = seconds + excluded.seconds
+        """,
+        [(gid, uid, secs) for gid, uid, _, secs in rows],
+    )
+
+def add_seconds(guild_id: int, user_id: int, study_date: str, seconds: int):
+    _write(_upsert_time_rows, [(guild_id, user_id, study_date, seconds)])
+
+_SAVE_SESSION_SQL = """
+    INSERT INTO active_sessions(guild_id, user_id, session_type, start_time, accumulated_seconds)
+    VALUES(?, ?, ?, ?, ?)
+    ON CONFLICT(guild_id, user_id, session_type)
+    DO UPDATE SET start_time = excluded.start_time, accumulated_seconds = excluded.accumulated_seconds
+"""
+_DELETE_SESSION_SQL = "DELETE FROM active_sessions WHERE guild_id = ? AND user_id = ? AND session_type = ?"
+_PAUSE_SESSION_SQL = """
+    INSERT INTO paused_sessions(guild_id, user_id, session_type, pause_time, accumulated_seconds)
+    VALUES(?, ?, ?, ?, ?)
+    ON CONFLICT(guild_id, user_id, session_type)
+    DO UPDATE SET pause_time = excluded.pause_time, accumulated_seconds = excluded.accumulated_seconds
+"""
+_DELETE_PAUSED_SQL = "DELETE FROM paused_sessions WHERE guild_id = ? AND user_id = ? AND session_type = ?"
+
+def save_session(guild_id: int, user_id: int, session_type: str, start_time_iso: str, accumulated_secs: int = 0):
+    db_exec(_SAVE_SESSION_SQL, (guild_id, user_id, session_type, start_time_iso, accumulated_secs), commit=True)
+
+def get_session(guild_id: int, user_id: int, session_type: str):
+    res = db_exec("SELECT start_time FROM active_sessions WHERE guild_id = ? AND user_id = ? AND session_type = ?", (guild_id, user_id, session_type))
+    return res[0][0] if res else None
+
+def delete_session(guild_id: int, user_id: int, session_type: str):
+    db_exec(_DELETE_SESSION_SQL, (guild_id, user_id, session_type), commit=True)
+
+def pause_session(guild_id: int, user_id: int, session_type: str, pause_time_iso: str, accumulated_secs: int = 0):
+    db_exec(_PAUSE_SESSION_SQL, (guild_id, user_id, session_type, pause_time_iso, accumulated_secs), commit=True)
+
+def get_paused_session(guild_id: int, user_id: int, session_type: str):
+    res = db_exec("SELECT pause_time, accumulated_seconds FROM paused_sessions WHERE guild_id = ? AND user_id = ? AND session_type = ?", (guild_id, user_id, session_type))
+    return res[0] if res else None
+
+def delete_paused_session(guild_id: int, user_id: int, session_type: str):
+    db_exec(_DELETE_PAUSED_SQL, (guild_id, user_id, session_type), commit=True)
+
+def _shard_filter(shard_count, shard_ids):
+    """只取屬於這些分片的伺服器；未指定分片時不過濾"""
+    if not shard_count or shard_ids is None:
+        return "", ()
+    return " WHERE ((guild_id >> 22) % ?) IN (SELECT value FROM json_each(?))", (shard_count, _ids(shard_ids))
+
+def get_all_active_sessions(shard_count: int = 0, shard_ids=None):
+    """取得進行中的計時（用於機器人重啟時恢復狀態），可只取指定分片"""
+    where, params = _shard_filter(shard_count, shard_ids)
+    return db_exec(
+        "SELECT guild_id, user_id, session_type, start_time, accumulated_seconds FROM active_sessions" + where,
+        params,
+    )
+
+def get_all_paused_sessions(shard_count: int = 0, shard_ids=None):
+    """取得暫停中的計時 (guild_id, user_id, session_type, pause_time, accumulated_seconds)，可只取指定分片"""
+    where, params = _shard_filter(shard_count, shard_ids)
+    return db_exec(
+        "SELECT guild_id, user_id, session_type, pause_time, accumulated_seconds FROM paused_sessions" + where,
+        params,
+    )
+
+# ------- 排程紀錄 -------
+
+def get_job_runs(job: str) -> dict:
+    """取得排程工作在各伺服器最後完成的時間 {guild_id: datetime}"""
+    res = db_exec("SELECT guild_id, last_run FROM job_runs WHERE job = ?", (job,))
+    return {gid: datetime.fromisoformat(last_run) for gid, last_run in res}
+
+def set_job_runs(job: str, guild_ids, last_run):
+    """記錄排程工作在這些伺服器完成的時間"""
+    rows = [(job, gid, last_run.isoformat()) for gid in guild_ids]
+    if not rows:
+        return
+    _write(lambda conn: conn.executemany(
+        """
+        INSERT INTO job_runs(job, guild_id, last_run) VALUES(?, ?, ?)
+        ON CONFLICT(job, guild_id) DO UPDATE SET last_run = excluded.last_run
+        """,
+        rows,
+    ))
+
+# ------- 伺服器租約（單一程序，全部由自己負責） -------
+
+def acquire_guild_leases(guild_ids, owner: str, ttl_seconds: int) -> list[int]:
+    return list(guild_ids)
+
+def release_guild_leases(owner: str):
+    pass
+
+# ------- 成員顯示名稱 -------
+
+def get_member_names(guild_id: int, user_ids) -> dict:
+    """取得已記錄的顯示名稱 {user_id: (display_name, updated_at)}"""
+    if not user_ids:
+        return {}
+    res = db_exec(
+        """
+        SELECT user_id, display_name, updated_at FROM member_names
+        WHERE guild_id = ? AND user_id IN (SELECT value FROM json_each(?))
+        """,
+        (guild_id, _ids(user_ids)),
+    )
+    return {uid: (name, datetime.fromisoformat(updated_at)) for uid, name, updated_at in res}
+
+def save_member_names(rows):
+    """批次寫入顯示名稱 [(guild_id, user_id, display_name)]"""
+    if not rows:
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    _write(lambda conn: conn.executemany(
+        """
+        INSERT INTO member_names(guild_id, user_id, display_name, updated_at) VALUES(?, ?, ?, ?)
+        ON CONFLICT(guild_id, user_id) DO UPDATE SET display_name = excluded.display_name, updated_at = excluded.updated_at
+        """,
+        [(gid, uid, name, now) for gid, uid, name in rows],
+    ))
+
+# ------- 批次寫入（write-behind 緩衝用） -------
+
+_INSERT_INTERVAL_SQL = (
+    "INSERT INTO session_intervals(guild_id, user_id, session_type, start_time, end_time) VALUES(?, ?, ?, ?, ?)"
+)
+
+def _flush_writes(conn, time_rows, session_upserts, session_deletes, paused_upserts, paused_deletes, interval_rows):
+    conn.executemany(_INSERT_INTERVAL_SQL, interval_rows)
+    if time_rows:
+        _upsert_time_rows(conn, time_rows)
+    conn.executemany(_DELETE_SESSION_SQL, session_deletes)
+    conn.executemany(_SAVE_SESSION_SQL, session_upserts)
+    conn.executemany(_DELETE_PAUSED_SQL, paused_deletes)
+    conn.executemany(_PAUSE_SESSION_SQL, paused_upserts)
+
+def flush_writes(time_rows=(), session_upserts=(), session_deletes=(), paused_upserts=(), paused_deletes=(), interval_rows=()):
+    """在同一個交易內寫入緩衝中的變更（參數格式同 database.flush_writes）"""
+    _write(
+        _flush_writes,
+        list(time_rows), list(session_upserts), list(session_deletes), list(paused_upserts), list(paused_deletes),
+        list(interval_rows),
+    )
+
+# ------- 串流讀取（重建、匯出） -------
+
+def _stream(sql: str, params, chunk_size: int):
+    """同一個 SELECT 以 fetchmany 分批取出，整段讀取看到的是同一個 WAL 快照"""
+    cur = _reader().execute(sql, params)
+    try:
+        while True:
+            chunk = cur.fetchmany(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        cur.close()
+
+def _where(conditions) -> tuple[str, tuple]:
+    """[(SQL 條件, 參數)]，參數為 None 的條件略過"""
+    used = [(sql, value) for sql, value in conditions if value is not None]
+    if not used:
+        return "", ()
+    return " WHERE " + " AND ".join(sql for sql, _ in used), tuple(value for _, value in used)
+
+def iter_session_intervals(guild_id=None, chunk_size: int = 10000, since=None, until=None):
+    """依寫入順序分批讀出計時區間（參數與回傳格式同 database.iter_session_intervals）"""
+    where, params = _where((("guild_id = ?", guild_id), ("start_time >= ?", since), ("start_time < ?", until)))
+    for chunk in _stream(
+        f"SELECT guild_id, user_id, session_type, start_time, end_time FROM session_intervals{where} ORDER BY id",
+        params,
+        chunk_size,
+    ):
+        yield [
+            (g, u, t, datetime.fromisoformat(start), datetime.fromisoformat(end))
+            for g, u, t, start, end in chunk
+        ]
+
+def iter_time_log(guild_id: int, start_date=None, end_date=None, chunk_size: int = 10000):
+    """依學習日分批讀出某伺服器的 time_log（參數與回傳格式同 database.iter_time_log）"""
+    where, params = _where((("guild_id = ?", guild_id), ("study_date >= ?", start_date), ("study_date <= ?", end_date)))
+    return _stream(
+        f"SELECT guild_id, user_id, study_date, seconds FROM time_log{where} ORDER BY study_date, user_id",
+        params,
+        chunk_size,
+    )
+
+# ------- 計時區間重建 -------
+
+def _replace_time_log(conn, rows, since, guild_id):
+    scope = "" if guild_id is None else " AND guild_id = ?"
+    where = "" if guild_id is None else " WHERE guild_id = ?"
+    params = () if guild_id is None else (guild_id,)
+    conn.execute(f"DELETE FROM time_log WHERE study_date >= ?{scope}", (since, *params))
+    conn.executemany("INSERT INTO time_log(guild_id, user_id, study_date, seconds) VALUES(?, ?, ?, ?)", rows)
+    for table in ("time_log_weekly", "time_log_monthly", "time_log_alltime"):
+        conn.execute(f"DELETE FROM {table}{where}", params)
+    conn.execute(
+        f"""
+        INSERT INTO time_log_weekly(guild_id, user_id, week_start, seconds)
+        SELECT guild_id, user_id, date(study_date, 'weekday 0', '-6 days'), SUM(seconds)
+        FROM time_log{where}
+        GROUP BY 1, 2, 3
+        """,
+        params,
+    )
+    conn.execute(
+        f"""
+        INSERT INTO time_log_monthly(guild_id, user_id, month, seconds)
+        SELECT guild_id, user_id, substr(study_date, 1, 7), SUM(seconds)
+        FROM time_log{where}
+        GROUP BY 1, 2, 3
+        """,
+        params,
+    )
+    conn.execute(
+        f"""
+        INSERT INTO time_log_alltime(guild_id, user_id, seconds)
+        SELECT guild_id, user_id, SUM(seconds)
+        FROM time_log{where}
+        GROUP BY 1, 2
+        """,
+        params,
+    )
+
+def replace_time_log(rows, since: str, guild_id=None):
+    """以重建結果取代 study_date >= since 的 time_log，再由 time_log 重算彙總表（參數格式同 database.replace_time_log）"""
+    _write(_replace_time_log, list(rows), since, guild_id)
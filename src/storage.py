@@ -0,0 +1,59 @@
+"""
+儲存後端選擇：DB_BACKEND=postgres 使用 database.py（PostgreSQL 連線池），
+DB_BACKEND=sqlite 使用 sqlite_backend.py（本機檔案、WAL、單一寫入執行緒）。
+未設定 DB_BACKEND 時需要 DATABASE_URL（使用 PostgreSQL）；SQLite 必須明確指定，
+避免漏設 DATABASE_URL 時默默改用空的本機資料庫。
+
+兩個後端都是模組，提供相同名稱與語意的同步函式（見 BACKEND_FUNCTIONS），
+async_db 與 write_buffer 透過這裡的 backend 呼叫，不直接依賴其中一種資料庫。
+"""
+import os
+
+from dotenv import load_dotenv
+
+# 後端與其設定在匯入時決定；CLI（python -m src.rebuild 等）直接匯入這裡，因此在此也載入 .env（不覆寫已設定的變數）
+load_dotenv()
+
+DB_BACKEND = (os.environ.get('DB_BACKEND') or ('postgres' if os.environ.get('DATABASE_URL') else '')).lower()
+
+# 後端必須提供的函式（介面）
+BACKEND_FUNCTIONS = (
+    # 生命週期
+    "ensure_db", "schema_version", "ensure_time_log_partitions", "pool_stats", "close_pool", "db_exec",
+    # 查詢
+    "fetch_by_date", "fetch_sum_between", "fetch_by_date_many", "fetch_sum_between_many",
+    "fetch_user_sum_on", "fetch_user_sum_between", "fetch_week", "fetch_month", "fetch_alltime",
+    "fetch_user_daily", "fetch_user_intervals",
+    # 設定與監聽頻道
+    "get_config", "get_configs", "set_config",
+    "get_monitor_channels", "get_all_monitor_channels", "add_monitor_channel", "remove_monitor_channel",
+    # 時數與計時
+    "add_seconds", "save_session", "get_session", "delete_session",
+    "pause_session", "get_paused_session", "delete_paused_session",
+    "get_all_active_sessions", "get_all_paused_sessions", "flush_writes",
+    # 計時區間紀錄、重建與匯出
+    "iter_session_intervals", "iter_time_log", "replace_time_log",
+    # 排程、租約、成員名稱
+    "get_job_runs", "set_job_runs", "acquire_guild_leases", "release_guild_leases",
+    "get_member_names", "save_member_names",
+)
+
+if not DB_BACKEND:
+    raise RuntimeError("請設定 DATABASE_URL（PostgreSQL），或以 DB_BACKEND=sqlite 明確使用本機 SQLite")
+if DB_BACKEND == 'postgres':
+    from . import database as backend
+elif DB_BACKEND == 'sqlite':
+    from . import sqlite_backend as backend
+else:
+    raise RuntimeError(f"不支援的 DB_BACKEND: {DB_BACKEND}（可用 postgres、sqlite）")
+
+_missing = [name for name in BACKEND_FUNCTIONS if not hasattr(backend, name)]
+if _missing:
+    raise RuntimeError(f"儲存後端 {DB_BACKEND} 缺少函式: {', '.join(_missing)}")
+
+
+def describe() -> str:
+    """啟動時顯示的後端說明"""
+    if DB_BACKEND == 'sqlite':
+        return f"SQLite（{os.path.abspath(backend.SQLITE_PATH)}）"
+    return "PostgreSQL（DATABASE_URL）"
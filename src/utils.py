@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 import discord
 
@@ -11,6 +11,11 @@ def get_taipei_tz():
 
 TW_TZ = get_taipei_tz()
 
+# ========= 分片 =========
+def shard_id_for(guild_id: int, shard_count: int) -> int:
+    """Discord 的分片規則：(guild_id >> 22) % shard_count"""
+    return (guild_id >> 22) % max(shard_count, 1)
+
 # ========= 通用工具 =========
 def _hms(seconds: int):
     h = seconds // 3600
@@ -27,6 +32,51 @@ def study_date_of(ts: datetime) -> str:
     shifted = local - timedelta(hours=6)
     return shifted.date().isoformat()
 
+# ========= 學習日切分 =========
+STUDY_DAY_START_HOUR = 6
+_DAY_SECS = 86400
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def _study_day_shift(ts: datetime) -> float:
+    """把 UTC 時間戳平移成「學習日從 00:00 開始」的秒數偏移（台灣無 DST，整段區間共用一個偏移）"""
+    return ts.astimezone(TW_TZ).utcoffset().total_seconds() - STUDY_DAY_START_HOUR * 3600
+
+def split_by_study_day(start: datetime, end: datetime) -> list[tuple[str, int]]:
+    """把 [start, end) 依每日 06:00 切成 [(學習日, 秒數)]，直接以時間戳算出每段，不逐日換時區"""
+    if end <= start:
+        return []
+    shift = _study_day_shift(start)
+    s = start.timestamp() + shift
+    e = end.timestamp() + shift
+    first = int(s // _DAY_SECS)
+    last = int(-(-e // _DAY_SECS)) - 1  # 最後一個有時間落入的學習日
+    segments = []
+    for day in range(first, last + 1):
+        secs = int(min(e, (day + 1) * _DAY_SECS) - max(s, day * _DAY_SECS))
+        if secs > 0:
+            segments.append((date.fromordinal(_EPOCH_ORDINAL + day).isoformat(), secs))
+    return segments
+
+# session_intervals.session_type：/debug_add_time 手動加的時數，重建時整段計入起點的學習日
+MANUAL_SESSION_TYPE = "manual"
+
+def study_day_start(study_date: str) -> datetime:
+    """學習日 study_date 的起點（當地 06:00），回傳 UTC 時間"""
+    d = date.fromisoformat(study_date)
+    return datetime(d.year, d.month, d.day, STUDY_DAY_START_HOUR, tzinfo=TW_TZ).astimezone(timezone.utc)
+
+def split_intervals(intervals) -> list[tuple[int, int, str, int]]:
+    """把多段 (guild_id, user_id, start, end) 一次切分並依 (guild_id, user_id, 學習日) 合併
+
+    回傳可直接批次寫入的 [(guild_id, user_id, study_date, seconds)]
+    """
+    totals: dict[tuple[int, int, str], int] = {}
+    for guild_id, user_id, start, end in intervals:
+        for sdate, secs in split_by_study_day(start, end):
+            key = (guild_id, user_id, sdate)
+            totals[key] = totals.get(key, 0) + secs
+    return [(g, u, d, secs) for (g, u, d), secs in totals.items()]
+
 def yesterday_study_date_str() -> str:
     today_local = datetime.now(TW_TZ).date()
     return (today_local - timedelta(days=1)).isoformat()
@@ -53,10 +103,16 @@ def make_rank_map(rows):
         rank_map[uid] = rank
     return rank_map
 
-def format_table(guild: discord.Guild, rows, title="排行榜"):
+def display_name(guild: discord.Guild, uid: int, names=None) -> str:
+    """顯示名稱：先用已解析的 names，再用 gateway 快取，都沒有時顯示 User ID"""
+    if names and uid in names:
+        return names[uid]
+    member = guild.get_member(uid)
+    return member.display_name if member else f"User {uid}"
+
+def format_table(guild: discord.Guild, rows, title="排行榜", names=None):
     lines = [f"**{title}**"]
     for i, (uid, secs) in enumerate(rows, start=1):
-        member = guild.get_member(uid)
-        name = member.display_name if member else f"User {uid}"
+        name = display_name(guild, uid, names)
         lines.append(f"{i}. **{name}** — {format_hms(secs)}")
     return "\n".join(lines)
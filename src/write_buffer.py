@@ -0,0 +1,157 @@
+"""
+Write-behind 緩衝：把 add_seconds 與 session 的寫入先合併在記憶體，
+定時（或累積到一定數量時）以多列 upsert 在單一交易內寫回資料庫。
+
+- add_seconds 依 (guild_id, user_id, study_date) 累加
+- active / paused session 依 (guild_id, user_id, session_type) 只保留最後一次操作
+- 結束的計時區間只新增，flush 時以 COPY（PostgreSQL）整批寫入 session_intervals
+"""
+import asyncio
+import os
+from typing import Optional
+
+from .storage import backend as db
+
+WRITE_FLUSH_INTERVAL = float(os.environ.get('WRITE_FLUSH_INTERVAL', '2'))
+WRITE_FLUSH_MAX_PENDING = int(os.environ.get('WRITE_FLUSH_MAX_PENDING', '500'))
+
+_DELETED = None  # session 字典中代表「刪除」的值
+
+
+class WriteBuffer:
+    def __init__(self, run, flush_interval: float = WRITE_FLUSH_INTERVAL, max_pending: int = WRITE_FLUSH_MAX_PENDING):
+        self._run = run  # 在資料庫執行緒池執行同步函式的 coroutine（async_db.run）
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._seconds: dict[tuple[int, int, str], int] = {}
+        self._sessions: dict[tuple[int, int, str], Optional[tuple[str, int]]] = {}
+        self._paused: dict[tuple[int, int, str], Optional[tuple[str, int]]] = {}
+        self._intervals: list[tuple[int, int, str, str, str]] = []
+        # asyncio 原語延後到 event loop 內才建立
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flushed_rows = 0
+
+    # ------- 緩衝寫入 -------
+    def _touched(self):
+        if self._wakeup is not None and self.pending_count() >= self.max_pending:
+            self._wakeup.set()
+
+    def add_seconds(self, guild_id: int, user_id: int, study_date: str, seconds: int):
+        key = (guild_id, user_id, study_date)
+        self._seconds[key] = self._seconds.get(key, 0) + seconds
+        self._touched()
+
+    def log_interval(self, guild_id: int, user_id: int, session_type: str, start_iso: str, end_iso: str):
+        self._intervals.append((guild_id, user_id, session_type, start_iso, end_iso))
+        self._touched()
+
+    def save_session(self, guild_id: int, user_id: int, session_type: str, start_time_iso: str, accumulated_secs: int = 0):
+        self._sessions[(guild_id, user_id, session_type)] = (start_time_iso, accumulated_secs)
+        self._touched()
+
+    def delete_session(self, guild_id: int, user_id: int, session_type: str):
+        self._sessions[(guild_id, user_id, session_type)] = _DELETED
+        self._touched()
+
+    def pause_session(self, guild_id: int, user_id: int, session_type: str, pause_time_iso: str, accumulated_secs: int = 0):
+        self._paused[(guild_id, user_id, session_type)] = (pause_time_iso, accumulated_secs)
+        self._touched()
+
+    def delete_paused_session(self, guild_id: int, user_id: int, session_type: str):
+        self._paused[(guild_id, user_id, session_type)] = _DELETED
+        self._touched()
+
+    # ------- 讀取尚未寫回的狀態 -------
+    def pending_count(self) -> int:
+        return len(self._seconds) + len(self._sessions) + len(self._paused) + len(self._intervals)
+
+    def pending_session(self, guild_id: int, user_id: int, session_type: str):
+        """回傳 (是否在緩衝中, start_time_iso 或 None)"""
+        key = (guild_id, user_id, session_type)
+        if key in self._sessions:
+            value = self._sessions[key]
+            return True, (value[0] if value is not _DELETED else None)
+        return False, None
+
+    def pending_paused(self, guild_id: int, user_id: int, session_type: str):
+        """回傳 (是否在緩衝中, (pause_time_iso, accumulated_seconds) 或 None)"""
+        key = (guild_id, user_id, session_type)
+        if key in self._paused:
+            return True, self._paused[key]
+        return False, None
+
+    # ------- 寫回 -------
+    async def flush(self):
+        """把目前緩衝的變更一次寫回資料庫"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self.pending_count():
+                return
+            seconds, self._seconds = self._seconds, {}
+            sessions, self._sessions = self._sessions, {}
+            paused, self._paused = self._paused, {}
+            intervals, self._intervals = self._intervals, []
+
+            time_rows = [(g, u, d, s) for (g, u, d), s in seconds.items() if s]
+            session_upserts = [(g, u, t, v[0], v[1]) for (g, u, t), v in sessions.items() if v is not _DELETED]
+            session_deletes = [k for k, v in sessions.items() if v is _DELETED]
+            paused_upserts = [(g, u, t, v[0], v[1]) for (g, u, t), v in paused.items() if v is not _DELETED]
+            paused_deletes = [k for k, v in paused.items() if v is _DELETED]
+
+            try:
+                await self._run(
+                    db.flush_writes, time_rows, session_upserts, session_deletes, paused_upserts, paused_deletes, intervals
+                )
+            except Exception:
+                # 寫回失敗：放回緩衝，期間的新操作優先
+                for key, secs in seconds.items():
+                    self._seconds[key] = self._seconds.get(key, 0) + secs
+                for key, value in sessions.items():
+                    self._sessions.setdefault(key, value)
+                for key, value in paused.items():
+                    self._paused.setdefault(key, value)
+                self._intervals[:0] = intervals
+                raise
+
+            self.flushes += 1
+            self.flushed_rows += len(time_rows) + len(sessions) + len(paused) + len(intervals)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[WARN] write-behind flush failed: {e}")
+
+    def start(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop(self):
+        """停止背景寫回並強制寫回剩餘的變更"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending_count(),
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+        }
@@ -0,0 +1,27 @@
+"""
+測試共用設定：一律使用 SQLite 後端（不需要資料庫伺服器），每個測試各用一個暫存資料庫檔
+
+用法（在專案根目錄）：
+    pip install pytest
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+# storage 在匯入時決定後端，必須在匯入 src 之前設定（.env 不會覆寫已設定的變數）
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["MULTI_PROCESS"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    """已套用 migration 的空白 SQLite 後端"""
+    from src import sqlite_backend
+
+    monkeypatch.setattr(sqlite_backend, "SQLITE_PATH", str(tmp_path / "study_time.db"))
+    sqlite_backend.ensure_db()
+    yield sqlite_backend
+    sqlite_backend.close_pool()
@@ -0,0 +1,74 @@
+from src.cache import LeaderboardCache
+
+
+def _fill(cache: LeaderboardCache, guild_id: int, ranges):
+    keys = []
+    for start, end in ranges:
+        key = cache.make_key("sum", guild_id, start, end)
+        cache.put(key, [(1, 60)], cache.generation(guild_id))
+        keys.append(key)
+    return keys
+
+
+def test_invalidate_only_ranges_containing_date():
+    cache = LeaderboardCache()
+    day, week, last_week = _fill(cache, 1, [
+        ("2026-03-04", "2026-03-04"),
+        ("2026-03-02", "2026-03-08"),
+        ("2026-02-23", "2026-03-01"),
+    ])
+    (other,) = _fill(cache, 2, [("2026-03-02", "2026-03-08")])
+
+    cache.invalidate(1, "2026-03-04")
+    assert cache.get(day) == (False, None)
+    assert cache.get(week) == (False, None)
+    assert cache.get(last_week)[0]
+    assert cache.get(other)[0]
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_invalidate_range_edges_are_inclusive():
+    cache = LeaderboardCache()
+    (week,) = _fill(cache, 1, [("2026-03-02", "2026-03-08")])
+    cache.invalidate(1, "2026-03-09")
+    assert cache.get(week)[0]
+    cache.invalidate(1, "2026-03-08")
+    assert not cache.get(week)[0]
+
+
+def test_invalidate_whole_guild():
+    cache = LeaderboardCache()
+    keys = _fill(cache, 1, [("2026-03-04", "2026-03-04"), ("2026-02-01", "2026-02-28")])
+    cache.invalidate(1)
+    assert not any(cache.get(key)[0] for key in keys)
+
+
+def test_stale_generation_is_not_cached():
+    # 查詢途中有寫入（generation 改變）時，舊結果不能放進快取
+    cache = LeaderboardCache()
+    key = cache.make_key("sum", 1, "2026-03-02", "2026-03-08")
+    generation = cache.generation(1)
+    cache.invalidate(1, "2026-03-04")
+    cache.put(key, [(1, 60)], generation)
+    assert not cache.get(key)[0]
+
+
+def test_entries_expire_after_ttl():
+    now = [0.0]
+    cache = LeaderboardCache(ttl=60, clock=lambda: now[0])
+    (key,) = _fill(cache, 1, [("2026-03-04", "2026-03-04")])
+    now[0] = 59
+    assert cache.get(key)[0]
+    now[0] = 60
+    assert not cache.get(key)[0]
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction_and_disabled_cache():
+    cache = LeaderboardCache(maxsize=2)
+    a, b, c = _fill(cache, 1, [("2026-03-01", "2026-03-01"), ("2026-03-02", "2026-03-02"), ("2026-03-03", "2026-03-03")])
+    assert not cache.get(a)[0] and cache.get(b)[0] and cache.get(c)[0]
+
+    disabled = LeaderboardCache(maxsize=0)
+    (key,) = _fill(disabled, 1, [("2026-03-01", "2026-03-01")])
+    assert not disabled.get(key)[0]
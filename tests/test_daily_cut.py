@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from src import async_db as adb
+from src.cogs.study import DAILY_AT, Study
+from src.session_store import SessionStore, TEXT, VOICE
+
+
+def _cog() -> Study:
+    """不連線 Discord、只帶 06:00 切分需要的狀態的 Study"""
+    cog = Study.__new__(Study)
+    cog.sessions = SessionStore()
+    cog.owned_guilds = None
+    return cog
+
+
+def test_cut_writes_utc_and_since_filtered_reads_see_it(backend):
+    boundary = DAILY_AT.previous(datetime.now(timezone.utc))   # 台北時間的 06:00
+    boundary_utc = boundary.astimezone(timezone.utc)
+    start = boundary_utc - timedelta(hours=2)
+    cog = _cog()
+    cog.sessions.start(1, 10, VOICE, start)
+    cog.sessions.start(1, 11, TEXT, start, accumulated=60)
+
+    async def main():
+        await cog._perform_daily_cut(boundary)
+        # 重啟後對帳時，以資料表中的開始時間結算下一段（與 _reconcile_sessions 相同）
+        (row,) = [r for r in backend.get_all_active_sessions() if r[1] == 10]
+        await adb.add_intervals([(1, 10, "voice", datetime.fromisoformat(row[3]), boundary_utc + timedelta(minutes=30))])
+        await adb.flush()
+
+    asyncio.run(main())
+
+    sessions = {(uid, kind): (start_iso, acc) for _, uid, kind, start_iso, acc in backend.get_all_active_sessions()}
+    assert sessions == {
+        (10, "voice"): (boundary_utc.isoformat(), 0),
+        (11, "text"): (boundary_utc.isoformat(), 60 + 7200),
+    }
+    raw = backend.db_exec("SELECT start_time, end_time FROM session_intervals ORDER BY id")
+    assert all(value.endswith("+00:00") for row in raw for value in row)
+
+    # 切分後的那段落在 [06:00, 07:00) 內，切出的那段不在
+    since, until = boundary_utc.isoformat(), (boundary_utc + timedelta(hours=1)).isoformat()
+    rows = [row for chunk in backend.iter_session_intervals(1, 100, since, until) for row in chunk]
+    assert [(u, s, e) for _, u, _, s, e in rows] == [(10, boundary_utc, boundary_utc + timedelta(minutes=30))]
+    assert backend.fetch_user_intervals(1, 10, (start - timedelta(seconds=1)).isoformat()) == [
+        (start, boundary_utc),
+        (boundary_utc, boundary_utc + timedelta(minutes=30)),
+    ]
@@ -0,0 +1,67 @@
+import random
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from src import history
+
+TODAY = "2026-03-20"
+
+
+def _sample(seed: int):
+    rng = random.Random(seed)
+    today = date.fromisoformat(TODAY)
+    daily = []
+    d = today - timedelta(days=rng.randint(20, 200))
+    while d <= today:
+        if rng.random() < 0.7:
+            daily.append((d.isoformat(), rng.randint(60, 6 * 3600)))
+        d += timedelta(days=1)
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    intervals = []
+    for _ in range(rng.randint(0, 60)):
+        start = base + timedelta(seconds=rng.randint(0, 70 * 86400))
+        intervals.append((start, start + timedelta(seconds=rng.randint(1, 30 * 3600))))
+    return daily, intervals
+
+
+def _both(monkeypatch, daily, intervals, today=TODAY):
+    vectorized = history.analyze(daily, intervals, today)
+    monkeypatch.setattr(history, "np", None)
+    pure = history.analyze(daily, intervals, today)
+    return vectorized, pure
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_numpy_and_pure_python_agree(monkeypatch, seed):
+    pytest.importorskip("numpy")
+    daily, intervals = _sample(seed)
+    if not daily:
+        daily = [(TODAY, 60)]
+    vectorized, pure = _both(monkeypatch, daily, intervals)
+    assert vectorized == pure
+
+
+def test_streak_edges_agree(monkeypatch):
+    pytest.importorskip("numpy")
+    # 今天還沒讀：目前連續從昨天往回算
+    daily = [("2026-03-10", 100), ("2026-03-17", 100), ("2026-03-18", 100), ("2026-03-19", 100)]
+    vectorized, pure = _both(monkeypatch, daily, [])
+    assert vectorized == pure
+    assert (pure["current_streak"], pure["longest_streak"]) == (3, 3)
+    assert pure["hours"] == [0] * 24
+
+
+def test_pure_python_values(monkeypatch):
+    monkeypatch.setattr(history, "np", None)
+    # 台北 22:30 ~ 隔天 01:30：22 點與 1 點各半小時，23、0 點各一小時
+    start = datetime(2026, 3, 18, 14, 30, tzinfo=timezone.utc)
+    stats = history.analyze(
+        [("2026-03-18", 3600), ("2026-03-20", 7200)], [(start, start + timedelta(hours=3))], TODAY
+    )
+    assert stats["total"] == 10800 and stats["active_days"] == 2
+    assert (stats["best_date"], stats["best_seconds"]) == ("2026-03-20", 7200)
+    assert (stats["current_streak"], stats["longest_streak"]) == (1, 1)
+    assert stats["hours"][23] == stats["hours"][0] == 3600
+    assert stats["hours"][22] == stats["hours"][1] == 1800 and sum(stats["hours"]) == 10800
+    assert stats["weekday"][2] == 3600 and stats["weekday"][4] == 7200   # 週三、週五
@@ -0,0 +1,40 @@
+from src import keywords
+from src.keywords import PAUSE, REST, RESUME, STUDY, KeywordDispatcher
+
+
+def test_normalize_width_case_and_whitespace():
+    assert keywords.normalize("  ＳＴＡＲＴ ") == "start"
+    assert keywords.normalize("Stop\n") == "stop"
+    assert keywords.normalize("讀") == "讀"
+
+
+def test_defaults_when_config_has_no_keywords():
+    dispatcher = KeywordDispatcher({})
+    assert dispatcher.classify("讀") == STUDY
+    assert dispatcher.classify("拉") == PAUSE
+    assert dispatcher.classify("拉完") == RESUME
+    assert dispatcher.classify("休") == REST
+    assert dispatcher.classify("ＥＮＤ") == REST
+    assert dispatcher.classify("讀書吧") is None   # 必須完全相符，不做子字串比對
+
+
+def test_duplicate_keyword_follows_priority():
+    # 同一個詞同時出現在多組時，依 ACTIONS 順序（讀 > 拉 > 拉完 > 休）
+    config = {
+        "study_keywords": ["go"],
+        "pause_keywords": ["Go", "wait"],
+        "resume_keywords": ["wait"],
+        "rest_keywords": ["ＧＯ"],
+    }
+    dispatcher = KeywordDispatcher(config)
+    assert dispatcher.classify("GO") == STUDY
+    assert dispatcher.classify("wait") == PAUSE
+    assert dispatcher.classify("讀") is None   # 有設定的那組不再使用預設值
+
+
+def test_reload_replaces_table():
+    dispatcher = KeywordDispatcher({})
+    dispatcher.reload({"study_keywords": ["衝"]})
+    assert dispatcher.classify("衝") == STUDY
+    assert dispatcher.classify("讀") is None
+    assert dispatcher.classify("休") == REST
@@ -0,0 +1,45 @@
+import asyncio
+
+import discord
+
+from src.member_names import MemberNameCache
+
+
+class Member:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.display_name = f"user{user_id}"
+
+
+class Guild:
+    """query_members 丟出 query_error 的伺服器替身，記錄 REST 查詢的 user_id"""
+
+    def __init__(self, query_error):
+        self.id = 1
+        self.query_error = query_error
+        self.fetched = []
+
+    async def query_members(self, user_ids, limit, cache):
+        raise self.query_error
+
+    async def fetch_member(self, user_id):
+        self.fetched.append(user_id)
+        if user_id == 404:
+            raise discord.NotFound(type("Response", (), {"status": 404, "reason": "Not Found"})(), "missing")
+        return Member(user_id)
+
+
+def test_gateway_timeout_falls_back_to_rest_for_that_chunk():
+    names = MemberNameCache()
+    guild = Guild(asyncio.TimeoutError())
+    found = asyncio.run(names._query_chunk(guild, [1, 2, 404]))
+    assert found == {1: "user1", 2: "user2"}
+    assert sorted(guild.fetched) == [1, 2, 404]
+    assert names._gateway_query   # 逾時不代表不能用 gateway，下次仍先試
+
+
+def test_missing_intent_switches_to_rest():
+    names = MemberNameCache()
+    guild = Guild(discord.ClientException("intents"))
+    assert asyncio.run(names._query_chunk(guild, [3])) == {3: "user3"}
+    assert not names._gateway_query
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from src.reply_queue import ReplyQueue, TokenBucket
+
+
+class Channel:
+    def __init__(self, log, channel_id=1):
+        self.id = channel_id
+        self.log = log
+
+    async def send(self, content, allowed_mentions=None):
+        self.log.append(("send", content, allowed_mentions, time.monotonic()))
+
+
+class Author:
+    def __init__(self, user_id):
+        self.mention = f"<@{user_id}>"
+
+
+class Message:
+    """記錄 reply / add_reaction 呼叫與時間的訊息替身"""
+
+    def __init__(self, channel, user_id):
+        self.channel = channel
+        self.author = Author(user_id)
+
+    async def reply(self, content, mention_author=True):
+        self.channel.log.append(("reply", content, self.author.mention, time.monotonic()))
+
+    async def add_reaction(self, emoji):
+        self.channel.log.append(("reaction", emoji, self.author.mention, time.monotonic()))
+
+
+def _run(queue: ReplyQueue, sends, wait=0.0):
+    """排入 sends 的 (message, text, reaction)，等佇列送完後回傳"""
+
+    async def main():
+        for message, text, reaction in sends:
+            queue.send(message, text, reaction)
+        if wait:
+            await asyncio.sleep(wait)
+        await queue.close(timeout=10)
+
+    asyncio.run(main())
+
+
+def test_burst_is_coalesced_into_one_summary():
+    log = []
+    channel = Channel(log)
+    queue = ReplyQueue(mode="reply", rate=5, period=1, coalesce_window=0.01)
+    _run(queue, [(Message(channel, uid), f"開始讀書 {uid}", "📚") for uid in range(5)])
+
+    assert [kind for kind, *_ in log] == ["send"]
+    _, content, allowed_mentions, _ = log[0]
+    assert content.splitlines() == [f"<@{uid}> 開始讀書 {uid}" for uid in range(5)]
+    assert allowed_mentions.users is False and allowed_mentions.everyone is False
+    stats = queue.stats()
+    assert (stats["queued"], stats["sent"], stats["coalesced"], stats["reactions"]) == (5, 1, 5, 0)
+
+
+def test_single_reply_keeps_reaction_and_reply():
+    log = []
+    channel = Channel(log)
+    queue = ReplyQueue(mode="reply", rate=5, period=1, coalesce_window=0.01)
+    _run(queue, [(Message(channel, 7), "開始讀書", "📚")])
+    assert [(kind, body) for kind, body, *_ in log] == [("reaction", "📚"), ("reply", "開始讀書")]
+
+
+def test_reaction_mode_drops_text_but_keeps_plain_replies():
+    log = []
+    channel = Channel(log)
+    queue = ReplyQueue(mode="reaction", rate=10, period=1, coalesce_window=0.01)
+    _run(queue, [(Message(channel, 1), "開始讀書", "📚"), (Message(channel, 2), "你還沒開始讀書喔", None)])
+    assert [(kind, body) for kind, body, *_ in log] == [("reaction", "📚"), ("reply", "你還沒開始讀書喔")]
+
+
+def test_reactions_in_a_burst_are_rate_limited():
+    # 每 0.1 秒補一個 token、最多 2 個：6 個反應至少要 (6 - 2) × 0.1 秒
+    log = []
+    channel = Channel(log)
+    queue = ReplyQueue(mode="reaction", rate=2, period=0.2, coalesce_window=0.01)
+    t0 = time.monotonic()
+    _run(queue, [(Message(channel, uid), "開始讀書", "📚") for uid in range(6)])
+
+    times = [t for kind, *_, t in log if kind == "reaction"]
+    assert len(times) == 6
+    assert times[-1] - t0 >= 0.4 - 0.02
+    gaps = [b - a for a, b in zip(times[1:], times[2:])]
+    assert min(gaps) >= 0.1 - 0.02
+
+
+def test_summary_chunks_each_take_a_token():
+    log = []
+    channel = Channel(log)
+    queue = ReplyQueue(mode="reply", rate=1, period=0.2, coalesce_window=0.01)
+    t0 = time.monotonic()
+    _run(queue, [(Message(channel, uid), "x" * 1500, None) for uid in range(3)])
+
+    sends = [t for kind, *_, t in log if kind == "send"]
+    assert len(sends) == 3   # 每則 1500 字，超過 2000 字上限，各自一則
+    assert sends[-1] - t0 >= 0.4 - 0.02
+
+
+def test_token_bucket_waits_for_refill():
+    async def main():
+        bucket = TokenBucket(2, 0.2)
+        t0 = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.monotonic() - t0
+
+    assert asyncio.run(main()) >= 0.2 - 0.02
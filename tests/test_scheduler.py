@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from src import scheduler
+from src.scheduler import DailyAt, Every, Scheduler
+
+TW = timezone(timedelta(hours=8))
+DAILY = DailyAt(6, 0, TW)
+
+
+def test_daily_at_previous_and_next():
+    now = datetime(2026, 3, 2, 5, 59, tzinfo=TW)
+    assert DAILY.previous(now) == datetime(2026, 3, 1, 6, 0, tzinfo=TW)
+    assert DAILY.next(now) == datetime(2026, 3, 2, 6, 0, tzinfo=TW)
+    at = datetime(2026, 3, 2, 6, 0, tzinfo=TW)
+    assert DAILY.previous(at) == at and DAILY.next(at) == at + timedelta(days=1)
+
+
+def _run_catch_up(trigger, last_run_source, expected_calls: int):
+    """只跑啟動時的補跑，收到 expected_calls 次呼叫後停止排程器，回傳 [(deadline, catch_up)]"""
+    calls = []
+
+    async def main():
+        done = asyncio.Event()
+
+        async def job(deadline, catch_up):
+            calls.append((deadline, catch_up))
+            await last_run_source.record(deadline)
+            if len(calls) == expected_calls:
+                done.set()
+
+        sched = Scheduler()
+        sched.add("daily", trigger, job, catch_up=True, last_run=last_run_source.last_run)
+        await asyncio.wait_for(done.wait(), timeout=5)
+        await sched.stop()
+        return sched.job_stats["daily"]
+
+    stats = asyncio.run(main())
+    return calls, stats
+
+
+class JobRuns:
+    """以 SQLite 後端的 job_runs 保存最後完成時間"""
+
+    def __init__(self, backend, guild_id=1):
+        self.backend = backend
+        self.guild_id = guild_id
+
+    async def last_run(self):
+        return self.backend.get_job_runs("daily").get(self.guild_id)
+
+    async def record(self, deadline):
+        self.backend.set_job_runs("daily", [self.guild_id], deadline)
+
+
+def test_catch_up_runs_every_missed_deadline_in_order(backend):
+    latest = DAILY.previous(datetime.now(timezone.utc))
+    backend.set_job_runs("daily", [1], latest - timedelta(days=3))
+
+    calls, stats = _run_catch_up(DAILY, JobRuns(backend), expected_calls=3)
+
+    assert calls == [(latest - timedelta(days=2), True), (latest - timedelta(days=1), True), (latest, True)]
+    assert backend.get_job_runs("daily") == {1: latest}
+    assert stats["runs"] == 3 and stats["failures"] == 0 and stats["last_run"] == latest
+
+
+def test_catch_up_is_capped(backend, monkeypatch):
+    monkeypatch.setattr(scheduler, "SCHEDULER_MAX_CATCH_UP", 2)
+    latest = DAILY.previous(datetime.now(timezone.utc))
+    backend.set_job_runs("daily", [1], latest - timedelta(days=10))
+
+    calls, _ = _run_catch_up(DAILY, JobRuns(backend), expected_calls=2)
+
+    assert [deadline for deadline, _ in calls] == [latest - timedelta(days=1), latest]
+
+
+def test_catch_up_without_record_runs_latest_once(backend):
+    latest = DAILY.previous(datetime.now(timezone.utc))
+    calls, _ = _run_catch_up(DAILY, JobRuns(backend), expected_calls=1)
+    assert calls == [(latest, True)]
+    assert backend.get_job_runs("daily") == {1: latest}
+
+
+def test_up_to_date_job_only_reruns_latest(backend):
+    latest = DAILY.previous(datetime.now(timezone.utc))
+    backend.set_job_runs("daily", [1], latest)
+    calls, _ = _run_catch_up(DAILY, JobRuns(backend), expected_calls=1)
+    assert calls == [(latest, True)]
+
+
+def test_every_runs_after_interval():
+    calls = []
+
+    async def main():
+        done = asyncio.Event()
+
+        async def job(deadline, catch_up):
+            calls.append(catch_up)
+            if len(calls) == 2:
+                done.set()
+
+        sched = Scheduler()
+        sched.add("tick", Every(0.05), job)
+        await asyncio.wait_for(done.wait(), timeout=5)
+        await sched.stop()
+
+    asyncio.run(main())
+    assert calls == [False, False]
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+
+from src.session_store import SessionStore, TEXT, VOICE
+
+T0 = datetime(2026, 3, 2, 1, 0, tzinfo=timezone.utc)
+
+
+def test_deleted_slot_is_reused():
+    store = SessionStore()
+    store.start(1, 10, VOICE, T0)
+    store.start(1, 11, VOICE, T0)
+    assert store.pop(1, 10, VOICE).user_id == 10
+    assert store.stats()["free"] == 1
+
+    store.start(2, 20, TEXT, T0 + timedelta(minutes=5), accumulated=30)
+    stats = store.stats()
+    assert stats["slots"] == 2 and stats["free"] == 0
+    assert len(store) == 2
+    # 重複使用的 slot 不能殘留前一筆的伺服器、使用者或類型
+    session = store.get(2, 20, TEXT)
+    assert (session.guild_id, session.user_id, session.kind) == (2, 20, TEXT)
+    assert session.time == T0 + timedelta(minutes=5) and session.accumulated == 30 and not session.paused
+    assert store.get(1, 10, VOICE) is None
+    assert store.active(1, 11, VOICE).time == T0
+
+
+def test_restart_updates_in_place():
+    store = SessionStore()
+    store.start(1, 10, TEXT, T0)
+    store.pause(1, 10, TEXT, T0 + timedelta(minutes=10), 600)
+    assert store.stats()["slots"] == 1
+    assert store.active(1, 10, TEXT) is None
+    assert store.paused(1, 10, TEXT).accumulated == 600
+
+
+def test_pop_only_matching_state():
+    store = SessionStore()
+    store.pause(1, 10, TEXT, T0, 60)
+    assert store.pop(1, 10, TEXT, paused=False) is None
+    assert store.pop(1, 10, TEXT, paused=True).accumulated == 60
+    assert len(store) == 0
+
+
+def test_clear_guilds_frees_slots_for_reuse():
+    store = SessionStore()
+    for uid in range(5):
+        store.start(1, uid, VOICE, T0)
+    store.start(2, 99, VOICE, T0)
+    store.clear_guilds([1])
+    assert store.stats()["free"] == 5 and list(store.guild_sessions(1)) == []
+    for uid in range(5):
+        store.start(3, uid, TEXT, T0)
+    assert store.stats()["slots"] == 6
+    assert store.active_keys(VOICE) == {(2, 99)}
+    assert len(list(store.guild_sessions(3))) == 5
+
+
+def test_iter_active_before_skips_paused_and_new():
+    store = SessionStore()
+    store.start(1, 10, VOICE, T0)
+    store.start(1, 11, VOICE, T0 + timedelta(hours=2))
+    store.pause(1, 12, TEXT, T0, 0)
+    assert [s.user_id for s in store.iter_active(before=T0 + timedelta(hours=1))] == [10]
@@ -0,0 +1,133 @@
+import inspect
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src import storage
+
+T0 = datetime(2026, 3, 2, 1, 0, tzinfo=timezone.utc)   # 台北 09:00，學習日 2026-03-02
+
+
+def _all_chunks(chunks):
+    return [row for chunk in chunks for row in chunk]
+
+
+def test_backend_provides_same_interface_as_postgres():
+    pytest.importorskip("psycopg2")
+    from src import database, sqlite_backend
+
+    for name in storage.BACKEND_FUNCTIONS:
+        sqlite_params = list(inspect.signature(getattr(sqlite_backend, name)).parameters)
+        postgres_params = list(inspect.signature(getattr(database, name)).parameters)
+        assert sqlite_params == postgres_params, name
+
+
+def test_storage_selects_sqlite():
+    assert storage.DB_BACKEND == "sqlite"
+    assert storage.backend.__name__ == "src.sqlite_backend"
+
+
+def test_schema_is_current_and_idempotent(backend):
+    version = backend.schema_version()
+    backend.ensure_db()
+    assert version == backend.schema_version() >= 2
+
+
+def test_flush_writes_updates_time_log_and_rollups(backend):
+    backend.flush_writes(time_rows=[
+        (1, 10, "2026-03-02", 3600),
+        (1, 10, "2026-03-03", 600),
+        (1, 11, "2026-03-02", 1200),
+        (2, 10, "2026-03-02", 5),
+    ])
+    backend.add_seconds(1, 10, "2026-03-02", 60)
+
+    assert backend.fetch_by_date(1, "2026-03-02") == [(10, 3660), (11, 1200)]
+    assert backend.fetch_sum_between(1, "2026-03-02", "2026-03-08") == [(10, 4260), (11, 1200)]
+    assert backend.fetch_week(1, "2026-03-02") == [(10, 4260), (11, 1200)]
+    assert backend.fetch_month(1, "2026-03") == [(10, 4260), (11, 1200)]
+    assert backend.fetch_alltime(1) == [(10, 4260), (11, 1200)]
+    assert backend.fetch_user_sum_on(1, 10, "2026-03-03") == 600
+    assert backend.fetch_user_sum_between(1, 10, "2026-03-01", "2026-03-02") == 3660
+    assert backend.fetch_user_daily(1, 10) == [("2026-03-02", 3660), ("2026-03-03", 600)]
+    assert backend.fetch_by_date_many([1, 2], "2026-03-02") == [(1, 10, 3660), (1, 11, 1200), (2, 10, 5)]
+    assert backend.fetch_sum_between_many([2], "2026-03-01", "2026-03-31") == [(2, 10, 5)]
+
+
+def test_flush_writes_sessions_in_one_batch(backend):
+    start = T0.isoformat()
+    backend.flush_writes(
+        session_upserts=[(1, 10, "voice", start, 0), (1, 11, "text", start, 30)],
+        paused_upserts=[(1, 12, "text", start, 90)],
+        interval_rows=[(1, 9, "voice", (T0 - timedelta(hours=1)).isoformat(), start)],
+    )
+    backend.flush_writes(session_deletes=[(1, 10, "voice")], paused_deletes=[(1, 12, "text")])
+
+    assert backend.get_all_active_sessions() == [(1, 11, "text", start, 30)]
+    assert backend.get_all_paused_sessions() == []
+    assert backend.get_session(1, 11, "text") == start
+    assert backend.fetch_user_intervals(1, 9, (T0 - timedelta(days=1)).isoformat()) == [(T0 - timedelta(hours=1), T0)]
+
+
+def test_iter_time_log_filters_and_chunks(backend):
+    backend.flush_writes(time_rows=[(1, uid, f"2026-03-0{day}", 60) for uid in range(3) for day in range(1, 6)])
+    backend.flush_writes(time_rows=[(2, 0, "2026-03-02", 60)])
+
+    chunks = list(backend.iter_time_log(1, "2026-03-02", "2026-03-04", chunk_size=4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 1]
+    rows = _all_chunks(chunks)
+    assert {row[2] for row in rows} == {"2026-03-02", "2026-03-03", "2026-03-04"}
+    assert all(row[0] == 1 for row in rows)
+    assert rows == sorted(rows, key=lambda row: (row[2], row[1]))
+
+
+def test_iter_session_intervals_by_start_time(backend):
+    rows = [(1, 10, "voice", T0 + timedelta(hours=h), T0 + timedelta(hours=h, minutes=30)) for h in range(4)]
+    # 寫入緩衝傳入的是 ISO 字串，讀出時轉回 datetime
+    backend.flush_writes(interval_rows=[
+        (g, u, t, start.isoformat(), end.isoformat())
+        for g, u, t, start, end in rows + [(2, 10, "text", T0, T0 + timedelta(minutes=5))]
+    ])
+    since = (T0 + timedelta(hours=1)).isoformat()
+    until = (T0 + timedelta(hours=3)).isoformat()
+    assert _all_chunks(backend.iter_session_intervals(1, 1, since, until)) == rows[1:3]
+    assert len(_all_chunks(backend.iter_session_intervals())) == 5
+
+
+def test_replace_time_log_only_touches_one_guild(backend):
+    backend.flush_writes(time_rows=[
+        (1, 10, "2026-03-01", 100),
+        (1, 10, "2026-03-02", 100),
+        (2, 10, "2026-03-02", 100),
+    ])
+    backend.replace_time_log([(1, 10, "2026-03-02", 500), (1, 11, "2026-03-03", 50)], "2026-03-02", 1)
+
+    assert backend.fetch_user_daily(1, 10) == [("2026-03-01", 100), ("2026-03-02", 500)]
+    assert backend.fetch_alltime(1) == [(10, 600), (11, 50)]
+    assert backend.fetch_week(1, "2026-03-02") == [(10, 500), (11, 50)]
+    assert backend.fetch_month(1, "2026-03") == [(10, 600), (11, 50)]
+    assert backend.fetch_alltime(2) == [(10, 100)]
+
+
+def test_config_and_monitor_channels(backend):
+    backend.set_config(1, 100)
+    backend.set_config(1, 101)
+    backend.add_monitor_channel(1, 200)
+    backend.add_monitor_channel(1, 201)
+    backend.remove_monitor_channel(1, 200)
+
+    assert backend.get_config(1) == 101
+    assert backend.get_config(2, default_channel_id=5) == 5
+    assert backend.get_configs([1, 2]) == {1: 101}
+    assert backend.get_monitor_channels(1) == [201]
+    assert backend.get_all_monitor_channels() == [(1, 201)]
+
+
+def test_job_runs_round_trip(backend):
+    backend.set_job_runs("daily_announce", [1, 2], T0)
+    backend.set_job_runs("daily_announce", [2], T0 + timedelta(days=1))
+    backend.set_job_runs("heartbeat:0", [0], T0)
+
+    assert backend.get_job_runs("daily_announce") == {1: T0, 2: T0 + timedelta(days=1)}
+    assert backend.get_job_runs("heartbeat:0") == {0: T0}
+    assert backend.acquire_guild_leases([1, 2], "me", 90) == [1, 2]
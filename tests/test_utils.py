@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+from src import utils
+
+TW = timezone(timedelta(hours=8))
+
+
+def tw(*args) -> datetime:
+    return datetime(*args, tzinfo=TW)
+
+
+def test_split_within_one_study_day():
+    assert utils.split_by_study_day(tw(2026, 3, 2, 9), tw(2026, 3, 2, 11, 30)) == [("2026-03-02", 9000)]
+
+
+def test_split_at_0600_boundary():
+    # 05:30 ~ 06:30：前半屬於前一天的學習日
+    assert utils.split_by_study_day(tw(2026, 3, 2, 5, 30), tw(2026, 3, 2, 6, 30)) == [
+        ("2026-03-01", 1800),
+        ("2026-03-02", 1800),
+    ]
+
+
+def test_split_ending_exactly_at_boundary():
+    assert utils.split_by_study_day(tw(2026, 3, 2, 4), tw(2026, 3, 2, 6)) == [("2026-03-01", 7200)]
+
+
+def test_split_multi_day_covers_whole_span():
+    start, end = tw(2026, 3, 1, 22), tw(2026, 3, 4, 7, 15)
+    segments = utils.split_by_study_day(start, end)
+    assert [d for d, _ in segments] == ["2026-03-01", "2026-03-02", "2026-03-03", "2026-03-04"]
+    assert segments[1][1] == segments[2][1] == 86400
+    assert sum(secs for _, secs in segments) == int((end - start).total_seconds())
+
+
+def test_split_empty_or_reversed():
+    t = tw(2026, 3, 2, 9)
+    assert utils.split_by_study_day(t, t) == []
+    assert utils.split_by_study_day(t, t - timedelta(minutes=1)) == []
+
+
+def test_split_accepts_utc_input():
+    # 2026-03-01 21:30 UTC = 03-02 05:30 台北
+    start = datetime(2026, 3, 1, 21, 30, tzinfo=timezone.utc)
+    assert utils.split_by_study_day(start, start + timedelta(hours=1)) == [("2026-03-01", 1800), ("2026-03-02", 1800)]
+
+
+def test_study_date_of_matches_split():
+    assert utils.study_date_of(tw(2026, 3, 2, 5, 59)) == "2026-03-01"
+    assert utils.study_date_of(tw(2026, 3, 2, 6, 0)) == "2026-03-02"
+    assert utils.study_day_start("2026-03-02") == tw(2026, 3, 2, 6).astimezone(timezone.utc)
+
+
+def test_split_intervals_merges_by_user_and_day():
+    rows = utils.split_intervals([
+        (1, 10, tw(2026, 3, 2, 9), tw(2026, 3, 2, 10)),
+        (1, 10, tw(2026, 3, 2, 20), tw(2026, 3, 3, 6, 30)),
+        (2, 10, tw(2026, 3, 2, 9), tw(2026, 3, 2, 9, 1)),
+    ])
+    assert sorted(rows) == [
+        (1, 10, "2026-03-02", 3600 + 36000),
+        (1, 10, "2026-03-03", 1800),
+        (2, 10, "2026-03-02", 60),
+    ]
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from src.write_buffer import WriteBuffer
+
+
+class Recorder:
+    """代替 async_db.run：記錄每次 flush_writes 的參數，fail 為 True 時丟出例外"""
+
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+
+    async def __call__(self, fn, *args):
+        if self.fail:
+            raise RuntimeError("database down")
+        self.calls.append(args)
+
+
+def test_merges_writes_per_key():
+    run = Recorder()
+    buf = WriteBuffer(run)
+    buf.add_seconds(1, 10, "2026-03-02", 60)
+    buf.add_seconds(1, 10, "2026-03-02", 30)
+    buf.add_seconds(1, 11, "2026-03-02", 5)
+    buf.save_session(1, 10, "voice", "2026-03-02T01:00:00+00:00")
+    buf.save_session(1, 10, "voice", "2026-03-02T02:00:00+00:00")
+    buf.save_session(1, 12, "text", "2026-03-02T01:00:00+00:00")
+    buf.delete_session(1, 12, "text")
+    buf.pause_session(1, 13, "text", "2026-03-02T01:00:00+00:00", 90)
+    assert buf.pending_count() == 5
+    assert buf.pending_session(1, 12, "text") == (True, None)
+    assert buf.pending_paused(1, 13, "text") == (True, ("2026-03-02T01:00:00+00:00", 90))
+
+    asyncio.run(buf.flush())
+
+    (call,) = run.calls
+    time_rows, session_upserts, session_deletes, paused_upserts, paused_deletes, intervals = call
+    assert sorted(time_rows) == [(1, 10, "2026-03-02", 90), (1, 11, "2026-03-02", 5)]
+    assert session_upserts == [(1, 10, "voice", "2026-03-02T02:00:00+00:00", 0)]
+    assert session_deletes == [(1, 12, "text")]
+    assert paused_upserts == [(1, 13, "text", "2026-03-02T01:00:00+00:00", 90)]
+    assert paused_deletes == [] and intervals == []
+    assert buf.pending_count() == 0
+
+
+def test_requeues_after_failed_flush_with_newer_ops_winning():
+    run = Recorder()
+    buf = WriteBuffer(run)
+    buf.add_seconds(1, 10, "2026-03-02", 60)
+    buf.save_session(1, 10, "voice", "2026-03-02T01:00:00+00:00")
+    buf.log_interval(1, 10, "voice", "2026-03-02T00:00:00+00:00", "2026-03-02T01:00:00+00:00")
+
+    run.fail = True
+    with pytest.raises(RuntimeError):
+        asyncio.run(buf.flush())
+    assert buf.pending_count() == 3
+
+    # 失敗後新的操作：秒數累加、session 以新的為準
+    buf.add_seconds(1, 10, "2026-03-02", 30)
+    buf.delete_session(1, 10, "voice")
+    run.fail = False
+    asyncio.run(buf.flush())
+
+    (call,) = run.calls
+    time_rows, session_upserts, session_deletes, _, _, intervals = call
+    assert time_rows == [(1, 10, "2026-03-02", 90)]
+    assert session_upserts == [] and session_deletes == [(1, 10, "voice")]
+    assert intervals == [(1, 10, "voice", "2026-03-02T00:00:00+00:00", "2026-03-02T01:00:00+00:00")]
+    assert buf.stats()["flushes"] == 1
+
+
+def test_flush_reaches_sqlite_backend(backend):
+    async def run(fn, *args):
+        return fn(*args)
+
+    buf = WriteBuffer(run)
+    buf.add_seconds(1, 10, "2026-03-02", 60)
+    buf.add_seconds(1, 10, "2026-03-02", 60)
+    asyncio.run(buf.flush())
+    assert backend.fetch_by_date(1, "2026-03-02") == [(10, 120)]